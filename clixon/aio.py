@@ -0,0 +1,826 @@
+import asyncio
+import getpass
+import itertools
+import os
+import socket
+
+from collections import deque
+from typing import Optional
+
+from clixon.args import get_logger
+from clixon.element import Element
+from clixon.exceptions import TimeoutException, TransactionError
+from clixon.helpers import get_devices_diff, get_path, strip_rpc_reply
+from clixon.netconf import (
+    rpc_apply_template,
+    rpc_close_session,
+    rpc_commit,
+    rpc_config_get,
+    rpc_config_set,
+    rpc_datastore_diff,
+    rpc_device_rpc_result,
+    rpc_error_get,
+    rpc_pull,
+    rpc_push,
+    rpc_subscription_create,
+)
+from clixon.parser import parse_string
+from clixon.session import message_info, transaction_id
+from clixon.sock import END_OF_MESSAGE, RECV_BUFSIZE, FrameDecoder, SocketClosedError
+
+logger = get_logger()
+default_sockpath = "/usr/local/var/run/controller/controller.sock"
+
+# Maximum number of transaction notifications kept until they are waited for
+MAX_UNCLAIMED_NOTIFICATIONS = 100
+
+
+class AsyncClixon:
+    def __init__(
+        self,
+        sockpath: Optional[str] = "",
+        socket: Optional[socket.socket] = None,
+        commit: Optional[bool] = False,
+        push: Optional[bool] = False,
+        pull: Optional[bool] = False,
+        source: Optional[str] = "actions",
+        target: Optional[str] = "actions",
+        read_only: Optional[bool] = False,
+        user: Optional[str] = None,
+        standalone: Optional[bool] = False,
+        timeout: Optional[float] = 30,
+        delta: Optional[bool] = False,
+    ) -> None:
+        """
+        Create an asyncio Clixon object, the coroutine counterpart of
+        Clixon.
+
+        One task reads all messages from the socket. Replies are matched to
+        their RPC by message-id and transaction notifications to the
+        operation that started the transaction by transaction ID, so many
+        operations can be awaited at once on one connection.
+
+        :param sockpath: Path to the socket
+        :type sockpath: str
+        :param socket: Connected socket to use instead of sockpath
+        :type socket: socket.socket
+        :param commit: Commit the configuration
+        :type commit: bool
+        :param push: Push the configuration
+        :type push: bool
+        :param pull: Pull the configuration
+        :type pull: bool
+        :param source: Source of the configuration
+        :type source: str
+        :param target: Target of the configuration
+        :type target: str
+        :param user: User to run as
+        :type user: str
+        :param timeout: Seconds to wait for a reply or notification
+        :type timeout: float
+        :param delta: Only send the modified parts of the configuration
+        :type delta: bool
+        :return: None
+        :rtype: None
+
+        """
+
+        if not user:
+            user = getpass.getuser()
+
+        if sockpath == "" and socket is None:
+            sockpath = default_sockpath
+
+            if not os.path.exists(sockpath):
+                raise ValueError(f"Invalid socket: {sockpath}")
+
+        self.__sockpath = sockpath
+        self.__socket = socket
+        self.__commit = commit
+        self.__push = push
+        self.__pull = pull
+        self.__source = source
+        self.__target = target
+        self.__read_only = read_only
+        self.__user = user
+        self.__standalone = standalone
+        self.__timeout = timeout
+        self.__delta = delta
+        self.__root = None
+
+        self.__reader = None
+        self.__writer = None
+        self.__reader_task = None
+        self.__ids = itertools.count(1)
+        self.__replies = {}
+        self.__transactions = []
+        self.__notifications = deque(maxlen=MAX_UNCLAIMED_NOTIFICATIONS)
+        self.__pending = set()
+        self.__started = set()
+        self.__notify_lock = asyncio.Lock()
+        self.__transaction_notify = False
+
+    async def __aenter__(self) -> object:
+        """
+        Connect and return the Clixon object.
+
+        :return: Clixon object
+        :rtype: object
+
+        """
+
+        await self.connect()
+
+        if self.__pull:
+            await self.pull()
+
+        return self
+
+    async def __aexit__(self, *args: object) -> None:
+        """
+        Send the final config and commit, then close the session.
+
+        :param args: Arguments
+        :type args: object
+        :return: None
+        :rtype: None
+
+        """
+
+        try:
+            if self.__read_only:
+                logger.info("Read only mode enabled, skipping config set")
+            elif args[0] is None:
+                if self.__root is None:
+                    self.__root = await self.get_root()
+
+                await self.set_root(self.__root)
+        finally:
+            try:
+                await self.close_session()
+            except Exception:
+                pass
+
+            await self.close()
+
+    async def connect(self) -> None:
+        """
+        Connect to the socket and start reading from it.
+
+        :return: None
+        :rtype: None
+
+        """
+
+        if self.__socket is not None:
+            connection = asyncio.open_unix_connection(sock=self.__socket)
+        else:
+            connection = asyncio.open_unix_connection(self.__sockpath)
+
+        self.__reader, self.__writer = await connection
+        self.__reader_task = asyncio.create_task(self.__read_loop())
+
+    async def close(self) -> None:
+        """
+        Stop reading and close the connection.
+
+        :return: None
+        :rtype: None
+
+        """
+
+        if self.__reader_task is not None:
+            self.__reader_task.cancel()
+
+            try:
+                await self.__reader_task
+            except (asyncio.CancelledError, Exception):
+                pass
+
+            self.__reader_task = None
+
+        if self.__writer is not None:
+            self.__writer.close()
+
+            try:
+                await self.__writer.wait_closed()
+            except Exception:
+                pass
+
+            self.__writer = None
+
+    async def call(self, rpc: Element) -> str:
+        """
+        Send an RPC and return its reply. The RPC gets a unique message-id.
+
+        :param rpc: RPC
+        :type rpc: Element
+        :return: Reply
+        :rtype: str
+
+        """
+
+        return await self.__call(rpc)
+
+    async def __call(self, rpc: Element, transaction: Optional[bool] = False) -> str:
+        """
+        Send an RPC and return its reply.
+
+        :param rpc: RPC
+        :type rpc: Element
+        :param transaction: The RPC starts a transaction, keep its
+                            notification if it arrives before it is waited for
+        :type transaction: bool
+        :return: Reply
+        :rtype: str
+
+        """
+
+        message_id = str(next(self.__ids))
+        rpc.rpc.update_attributes({"message-id": message_id}, modified=False)
+
+        future = asyncio.get_running_loop().create_future()
+        self.__replies[message_id] = future
+
+        if transaction:
+            self.__pending.add(message_id)
+
+        try:
+            await self.__send(rpc)
+
+            return await self.__wait(future, f"Reply to message {message_id}")
+        finally:
+            self.__replies.pop(message_id, None)
+
+            if message_id in self.__pending:
+                self.__pending.remove(message_id)
+                self.__expire()
+
+    async def __send(self, rpc: Element) -> None:
+        """
+        Frame a message as a single chunk and send it.
+
+        :param rpc: Message
+        :type rpc: Element
+        :return: None
+        :rtype: None
+
+        """
+
+        if self.__writer is None:
+            raise SocketClosedError("Not connected")
+
+        data = rpc.dumps().encode()
+        logger.debug(f"Sending {len(data)} bytes of data")
+
+        self.__writer.write(b"\n#%d\n" % len(data))
+        self.__writer.write(data)
+        self.__writer.write(b"\n##\n")
+
+        await self.__writer.drain()
+
+    async def __wait(self, future: asyncio.Future, what: str) -> str:
+        """
+        Wait for a future with the timeout of the object.
+
+        :param future: Future
+        :type future: asyncio.Future
+        :param what: Description used in the timeout error
+        :type what: str
+        :return: Result of the future
+        :rtype: str
+
+        """
+
+        try:
+            return await asyncio.wait_for(future, self.__timeout)
+        except asyncio.TimeoutError:
+            raise TimeoutException(
+                "%s timed out after %s seconds" % (what, self.__timeout)
+            )
+
+    async def __read_loop(self) -> None:
+        """
+        Read messages from the socket and dispatch them until it is closed.
+
+        :return: None
+        :rtype: None
+
+        """
+
+        decoder = FrameDecoder()
+        message = bytearray()
+
+        try:
+            while True:
+                data = await self.__reader.read(RECV_BUFSIZE)
+
+                if not data:
+                    raise SocketClosedError("Socket closed")
+
+                for piece in decoder.feed(data):
+                    if piece is END_OF_MESSAGE:
+                        self.__dispatch(message.decode())
+                        message.clear()
+                    else:
+                        message += piece
+        except asyncio.CancelledError:
+            self.__fail(SocketClosedError("Session closed"))
+            raise
+        except Exception as e:
+            logger.debug(f"Reader stopped: {e}")
+            self.__fail(e)
+
+    def __dispatch(self, data: str) -> None:
+        """
+        Hand a message to the coroutine waiting for it.
+
+        :param data: Message
+        :type data: str
+        :return: None
+        :rtype: None
+
+        """
+
+        name, message_id = message_info(data)
+
+        if name == "notification":
+            if "controller-transaction" in data:
+                self.__notify(data)
+            else:
+                logger.debug("Dropping notification nobody waits for")
+            return
+
+        # Replies without a message-id go to the oldest RPC
+        if message_id is None and self.__replies:
+            message_id = next(iter(self.__replies))
+
+        future = self.__replies.get(message_id)
+
+        if future is None or future.done():
+            logger.debug(f"Dropping reply to unknown message {message_id}")
+            return
+
+        future.set_result(data)
+
+        if message_id in self.__pending:
+            self.__pending.remove(message_id)
+            tid = transaction_id(data)
+
+            if tid is not None:
+                self.__started.add(tid)
+
+            self.__expire()
+
+    def __notify(self, data: str) -> None:
+        """
+        Hand a transaction notification to the operation waiting for its
+        transaction, or keep it until one does. Only notifications of
+        transactions this client started are kept, and of any transaction
+        while the reply to an RPC starting one is awaited, as the
+        notification may arrive before the reply.
+
+        :param data: Notification
+        :type data: str
+        :return: None
+        :rtype: None
+
+        """
+
+        tid = transaction_id(data)
+
+        for waiter in self.__transactions:
+            waiting_tid, future = waiter
+
+            if future.done() or waiting_tid not in (None, tid):
+                continue
+
+            self.__transactions.remove(waiter)
+            future.set_result(data)
+
+            return
+
+        if tid not in self.__started and not self.__pending:
+            logger.debug(f"Dropping notification of unknown transaction {tid}")
+            return
+
+        self.__notifications.append(data)
+
+    def __expire(self) -> None:
+        """
+        Drop the kept notifications of transactions this client did not
+        start, once no reply to an RPC starting a transaction is awaited.
+
+        :return: None
+        :rtype: None
+
+        """
+
+        if self.__pending:
+            return
+
+        for data in list(self.__notifications):
+            if transaction_id(data) not in self.__started:
+                logger.debug("Dropping notification of unknown transaction")
+                self.__notifications.remove(data)
+
+    def __fail(self, exception: Exception) -> None:
+        """
+        Fail every coroutine waiting for a message.
+
+        :param exception: Exception to raise in the waiting coroutines
+        :type exception: Exception
+        :return: None
+        :rtype: None
+
+        """
+
+        for future in list(self.__replies.values()):
+            if not future.done():
+                future.set_exception(exception)
+
+        for _, future in self.__transactions:
+            if not future.done():
+                future.set_exception(exception)
+
+        self.__transactions.clear()
+
+    async def wait_for_transaction(self, tid: Optional[str] = None) -> Element:
+        """
+        Wait for the notification of a transaction.
+
+        :param tid: Transaction ID, the next transaction notification if
+                    None
+        :type tid: str
+        :return: Parsed notification
+        :rtype: Element
+
+        """
+
+        for data in self.__notifications:
+            if tid is None or transaction_id(data) == tid:
+                self.__notifications.remove(data)
+                break
+        else:
+            if self.__reader_task is None or self.__reader_task.done():
+                raise SocketClosedError("Not connected")
+
+            future = asyncio.get_running_loop().create_future()
+            waiter = (tid, future)
+            self.__transactions.append(waiter)
+
+            try:
+                data = await self.__wait(future, f"Transaction {tid}")
+            finally:
+                if waiter in self.__transactions:
+                    self.__transactions.remove(waiter)
+
+        root = self.__handle_errors(data)
+
+        if "FAILED" in data:
+            raise TransactionError("Transaction failed")
+
+        return root if root is not None else parse_string(data)
+
+    def __handle_errors(
+        self, data: Optional[str], root: Optional[Element] = None
+    ) -> Optional[Element]:
+        """
+        Handle errors.
+
+        :param data: Data
+        :type data: str
+        :param root: Already parsed data
+        :type root: Element
+        :return: Parsed data, if it had to be parsed
+        :rtype: Optional[Element]
+
+        """
+
+        return rpc_error_get(data, standalone=self.__standalone, root=root)
+
+    async def __enable_transaction_notify(self) -> None:
+        """
+        Enable transaction notifications, once per session.
+
+        :return: None
+        :rtype: None
+
+        """
+
+        async with self.__notify_lock:
+            if self.__transaction_notify:
+                return
+
+            rpc = rpc_subscription_create("controller-transaction", user=self.__user)
+            data = await self.call(rpc)
+
+            self.__handle_errors(data)
+            self.__transaction_notify = True
+
+    async def __transaction(self, rpc: Element) -> Element:
+        """
+        Send an RPC which starts a transaction and wait for its
+        notification.
+
+        :param rpc: RPC
+        :type rpc: Element
+        :return: Parsed notification
+        :rtype: Element
+
+        """
+
+        await self.__enable_transaction_notify()
+
+        data = await self.__call(rpc, transaction=True)
+        tid = transaction_id(data)
+
+        try:
+            self.__handle_errors(data)
+
+            if tid is None:
+                raise TransactionError("Transaction failed, no transaction ID")
+
+            return await self.wait_for_transaction(tid)
+        finally:
+            self.__started.discard(tid)
+
+    async def close_session(self) -> None:
+        """
+        Send a close-session RPC to gracefully terminate the NETCONF session.
+
+        :return: None
+        :rtype: None
+
+        """
+
+        data = await self.call(rpc_close_session(user=self.__user))
+
+        if "<ok/>" not in data:
+            raise ValueError("Unexpected response after close-session")
+
+    async def get_root(
+        self,
+        path: Optional[str] = None,
+        xpath: Optional[str] = "/",
+        namespaces: Optional[dict] = None,
+    ) -> object:
+        """
+        Return the root object or a specific element, see Clixon.get_root.
+
+        :param path: Optional path to a specific element, applied client-side
+        :type path: Optional[str]
+        :param xpath: XPath expression to filter the config server-side
+        :type xpath: Optional[str]
+        :param namespaces: Dict of namespace prefixes to URIs for xpath
+        :type namespaces: Optional[dict]
+        :return: Root object, or the element at path
+        :rtype: object
+
+        """
+
+        config = rpc_config_get(
+            user=self.__user, source=self.__source, xpath=xpath, namespaces=namespaces
+        )
+
+        reply = parse_string(await self.call(config))
+        self.__handle_errors(None, root=reply)
+
+        self.__root = reply.rpc_reply.data
+
+        if path:
+            return get_path(self.__root, path)
+
+        return self.__root
+
+    async def set_root(self, root: object) -> None:
+        """
+        Set the root object.
+
+        :param root: Root object
+        :type root: object
+        :return: None
+        :rtype: None
+
+        """
+
+        if self.__read_only:
+            logger.info("Read only mode enabled")
+            return
+
+        config = rpc_config_set(
+            root,
+            user=self.__user,
+            device=False,
+            target=self.__target,
+            delta=self.__delta,
+        )
+
+        if self.__delta and not config.rpc.edit_config.config.get_elements():
+            logger.debug("No modifications, skipping config set")
+        else:
+            data = await self.call(config)
+            self.__handle_errors(data)
+
+        if self.__commit:
+            await self.commit()
+
+    async def commit(self) -> None:
+        """
+        Commit the configuration.
+
+        :return: None
+        :rtype: None
+
+        """
+
+        if self.__read_only:
+            logger.info("Read only mode enabled")
+            return
+
+        data = await self.call(rpc_commit(user=self.__user))
+        self.__handle_errors(data)
+
+        if self.__push:
+            await self.push()
+
+    async def pull(
+        self, device: Optional[str] = "*", transient: Optional[bool] = False
+    ) -> None:
+        """
+        Send a pull request and wait for its transaction.
+
+        :param device: Device name
+        :type device: str
+        :param transient: Do not store the pulled configuration
+        :type transient: bool
+        :return: None
+        :rtype: None
+
+        """
+
+        logger.debug(f"Pulling config for device {device}")
+
+        await self.__transaction(
+            rpc_pull(transient=transient, device=device, user=self.__user)
+        )
+
+    async def push(self) -> None:
+        """
+        Send a push request and wait for its transaction.
+
+        :return: None
+        :rtype: None
+
+        """
+
+        logger.info("Pushing config")
+
+        if self.__read_only:
+            logger.info("Read only mode enabled")
+            return
+
+        await self.__transaction(rpc_push(user=self.__user))
+
+    async def device_rpc(
+        self,
+        devname: Optional[str] = None,
+        template: Optional[str] = "",
+        variables: Optional[dict] = {},
+        inline: Optional[bool] = False,
+        groupname: Optional[str] = None,
+    ) -> object:
+        """
+        Apply a RPC template to a device or device-group, see
+        Clixon.device_rpc.
+
+        :param devname: Device name (mutually exclusive with groupname)
+        :type devname: str
+        :param template: Template name or inline template string
+        :type template: str
+        :param variables: Template variables
+        :type variables: dict
+        :param inline: Use inline template
+        :type inline: bool
+        :param groupname: Device-group name (mutually exclusive with devname)
+        :type groupname: str
+        :return: devices element
+        :rtype: object
+        """
+
+        if devname is None and groupname is None:
+            raise ValueError("Either devname or groupname must be provided")
+        if devname is not None and groupname is not None:
+            raise ValueError("devname and groupname are mutually exclusive")
+
+        rpc = rpc_apply_template(
+            devname,
+            template,
+            variables,
+            user=self.__user,
+            inline=inline,
+            groupname=groupname,
+        )
+
+        transaction = await self.__transaction(rpc)
+
+        try:
+            if transaction.notification.controller_transaction.result != "SUCCESS":
+                raise ValueError("Device RPC failed")
+
+            tid = transaction.notification.controller_transaction.tid.get_data()
+            rpc = rpc_device_rpc_result(tid=tid, user=self.__user)
+            data = await self.call(rpc)
+
+            return parse_string(data).rpc_reply.devices
+
+        except AttributeError:
+            raise ValueError("Device RPC failed")
+
+    async def apply_template(
+        self,
+        devname: Optional[str] = None,
+        template: Optional[str] = "",
+        variables: Optional[dict] = {},
+        inline: Optional[bool] = False,
+        groupname: Optional[str] = None,
+    ) -> bool:
+        """
+        Apply a template, see Clixon.apply_template.
+
+        :param devname: Device name (mutually exclusive with groupname)
+        :type devname: str
+        :param template: Template name or inline template string
+        :type template: str
+        :param variables: Template variables
+        :type variables: dict
+        :param inline: Use inline template
+        :type inline: bool
+        :param groupname: Device-group name (mutually exclusive with devname)
+        :type groupname: str
+        :return: True
+        :rtype: bool
+        """
+
+        if devname is None and groupname is None:
+            raise ValueError("Either devname or groupname must be provided")
+        if devname is not None and groupname is not None:
+            raise ValueError("devname and groupname are mutually exclusive")
+
+        if self.__read_only:
+            logger.info("Read only mode enabled")
+            return
+
+        rpc = rpc_apply_template(
+            devname,
+            template,
+            variables,
+            template_type="CONFIG",
+            user=self.__user,
+            inline=inline,
+            groupname=groupname,
+        )
+
+        await self.__enable_transaction_notify()
+
+        data = await self.call(rpc)
+
+        if "<ok/>" not in data:
+            raise ValueError("Apply template failed")
+
+        return True
+
+    async def show_devices_diff(
+        self, device: Optional[str] = "*", dict_format: Optional[bool] = False
+    ) -> str | dict:
+        """
+        Pull the devices transiently and show how they differ from the
+        configuration.
+
+        :param device: Device name
+        :type device: str
+        :param dict_format: Return a dict with one diff per device
+        :type dict_format: bool
+        :return: Devices diff
+        :rtype: str | dict
+
+        """
+
+        await self.pull(device=device, transient=True)
+
+        rpc = rpc_datastore_diff(device=device, transient=True, user=self.__user)
+        data = await self.call(rpc)
+
+        self.__handle_errors(data)
+
+        data = strip_rpc_reply(data)
+
+        if not data:
+            if dict_format:
+                return {}
+            return None
+
+        if dict_format:
+            return get_devices_diff(data)
+
+        return data
@@ -115,6 +115,13 @@ def parse_args(cli_args: Optional = None) -> tuple:
         "-p", "--pidfile", default=default_pidfile, help="Pidfile for Python server"
     )
     parser.add_argument("-P", "--pp", action="store_true", help="Prettyprint XML")
+    parser.add_argument(
+        "-w",
+        "--workers",
+        type=int,
+        default=0,
+        help="Number of worker processes for service instances, 0 to disable",
+    )
     parser.add_argument(
         "-l",
         "--log",
@@ -210,6 +217,18 @@ def get_prettyprint() -> bool:
     return get_arg("pp")
 
 
+def get_workers() -> int:
+    """
+    Get number of worker processes.
+
+    :return: Number of worker processes
+    :rtype: int
+
+    """
+
+    return get_arg("workers") or 0
+
+
 def get_arg(opt: str):
     """
     Get CLI argument.
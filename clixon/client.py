@@ -14,24 +14,27 @@ import traceback
 from socket import socket
 from typing import Optional
 
-from clixon.args import get_logger
+from clixon.args import get_logger, get_workers
 from clixon.event import RPCEventHandler
 from clixon.modules import run_hooks
 from clixon.modules import run_modules
+from clixon.modules import run_modules_parallel
 from clixon.netconf import RPCTypes
 from clixon.netconf import rpc_header_get
 from clixon.netconf import rpc_hello
 from clixon.netconf import rpc_subscription_create
 from clixon.netconf import rpc_transactions_get
 from clixon.parser import parse_string
+from clixon.session import get_session
 from clixon.sock import SocketClosedError
 from clixon.sock import create_socket
-from clixon.sock import read
-from clixon.sock import send
+from clixon.transactions import TransactionStore
 
 logger = get_logger()
 events = RPCEventHandler()
-transactions = {}
+# Services of non-diff transactions, used for the post-commit hooks when
+# the transaction result arrives
+transactions = TransactionStore()
 
 
 def __get_username(sock: socket, tid: int, pp: bool) -> str:
@@ -41,8 +44,7 @@ def __get_username(sock: socket, tid: int, pp: bool) -> str:
 
     rpc = rpc_transactions_get(tid=tid)
 
-    send(sock, rpc, pp)
-    data = read(sock, pp)
+    data = get_session(sock, pp).call(rpc)
     root = parse_string(data)
 
     username = root.rpc_reply.data.transactions.transaction.username.get_data()
@@ -50,7 +52,7 @@ def __get_username(sock: socket, tid: int, pp: bool) -> str:
     return username
 
 
-@events.register("*<controller-transaction*>*</controller-transaction>*")
+@events.register_element("controller-transaction")
 def controller_transaction_cb(*args, **kwargs) -> None:
     """
     Callback for controller transaction
@@ -71,27 +73,20 @@ def controller_transaction_cb(*args, **kwargs) -> None:
     tid = str(notification.notification.controller_transaction.tid)
     result = str(notification.notification.controller_transaction.result)
 
+    # The result is final, the transaction state is not needed after this
+    instances = transactions.pop(tid)
+
     if "SUCCESS" in data:
         return
 
-    if tid not in transactions:
+    if instances is None:
         return
 
-    for service in transactions[tid]:
-        match = re.match(r"(\S+)\[.+='(\S+)'\]", service.cdata)
-
-        if not match:
-            raise ValueError(
-                f"Invalid command, could not parse service: {service.cdata}"
-            )
-
-        service_name = match.group(1)
-        instance = match.group(2)
-
+    for service_name, instance in instances:
         run_hooks(sock, modules, service_name, instance, False, result)
 
 
-@events.register("*<services-commit*>*</services-commit>*")
+@events.register_element("services-commit")
 def services_commit_cb(*args, **kwargs) -> None:
     """
     Callback for services commit
@@ -111,6 +106,7 @@ def services_commit_cb(*args, **kwargs) -> None:
     pp = kwargs["pp"]
     service_name = ""
     service_diff = False
+    parallel = False
 
     logger.debug("Received service notify")
 
@@ -132,7 +128,8 @@ def services_commit_cb(*args, **kwargs) -> None:
         if not services:
             logger.debug("No services in commit, running all services")
             run_modules(sock, modules, None, None, user=username)
-            send(sock, rpc, pp)
+            session = get_session(sock, pp)
+            session.discard(session.send(rpc))
 
             return
 
@@ -141,9 +138,8 @@ def services_commit_cb(*args, **kwargs) -> None:
             service_diff = True
         else:
             logger.info("No service diff detected")
-            transactions[tid] = services
 
-        finished_services = []
+        instances = []
         for service in services:
             match = re.match(r"(\S+)\[.+='(\S+)'\]", service.cdata)
 
@@ -152,9 +148,16 @@ def services_commit_cb(*args, **kwargs) -> None:
                     f"Invalid command, could not parse service: {service.cdata}"
                 )
 
-            service_name = match.group(1)
-            instance = match.group(2)
+            instances.append((match.group(1), match.group(2)))
+
+        if not service_diff:
+            transactions.put(tid, instances)
 
+        workers = get_workers()
+        parallel = workers > 0 and len(instances) > 1
+
+        finished_services = []
+        for service_name, instance in instances:
             run_hooks(
                 sock,
                 modules,
@@ -165,17 +168,29 @@ def services_commit_cb(*args, **kwargs) -> None:
                 user=username,
             )
 
-            run_modules(
-                sock, modules, service_name, instance, service_diff, user=username
-            )
+            if not parallel:
+                run_modules(
+                    sock, modules, service_name, instance, service_diff, user=username
+                )
 
             if service_name not in finished_services:
                 finished_services.append(service_name)
+
+        if parallel:
+            run_modules_parallel(
+                sock,
+                modules,
+                instances,
+                service_diff,
+                user=username,
+                workers=workers,
+            )
     except Exception as e:
         logger.error("Catched an module exception")
         logger.error(traceback.format_exc())
 
-        if service_name:
+        # Errors from the workers name the instance themselves
+        if service_name and not parallel:
             name = f" {service_name} "
         else:
             name = " "
@@ -196,7 +211,9 @@ def services_commit_cb(*args, **kwargs) -> None:
         for service in finished_services:
             rpc.rpc.transaction_actions_done.create("service", cdata=service)
 
-    send(sock, rpc, pp)
+    # Nobody waits for the reply, drop it when it arrives
+    session = get_session(sock, pp)
+    session.discard(session.send(rpc))
 
 
 def hello(sock: socket, pp: bool) -> None:
@@ -213,9 +230,9 @@ def hello(sock: socket, pp: bool) -> None:
 
     """
 
-    rpc = rpc_hello()
-    send(sock, rpc, pp)
-    data = read(sock, pp)
+    session = get_session(sock, pp)
+    session.send(rpc_hello())
+    data = session.receive()
 
     if (
         """<hello xmlns="urn:ietf:params:xml:ns:netconf:base:1.0"><session-id>"""
@@ -241,8 +258,7 @@ def enable_service_notify(sock: socket, pp: bool) -> None:
     """
 
     rpc = rpc_subscription_create()
-    send(sock, rpc, pp)
-    data = read(sock, pp)
+    data = get_session(sock, pp).call(rpc)
 
     return data
 
@@ -262,8 +278,7 @@ def enable_transaction_notify(sock: socket, pp: bool) -> None:
     """
 
     rpc = rpc_subscription_create("controller-transaction")
-    send(sock, rpc, pp)
-    data = read(sock, pp)
+    data = get_session(sock, pp).call(rpc)
 
     return data
 
@@ -315,7 +330,7 @@ def readloop(sockpath: str, modules: list, pp: Optional[bool] = False) -> None:
 
         while True:
             try:
-                data = read(sock, pp)
+                data = get_session(sock, pp).get_notification()
                 events.emit(event=data, data=data, sock=sock, modules=modules, pp=pp)
             except struct.error:
                 logger.error("Socket closed, backend probably died")
@@ -2,11 +2,13 @@ import getpass
 import os
 import re
 import socket
-from typing import Optional
+import time
+from typing import Generator, Iterable, Optional
 
 from clixon.args import get_arg, get_logger
-from clixon.exceptions import TransactionError
-from clixon.helpers import get_path, timeout
+from clixon.element import Element
+from clixon.exceptions import RPCError, TimeoutException, TransactionError
+from clixon.helpers import get_devices_diff, get_path, strip_rpc_reply
 from clixon.netconf import (
     rpc_apply_template,
     rpc_apply_service,
@@ -28,7 +30,10 @@ from clixon.netconf import (
     rpc_discard_changes,
 )
 from clixon.parser import parse_string
-from clixon.sock import create_socket, read, send
+from clixon.session import get_session, transaction_id
+from clixon.snapshot import Snapshot
+from clixon.sock import create_socket
+from clixon.view import element_path
 
 sockpath = get_arg("sockpath")
 pp = get_arg("pp")
@@ -50,8 +55,11 @@ class Clixon:
         read_only: Optional[bool] = False,
         user: Optional[str] = None,
         standalone: Optional[bool] = False,
-        timeout: Optional[int] = 30,
+        timeout: Optional[float] = 30,
         from_server: Optional[bool] = False,
+        delta: Optional[bool] = False,
+        batch: Optional[bool] = True,
+        snapshot: Optional[bool] = False,
     ) -> None:
         """
         Create a Clixon object.
@@ -72,6 +80,16 @@ class Clixon:
         :type cron: bool
         :param user: User to run as
         :type user: str
+        :param timeout: Seconds to wait for transaction notifications
+        :type timeout: float
+        :param delta: Only send the modified parts of the configuration
+        :type delta: bool
+        :param batch: Send all top-level subtrees in a single edit-config
+        :type batch: bool
+        :param snapshot: Fetch the configuration once per xpath and give
+                         every get_root call its own view of it, the changes
+                         of every view are sent when the transaction ends
+        :type snapshot: bool
         :return: None
         :rtype: None
         """
@@ -98,6 +116,7 @@ class Clixon:
             self.__socket = socket
             self.__server_socket = True
 
+        self.__session = get_session(self.__socket, pp)
         self.__source = source
         self.__target = target
         self.__user = user
@@ -115,6 +134,12 @@ class Clixon:
             self.__target = "candidate"
 
         self.__from_server = from_server
+        self.__delta = delta
+        self.__batch = batch
+        self.__snapshot = None
+
+        if snapshot:
+            self.__snapshot = Snapshot(self.__get_config)
 
     def __enter__(self) -> object:
         """
@@ -144,17 +169,44 @@ class Clixon:
             logger.info("Read only mode enabled, skipping config set")
         else:
             try:
-                if self.__root is None:
-                    self.__root = self.get_root()
+                delta = self.__delta
+
+                if self.__snapshot is not None:
+                    roots = self.__snapshot_roots()
+                    delta = True
+                else:
+                    if self.__root is None:
+                        self.__root = self.get_root()
+
+                    roots = [(self.__root, None)]
+
+                configs = []
+                for root, exclude in roots:
+                    if self.__batch:
+                        configs.append((root, exclude))
+                        continue
+
+                    for child in root.get_elements():
+                        config = Element(root.origname())
+                        config.create(child.origname(), element=child)
+                        configs.append((config, exclude))
 
-                for child in self.__root:
+                for child, exclude in configs:
                     config = rpc_config_set(
-                        child, user=self.__user, target=self.__target
+                        child,
+                        user=self.__user,
+                        target=self.__target,
+                        delta=delta,
+                        exclude=exclude,
                     )
-                    send(self.__socket, config, pp)
-                    data = read(self.__socket, pp)
 
-                    self.__handle_errors(data)
+                    if delta and not config.rpc.edit_config.config.get_elements():
+                        logger.debug("No modifications, skipping config set")
+                        continue
+
+                    data = self.__session.call(config)
+
+                    self.__handle_config_errors(data, child)
 
                 if self.__commit:
                     self.commit()
@@ -169,6 +221,37 @@ class Clixon:
             except Exception:
                 pass
 
+    def __snapshot_roots(self) -> list:
+        """
+        Return the views handed out in snapshot mode that have changes,
+        each with a function for their delta that leaves out the unchanged
+        leaves another view changed or deleted. The views share the
+        snapshot, so those leaves hold old values which would overwrite the
+        changes of the other view.
+
+        :return: List of (view, exclude) tuples
+        :rtype: list
+
+        """
+
+        views = [root for root in self.__snapshot.get_roots() if root.get_dirty()]
+        changed = [view.changed_paths() for view in views]
+        roots = []
+
+        for position, view in enumerate(views):
+            others = set()
+
+            for other, paths in enumerate(changed):
+                if other != position:
+                    others |= paths
+
+            def exclude(leaf: Element, view=view, others=others) -> bool:
+                return element_path(leaf, view) in others
+
+            roots.append((view, exclude if others else None))
+
+        return roots
+
     def commit(self) -> None:
         """
         Commit the configuration.
@@ -184,8 +267,7 @@ class Clixon:
 
         commit = rpc_commit(user=self.__user)
 
-        send(self.__socket, commit, pp)
-        data = read(self.__socket, pp)
+        data = self.__session.call(commit)
 
         self.__handle_errors(data)
 
@@ -202,11 +284,10 @@ class Clixon:
         """
 
         close = rpc_close_session(user=self.__user)
-        send(self.__socket, close, pp)
 
         # After sending close-session, the server should close the connection.
         # We attempt to read to confirm this, expecting an error or no data.
-        data = read(self.__socket, pp)
+        data = self.__session.call(close)
 
         if "<ok/>" not in data:
             raise ValueError("Unexpected response after close-session")
@@ -239,96 +320,194 @@ class Clixon:
         """
         logger.debug("Updating root object")
 
+        if self.__snapshot is not None:
+            self.__root = self.__snapshot.get_root(xpath=xpath, namespaces=namespaces)
+        else:
+            self.__root = self.__get_config(xpath, namespaces)
+
+        if path:
+            return get_path(self.__root, path)
+
+        return self.__root
+
+    def get_snapshot(
+        self, xpath: Optional[str] = "/", namespaces: Optional[dict] = None
+    ) -> Element:
+        """
+        Return the configuration without keeping it as the root. In snapshot
+        mode the shared snapshot is returned, it must not be changed.
+
+        :param xpath: XPath expression to filter the config server-side
+        :type xpath: str
+        :param namespaces: Dict of namespace prefixes to URIs for xpath
+        :type namespaces: dict
+        :return: Data element
+        :rtype: Element
+
+        """
+
+        if self.__snapshot is not None:
+            return self.__snapshot.get_snapshot(xpath, namespaces)
+
+        return self.__get_config(xpath, namespaces)
+
+    def __get_config(
+        self, xpath: Optional[str] = "/", namespaces: Optional[dict] = None
+    ) -> Element:
+        """
+        Fetch the configuration.
+
+        :param xpath: XPath expression to filter the config server-side
+        :type xpath: str
+        :param namespaces: Dict of namespace prefixes to URIs for xpath
+        :type namespaces: dict
+        :return: Data element of the reply
+        :rtype: Element
+
+        """
+
         config = rpc_config_get(
             user=self.__user, source=self.__source, xpath=xpath, namespaces=namespaces
         )
 
-        send(self.__socket, config, pp)
-        data = read(self.__socket, pp)
-
-        self.__handle_errors(data)
-        self.__root = parse_string(data).rpc_reply.data
+        reply = self.__session.receive_element(self.__session.send(config))
 
-        if path:
-            return get_path(self.__root, path)
+        self.__handle_errors(None, root=reply)
 
-        return self.__root
+        return reply.rpc_reply.data
 
-    def __wait_for_notification(self, return_data: Optional[bool] = False) -> None:
+    def __wait_for_notification(
+        self, return_data: Optional[bool] = False, return_root: Optional[bool] = False
+    ) -> None:
         """
         Wait for the pull/push notification.
 
+        :param return_data: Return the notification
+        :type return_data: bool
+        :param return_root: Return the parsed notification
+        :type return_root: bool
         :return: None
         :rtype: None
 
         """
 
-        @timeout(self.__timeout)
-        def __wait_or_timeout() -> str:
-            data = read(self.__socket, pp, standalone=self.__standalone)
+        # One deadline for all notifications, checked while reading the
+        # socket, so it works in any thread and with sub-second timeouts
+        deadline = time.monotonic() + self.__timeout
+        idx = 0
 
-            self.__handle_errors(data)
+        while True:
+            logger.debug(f"Waiting for notification {idx} of 5")
 
-            idx = 0
-            while True:
-                logger.debug(f"Waiting for notification {idx} of 5")
+            try:
+                data = self.__session.get_notification(
+                    timeout=deadline - time.monotonic()
+                )
+            except TimeoutException:
+                raise TimeoutException(
+                    "Waiting for notification timed out after %s seconds"
+                    % self.__timeout
+                )
 
-                self.__handle_errors(data)
+            root = self.__handle_errors(data)
 
-                if "notification" in data and "SUCCESS" in data:
-                    self.__handle_errors(data)
+            if "SUCCESS" in data:
+                break
+            elif "FAILED" in data:
+                raise TransactionError("Transaction failed")
 
-                    return data
-                elif "notification" in data and "FAILED" in data:
-                    raise TransactionError("Transaction failed")
+            idx += 1
 
-                idx += 1
-
-                if idx > 5:
-                    raise ValueError(
-                        "Read too many messages without notification success"
-                    )
+            if idx > 5:
+                raise ValueError(
+                    "Read too many notifications without notification success"
+                )
 
-                data = read(self.__socket, pp, standalone=self.__standalone)
-
-        data = __wait_or_timeout()
+        if return_root:
+            return root if root is not None else parse_string(data)
 
         if return_data:
             return data
 
-    def __handle_errors(self, data: str) -> None:
+    def __handle_errors(
+        self, data: Optional[str], root: Optional[Element] = None
+    ) -> Optional[Element]:
         """
         Handle errors.
 
         :param data: Data
         :type data: str
+        :param root: Already parsed data
+        :type root: Element
+        :return: Parsed data, if it had to be parsed
+        :rtype: Optional[Element]
+
+        """
+
+        return rpc_error_get(data, standalone=self.__standalone, root=root)
+
+    def __handle_config_errors(self, data: str, config: Element) -> None:
+        """
+        Handle errors from an edit-config, the error message is prefixed with
+        the top-level subtree that caused the error when it can be found.
+
+        :param data: Data
+        :type data: str
+        :param config: Configuration sent in the edit-config
+        :type config: Element
         :return: None
         :rtype: None
 
         """
 
-        rpc_error_get(data, standalone=self.__standalone)
+        try:
+            self.__handle_errors(data)
+        except RPCError as e:
+            subtree = self.__error_subtree(data, config)
+
+            if not subtree:
+                raise
+
+            raise RPCError(f"{subtree}: {e}") from e
 
-    def __strip_rpc_reply(self, data: str) -> str:
+    def __error_subtree(self, data: str, config: Element) -> Optional[str]:
         """
-        Strip the rpc-reply tags and make the output readable.
+        Find the subtree of the configuration an error refers to.
+
+        The error-path of the reply is used if present, otherwise the
+        configuration itself is used if it only has one top-level subtree.
 
         :param data: Data
         :type data: str
-        :return: Stripped data
-        :rtype: str
+        :param config: Configuration sent in the edit-config
+        :type config: Element
+        :return: Path of the subtree, e.g. /devices/device[name='r1']
+        :rtype: Optional[str]
         """
 
-        # Remove the rpc-reply tag and make the output more readable
-        data = data.replace("&lt;", "<").replace("&gt;", ">")
-        data = data.replace('<diff xmlns="http://clicon.org/controller">', "")
-        data = data.replace("</diff>", "")
-        data = data.replace(
-            """<rpc-reply xmlns="urn:ietf:params:xml:ns:netconf:base:1.0">""", ""
-        )
-        data = data.replace("</rpc-reply>", "")
+        names = [child.origname() for child in config.get_elements()]
+        match = re.search(r"<error-path>([^<]+)</error-path>", data)
 
-        return data
+        if not match:
+            if len(names) == 1:
+                return f"/{names[0]}"
+
+            return None
+
+        # Remove namespace prefixes, /ctrl:devices/ctrl:device[ctrl:name="r1"]
+        path = re.sub(r"[\w.-]+:([\w.-]+)", r"\1", match.group(1))
+        path = path.replace("&quot;", "'").replace('"', "'")
+        steps = re.findall(r"[^/\[]+(?:\[[^\]]*\])*", path)
+
+        if not steps or steps[0] not in names:
+            return None
+
+        subtree = f"/{steps[0]}"
+
+        if len(steps) > 1 and "[" in steps[1]:
+            subtree += f"/{steps[1]}"
+
+        return subtree
 
     def __enable_transaction_notify(self) -> None:
         """
@@ -342,8 +521,7 @@ class Clixon:
             "controller-transaction", user=self.__user
         )
 
-        send(self.__socket, enable_transaction_notify, pp)
-        data = read(self.__socket, pp, standalone=self.__standalone)
+        data = self.__session.call(enable_transaction_notify)
 
         self.__handle_errors(data)
         self.__transaction_notify = True
@@ -372,8 +550,9 @@ class Clixon:
             self.__enable_transaction_notify()
 
         pull = rpc_pull(transient=transient, device=device, user=self.__user)
-        send(self.__socket, pull, pp)
+        data = self.__session.call(pull)
 
+        self.__handle_errors(data)
         self.__wait_for_notification()
 
     def push(self) -> None:
@@ -397,8 +576,9 @@ class Clixon:
         logger.debug("Pushing commit")
         push = rpc_push(user=self.__user)
 
-        send(self.__socket, push, pp)
+        data = self.__session.call(push)
 
+        self.__handle_errors(data)
         self.__wait_for_notification()
 
     def set_root(self, root: object) -> None:
@@ -417,11 +597,14 @@ class Clixon:
             return
 
         config = rpc_config_set(
-            root, user=self.__user, device=False, target=self.__target
+            root,
+            user=self.__user,
+            device=False,
+            target=self.__target,
+            delta=self.__delta,
         )
 
-        send(self.__socket, config, pp)
-        data = read(self.__socket, pp)
+        data = self.__session.call(config)
         self.__handle_errors(data)
 
         if self.__commit:
@@ -475,11 +658,10 @@ class Clixon:
         if not self.__transaction_notify:
             self.__enable_transaction_notify()
 
-        send(self.__socket, rpc, pp)
-
-        data = self.__wait_for_notification(return_data=True)
+        data = self.__session.call(rpc)
 
-        transaction = parse_string(data)
+        self.__handle_errors(data)
+        transaction = self.__wait_for_notification(return_root=True)
 
         try:
             if transaction.notification.controller_transaction.result != "SUCCESS":
@@ -487,14 +669,184 @@ class Clixon:
 
             tid = transaction.notification.controller_transaction.tid.get_data()
             rpc = rpc_device_rpc_result(tid=tid, user=self.__user)
-            send(self.__socket, rpc, pp)
-            data = read(self.__socket, pp)
+            data = self.__session.call(rpc)
 
             return parse_string(data).rpc_reply.devices
 
         except AttributeError:
             raise ValueError("Device RPC failed")
 
+    def device_rpc_many(
+        self,
+        devices: Iterable,
+        template: Optional[str] = "",
+        variables: Optional[dict] = {},
+        inline: Optional[bool] = False,
+        concurrency: Optional[int] = 10,
+        timeout: Optional[float] = None,
+    ) -> Generator:
+        """
+        Apply RPC templates to many devices, keeping up to concurrency
+        transactions in flight, and yield the results as they finish.
+
+        Each item in devices is either a device name, which gets template
+        and variables, or a tuple of device name, template and variables.
+        The notification of each transaction is matched by its tid, so
+        results are yielded in the order the devices finish.
+
+        Example:
+            for devname, result in clixon.device_rpc_many(names, "show-version"):
+                if isinstance(result, Exception):
+                    ...
+
+        :param devices: Device names or (device name, template, variables)
+        :type devices: Iterable
+        :param template: Template name or inline template string
+        :type template: str
+        :param variables: Template variables
+        :type variables: dict
+        :param inline: Use inline templates
+        :type inline: bool
+        :param concurrency: Maximum number of transactions in flight
+        :type concurrency: int
+        :param timeout: Seconds each device may take, the Clixon timeout
+                        if None
+        :type timeout: float
+        :return: Generator of (device name, devices element or exception)
+        :rtype: Generator
+
+        """
+
+        if concurrency < 1:
+            raise ValueError("concurrency must be at least 1")
+
+        if timeout is None:
+            timeout = self.__timeout
+
+        if not self.__transaction_notify:
+            self.__enable_transaction_notify()
+
+        devices = iter(devices)
+        in_flight = []
+
+        while True:
+            while len(in_flight) < concurrency:
+                item = next(devices, None)
+
+                if item is None:
+                    break
+
+                if isinstance(item, str):
+                    item = (item, template, variables)
+
+                devname, device_template, device_variables = item
+                rpc = rpc_apply_template(
+                    devname,
+                    device_template,
+                    device_variables,
+                    user=self.__user,
+                    inline=inline,
+                )
+
+                in_flight.append(
+                    {
+                        "devname": devname,
+                        "message_id": self.__session.send(rpc),
+                        "tid": None,
+                        "deadline": time.monotonic() + timeout,
+                    }
+                )
+
+            if not in_flight:
+                return
+
+            progress = False
+
+            for job in list(in_flight):
+                try:
+                    result = self.__device_rpc_step(job)
+                except Exception as e:
+                    # A timed out transaction may still send its reply and
+                    # notification, drop them when they arrive. Other errors
+                    # are raised after the awaited message was read.
+                    timed_out = isinstance(e, TimeoutException)
+
+                    if timed_out and job["tid"] is None:
+                        self.__session.discard(job["message_id"], abandon=True)
+                    elif timed_out and job["message_id"] is None:
+                        self.__session.abandon(job["tid"])
+                    else:
+                        self.__session.discard(job["message_id"])
+
+                    result = e
+
+                if result is None:
+                    continue
+
+                progress = True
+                in_flight.remove(job)
+
+                yield job["devname"], result
+
+            if progress:
+                continue
+
+            try:
+                self.__session.wait(min(job["deadline"] for job in in_flight))
+            except TimeoutException:
+                pass
+
+    def __device_rpc_step(self, job: dict) -> Optional[object]:
+        """
+        Move one device_rpc_many transaction forward using only the
+        messages already read.
+
+        :param job: State of the transaction
+        :type job: dict
+        :return: devices element when done, None while in progress
+        :rtype: Optional[object]
+
+        """
+
+        if job["tid"] is None:
+            data = self.__session.poll(job["message_id"])
+
+            if data is not None:
+                self.__handle_errors(data)
+                job["tid"] = transaction_id(data)
+                job["message_id"] = None
+
+                if job["tid"] is None:
+                    raise ValueError("Device RPC failed, no transaction ID")
+
+        if job["tid"] is not None and job["message_id"] is None:
+            data = self.__session.take_notification(
+                lambda data: transaction_id(data) == job["tid"]
+            )
+
+            if data is not None:
+                self.__handle_errors(data)
+
+                if "SUCCESS" not in data:
+                    raise TransactionError("Transaction failed")
+
+                rpc = rpc_device_rpc_result(tid=job["tid"], user=self.__user)
+                job["message_id"] = self.__session.send(rpc)
+
+        elif job["tid"] is not None:
+            data = self.__session.poll(job["message_id"])
+
+            if data is not None:
+                try:
+                    return parse_string(data).rpc_reply.devices
+                except AttributeError:
+                    raise ValueError("Device RPC failed")
+
+        if time.monotonic() >= job["deadline"]:
+            raise TimeoutException(f"Device RPC for {job['devname']} timed out")
+
+        return None
+
     def apply_template(
         self,
         devname: Optional[str] = None,
@@ -542,9 +894,7 @@ class Clixon:
         if not self.__transaction_notify:
             self.__enable_transaction_notify()
 
-        send(self.__socket, rpc, pp)
-
-        data = read(self.__socket, pp, standalone=self.__standalone)
+        data = self.__session.call(rpc)
 
         if "<ok/>" not in data:
             raise ValueError("Apply template failed")
@@ -575,17 +925,17 @@ class Clixon:
             self.__enable_transaction_notify()
 
         rpc_apply = rpc_apply_service(service, instance, diff, user=self.__user)
-        send(self.__socket, rpc_apply, pp)
+        data = self.__session.call(rpc_apply)
 
+        self.__handle_errors(data)
         self.__wait_for_notification()
 
         rpc_diff = rpc_datastore_diff(user=self.__user)
-        send(self.__socket, rpc_diff, pp)
-        data = read(self.__socket, pp, standalone=self.__standalone)
+        data = self.__session.call(rpc_diff)
 
         self.__handle_errors(data)
 
-        data = self.__strip_rpc_reply(data)
+        data = strip_rpc_reply(data)
 
         return data
 
@@ -602,11 +952,10 @@ class Clixon:
             self.set_root(self.__root)
 
         rpc_show_compare = rpc_datastore_diff(compare=True, user=self.__user)
-        send(self.__socket, rpc_show_compare, pp)
-        data = read(self.__socket, pp, standalone=self.__standalone)
+        data = self.__session.call(rpc_show_compare)
 
         self.__handle_errors(data)
-        data = self.__strip_rpc_reply(data)
+        data = strip_rpc_reply(data)
 
         return data
 
@@ -627,17 +976,11 @@ class Clixon:
             device=device, transient=True, user=self.__user
         )
 
-        send(self.__socket, rpc_show_devices_diff, pp)
-        data = read(self.__socket, pp, standalone=self.__standalone)
-
-        # If we get a tid, we need to read again to skip it. Since messages are sent asyncronously
-        # the notification status message might arrive before the transaction ID message.
-        if re.search(r'<tid xmlns="http://clicon.org/controller">(\d+)</tid>', data):
-            data = read(self.__socket, pp, standalone=self.__standalone)
+        data = self.__session.call(rpc_show_devices_diff)
 
         self.__handle_errors(data)
 
-        data = self.__strip_rpc_reply(data)
+        data = strip_rpc_reply(data)
 
         if not data:
             if dict_format:
@@ -645,32 +988,7 @@ class Clixon:
             return None
 
         if dict_format:
-            # Create a dict structure where crpd1 and crpd2 are the keys
-            # and the diff is the value
-            # crpd1:
-            #       <system xmlns="http://yang.juniper.net/junos/conf/root">
-            # -       <host-name>foobar</host-name>
-            # +       <host-name>TW6A3ZM3</host-name>
-            #       </system>
-            # crpd2:
-            #       <system xmlns="http://yang.juniper.net/junos/conf/root">
-            # -       <host-name>kalas</host-name>
-            # +       <host-name>crpd2</host-name>
-            #       </system>
-            diff = {}
-            key = None
-
-            for line in data.split("\n"):
-                if line.endswith(":") and "<" not in line and ">" not in line:
-                    key = line[:-1]
-                else:
-                    if not key:
-                        continue
-                    if key not in diff:
-                        diff[key] = ""
-                    diff[key] += line + "\n"
-
-            return diff
+            return get_devices_diff(data)
 
         return data
 
@@ -688,8 +1006,7 @@ class Clixon:
         logger.info(f"Locking configuration for target {target}")
 
         rpc = rpc_lock(target, user=self.__user)
-        send(self.__socket, rpc, pp)
-        data = read(self.__socket, pp)
+        data = self.__session.call(rpc)
 
         self.__handle_errors(data)
 
@@ -707,8 +1024,7 @@ class Clixon:
         logger.info(f"Unlocking configuration for target {target}")
 
         rpc = rpc_unlock(target, user=self.__user)
-        send(self.__socket, rpc, pp)
-        data = read(self.__socket, pp)
+        data = self.__session.call(rpc)
 
         self.__handle_errors(data)
 
@@ -727,17 +1043,18 @@ class Clixon:
             self.__enable_transaction_notify()
 
         rpc = rpc_connection_open(devname)
-        send(self.__socket, rpc, pp)
+        message_id = self.__session.send(rpc)
 
         try:
             self.__wait_for_notification()
         except Exception as e:
             logger.error(f"Failed to open connection to {devname}: {e}")
+            self.__session.discard(message_id)
             return None
 
-        data = read(self.__socket, pp, standalone=self.__standalone)
+        data = self.__session.receive(message_id)
         self.__handle_errors(data)
-        data = self.__strip_rpc_reply(data)
+        data = strip_rpc_reply(data)
 
         return data
 
@@ -755,17 +1072,14 @@ class Clixon:
         logger.info("Rollback, discard_changes")
 
         rpc = rpc_discard_changes(user=self.__user)
-        send(self.__socket, rpc, pp)
-        data = read(self.__socket, pp)
+        data = self.__session.call(rpc)
 
         self.__handle_errors(data)
 
     def show_transactions(self, tid: Optional[int] = None) -> str:
         rpc = rpc_transactions_get(tid=tid, user=self.__user)
 
-        send(self.__socket, rpc, pp)
-
-        data = read(self.__socket, pp)
+        data = self.__session.call(rpc)
 
         return data
 
@@ -774,8 +1088,7 @@ class Clixon:
         Get device names, connection states, timestamps, and log messages.
         """
         rpc = rpc_devices_get(user=self.__user)
-        send(self.__socket, rpc, pp)
-        data = read(self.__socket, pp)
+        data = self.__session.call(rpc)
         return data
 
 
@@ -1,13 +1,153 @@
+import io
 import json
 import re
-import xmltodict
+import sys
 import yaml
 
-from typing import Any, Generator, Optional
-from xml.dom import minidom
+from typing import Any, Callable, Generator, Iterable, Optional
+
+from clixon.pretty import PrettyPrinter
+
+
+def _escape_attribute(value: object) -> str:
+    """
+    Escape an attribute value for use within double quotes.
+
+    :param value: The attribute value.
+    :type value: object
+    :return: The escaped attribute value.
+    :rtype: str
+
+    """
+
+    value = str(value)
+
+    if "&" in value or "<" in value or '"' in value:
+        value = value.replace("&", "&amp;").replace("<", "&lt;").replace('"', "&quot;")
+
+    return value
+
+
+RE_XML_ENTITY = re.compile(r"&(?:(amp|lt|gt|quot|apos)|#(\d+)|#x([0-9a-fA-F]+));")
+XML_ENTITIES = {"amp": "&", "lt": "<", "gt": ">", "quot": '"', "apos": "'"}
+
+
+def _unescape_entity(match: re.Match) -> str:
+    """
+    Return the character of an XML entity or character reference.
+
+    :param match: Match of RE_XML_ENTITY
+    :type match: re.Match
+    :return: The character
+    :rtype: str
+
+    """
+
+    name, decimal, hexadecimal = match.groups()
+
+    if name:
+        return XML_ENTITIES[name]
+
+    if decimal:
+        return chr(int(decimal))
+
+    return chr(int(hexadecimal, 16))
+
+
+def _unescape(value: str) -> str:
+    """
+    Unescape the character data of an element.
+
+    :param value: The escaped character data.
+    :type value: str
+    :return: The character data.
+    :rtype: str
+
+    """
+
+    if "&" not in value:
+        return value
+
+    return RE_XML_ENTITY.sub(_unescape_entity, value)
+
+
+# Original tag names to their interned original and normalized forms
+_NAMES = {}
+
+# Number of names kept in _NAMES, it is cleared when full
+MAX_NAMES = 65536
+
+
+def normalize_name(name: str) -> tuple:
+    """
+    Return the interned original and normalized names of a tag name, e.g.
+    ("ietf-interfaces:mtu", "ietf_interfaces_mtu"). Results are cached so
+    every name is only normalized once, and all elements with the same
+    name share the same strings.
+
+    :param name: The tag name.
+    :type name: str
+    :return: Tuple of the original and the normalized name.
+    :rtype: tuple
+
+    """
+
+    names = _NAMES.get(name)
+
+    if names is None:
+        normalized = name.replace("-", "_").replace(".", "_").replace(":", "_")
+        names = (sys.intern(name), sys.intern(normalized))
+
+        if len(_NAMES) >= MAX_NAMES:
+            _NAMES.clear()
+
+        _NAMES[name] = names
+
+    return names
+
+
+def _text(value: object) -> str:
+    """
+    Return a value as escaped character data, booleans as true and false.
+
+    :param value: The value.
+    :type value: object
+    :return: The character data.
+    :rtype: str
+
+    """
+
+    if isinstance(value, bool):
+        return "true" if value else "false"
+
+    value = str(value)
+
+    if "&" in value or "<" in value or ">" in value:
+        value = value.replace("&", "&amp;").replace(">", "&gt;").replace("<", "&lt;")
+
+    return value
 
 
 class Element:
+    __slots__ = (
+        "attributes",
+        "_cdata",
+        "_children",
+        "_is_root",
+        "_origname",
+        "_name",
+        "_parent",
+        "_modified",
+        "_index",
+        "_index_generation",
+        "_dirty",
+        "_created",
+        "_keys",
+    )
+
+    # Bumped on every rename, invalidates all name indexes
+    _generation = 0
+
     def __init__(
         self,
         name: Optional[str] = "root",
@@ -32,33 +172,63 @@ class Element:
 
         """
 
-        if attributes:
-            self.attributes = attributes.copy()
-        else:
-            self.attributes = {}
-
-        self._children = []
-        self._is_root = False
-
         if data != "":
-            self.cdata = data
-        else:
-            self.cdata = cdata
-
-        self._origname = name
+            cdata = data
 
         if name:
-            name = name.replace("-", "_")
-            name = name.replace(".", "_")
-            name = name.replace(":", "_")
+            origname, name = normalize_name(name)
+        else:
+            origname = name
+
+        self._init_node(
+            origname,
+            name,
+            attributes.copy() if attributes else {},
+            cdata,
+            parent if parent else None,
+        )
 
-        self._name = name
-        self._parent = None
+    def _init_node(
+        self,
+        origname: str,
+        name: str,
+        attributes: dict,
+        cdata: str,
+        parent: Optional[object],
+    ) -> None:
+        """
+        Set every slot of a new element, the flags cleared and without
+        children. Used by __init__ and by the code creating elements with
+        __new__.
+
+        :param origname: The name of the element as given.
+        :type origname: str
+        :param name: The normalized name of the element.
+        :type name: str
+        :param attributes: The attributes of the element, not copied.
+        :type attributes: dict
+        :param cdata: The cdata of the element.
+        :type cdata: str
+        :param parent: The parent of the element.
+        :type parent: object
+        :return: None
+        :rtype: None
 
-        if parent:
-            self._parent = parent
+        """
 
+        self.attributes = attributes
+        self._cdata = cdata
+        self._children = []
+        self._is_root = False
+        self._origname = origname
+        self._name = name
+        self._parent = parent
         self._modified = False
+        self._index = None
+        self._index_generation = 0
+        self._dirty = False
+        self._created = False
+        self._keys = None
 
     def is_root(self, boolean: bool) -> None:
         """
@@ -116,8 +286,9 @@ class Element:
 
         if not element:
             element = Element(name, attributes, parent=self)
+            element._created = modified
 
-            self._modified = modified
+            self.__set_modified(modified)
 
             if data != "":
                 element.cdata = data
@@ -126,8 +297,202 @@ class Element:
 
         self._children.append(element)
 
+        if self._index is not None:
+            self._index.setdefault(element._name, []).append(element)
+
+        self.__drop_keys()
+
         return element
 
+    @classmethod
+    def from_dict(
+        cls,
+        data: dict,
+        name: Optional[str] = "root",
+        modified: Optional[bool] = True,
+    ) -> object:
+        """
+        Create a tree from nested dicts and lists, the format to_data
+        returns for each child.
+
+        Keys become elements, lists become repeated elements, dicts become
+        children and other values become the data of the element, None an
+        empty element. Keys starting with @ become attributes and #text the
+        data of the element itself.
+
+        Example:
+            root = Element.from_dict(
+                {"devices": {"device": [{"name": "r1"}, {"name": "r2"}]}}
+            )
+
+        :param data: The tree as nested dicts and lists.
+        :type data: dict
+        :param name: The name of the returned element.
+        :type name: str
+        :param modified: Mark the elements as new.
+        :type modified: bool
+        :return: The new element.
+        :rtype: Element
+
+        """
+
+        root = cls(name)
+        root.__build(root, data, modified)
+
+        return root
+
+    def create_many(
+        self,
+        name: str,
+        rows: Iterable,
+        key: Optional[str | tuple] = None,
+        modified: Optional[bool] = True,
+    ) -> list:
+        """
+        Create one element per row, e.g. the entries of a YANG list. Each
+        row is a dict converted as in from_dict, or a value for the data of
+        the element. Leaves named by key are created first in each entry,
+        as YANG requires for list keys.
+
+        Example:
+            interfaces.create_many(
+                "interface", [{"name": "eth0", "mtu": 1500}], key="name"
+            )
+
+        :param name: The name of the elements.
+        :type name: str
+        :param rows: Dicts or values, one per element.
+        :type rows: Iterable
+        :param key: Name or names of the key leaves.
+        :type key: str | tuple
+        :param modified: Mark the elements as new.
+        :type modified: bool
+        :return: The new elements.
+        :rtype: list
+
+        """
+
+        if isinstance(key, str):
+            key = (key,)
+
+        data = []
+
+        for row in rows:
+            if key and isinstance(row, dict):
+                first = {leaf: row[leaf] for leaf in key if leaf in row}
+                row = first | row
+
+            data.append(row)
+
+        return self.__build(self, {name: data}, modified)
+
+    def extend(self, elements: Iterable, modified: Optional[bool] = True) -> None:
+        """
+        Add elements to the children of the element, like add but the
+        indexes and flags are updated once for all of them.
+
+        :param elements: The elements to add.
+        :type elements: Iterable
+        :param modified: Mark the added elements as new.
+        :type modified: bool
+        :return: None
+        :rtype: None
+
+        """
+
+        elements = list(elements)
+
+        if not elements:
+            return
+
+        for element in elements:
+            element._parent = self
+
+            if modified:
+                element._created = True
+
+        self._children.extend(elements)
+        self.__index_children(elements)
+
+        if modified:
+            self.__mark_dirty()
+
+    def __build(self, parent: object, data: dict, modified: bool) -> list:
+        """
+        Create the elements of nested dicts and lists below parent without
+        recursion, see from_dict.
+
+        :param parent: The element to create the elements in.
+        :type parent: Element
+        :param data: The tree as nested dicts and lists.
+        :type data: dict
+        :param modified: Mark the elements as new.
+        :type modified: bool
+        :return: The new children of parent.
+        :rtype: list
+
+        """
+
+        created = []
+        stack = [(parent, data)]
+
+        while stack:
+            node, data = stack.pop()
+
+            for name, value in data.items():
+                if name.startswith("@"):
+                    node.attributes[name[1:]] = str(value)
+                    continue
+
+                if name == "#text":
+                    node.cdata = _text(value)
+                    continue
+
+                origname, name = normalize_name(name)
+
+                if not isinstance(value, list):
+                    value = (value,)
+
+                for item in value:
+                    child = Element.__new__(Element)
+                    child._init_node(origname, name, {}, "", node)
+                    child._created = modified
+
+                    node._children.append(child)
+
+                    if node is parent:
+                        created.append(child)
+
+                    if isinstance(item, dict):
+                        stack.append((child, item))
+                    elif item is not None:
+                        child._cdata = _text(item)
+
+        parent.__index_children(created)
+
+        if modified and created:
+            parent.__set_modified(True)
+
+        return created
+
+    def __index_children(self, children: list) -> None:
+        """
+        Add new children to the name index, if it is built, and drop the
+        keyed indexes.
+
+        :param children: The new children.
+        :type children: list
+        :return: None
+        :rtype: None
+
+        """
+
+        if self._index is not None:
+            for child in children:
+                self._index.setdefault(child._name, []).append(child)
+
+        self.__drop_keys()
+
     def rename(self, name: str, origname: str, modified: Optional[bool] = True) -> None:
         """
         Rename the element.
@@ -143,7 +508,10 @@ class Element:
 
         self._name = name
         self._origname = origname
-        self._modified = modified
+        self.__set_modified(modified)
+        self.__drop_keys()
+
+        Element._generation += 1
 
     def get_name(self) -> str:
         """
@@ -155,12 +523,14 @@ class Element:
 
         return self._name
 
-    def add(self, element: object) -> None:
+    def add(self, element: object, modified: Optional[bool] = True) -> None:
         """
         Add an element to the children of the element.
 
         :param element: The element to add.
         :type element: object
+        :param modified: Mark the added element as new.
+        :type modified: bool
         :return: None
         :rtype: None
 
@@ -168,8 +538,17 @@ class Element:
 
         element._parent = self
 
+        if modified:
+            element._created = True
+            self.__mark_dirty()
+
         self._children.append(element)
 
+        if self._index is not None:
+            self._index.setdefault(element._name, []).append(element)
+
+        self.__drop_keys()
+
     def delete(
         self,
         name: Optional[str] = "",
@@ -187,21 +566,71 @@ class Element:
         """
 
         if not name and not element:
-            self._parent.delete(element=self)
-
-        if element:
-            index = 0
-            for index, child in enumerate(self._children):
-                if id(child) == id(element):
-                    del self._children[index]
+            self._parent.delete(element=self, modified=modified)
+            return
 
         if name == "*":
-            self._children = []
-            return
-        elif name != "" and name != "*":
-            for index, child in enumerate(self._children):
-                if child._origname == name:
-                    del self._children[index]
+            self.delete_many(lambda child: True, modified=modified)
+        elif element and name:
+            self.delete_many(
+                lambda child: child is element or child._origname == name,
+                modified=modified,
+            )
+        elif element:
+            self.delete_many([element], modified=modified)
+        else:
+            self.delete_many(name, modified=modified)
+
+    def delete_many(self, match: object, modified: Optional[bool] = True) -> int:
+        """
+        Delete all children matching a predicate, a name, a list of names
+        or a list of elements. The list of children is rebuilt once, so
+        deleting many children takes linear time.
+
+        Example:
+            interfaces.delete_many(lambda entry: str(entry.name) in stale)
+
+        :param match: Function called with each child, a name, an iterable
+                      of names or an iterable of elements, elements are
+                      matched by identity.
+        :type match: object
+        :param modified: Mark the element as modified if children were
+                         deleted.
+        :type modified: bool
+        :return: The number of deleted children.
+        :rtype: int
+
+        """
+
+        if isinstance(match, str):
+            names = {match}
+            predicate = lambda child: child._origname in names
+        elif callable(match):
+            predicate = match
+        else:
+            match = list(match)
+
+            if all(isinstance(item, Element) for item in match):
+                ids = {id(item) for item in match}
+                predicate = lambda child: id(child) in ids
+            else:
+                names = set(match)
+                predicate = lambda child: child._origname in names
+
+        children = [child for child in self._children if not predicate(child)]
+        deleted = len(self._children) - len(children)
+
+        if not deleted:
+            return 0
+
+        self._children = children
+        self._index = None
+        self.__drop_keys()
+
+        if modified:
+            self.__set_modified(True)
+
+        return deleted
 
     def replace(
         self, name: str, element: object, modified: Optional[bool] = True
@@ -213,14 +642,16 @@ class Element:
         :type name: str
         :param element: The element to replace.
         :type element: object
+        :param modified: Mark the element and the new element as modified.
+        :type modified: bool
         :return: None
         :rtype: None
 
         """
 
-        self.delete(name)
-        self.add(element)
-        self._modified = modified
+        self.delete(name, modified=modified)
+        self.add(element, modified=modified)
+        self.__set_modified(modified)
 
     def set_attributes(self, attributes: dict, modified: Optional[bool] = True) -> None:
         """
@@ -234,7 +665,7 @@ class Element:
         """
 
         self.attributes = attributes
-        self._modified = modified
+        self.__set_modified(modified)
 
     def update_attributes(
         self, attributes: dict, modified: Optional[bool] = True
@@ -253,7 +684,7 @@ class Element:
         new_attributes = old_attributes | attributes
 
         self.set_attributes(new_attributes)
-        self._modified = modified
+        self.__set_modified(modified)
 
     def get_attributes(self, key: Optional[str] = None) -> Optional[dict]:
         """
@@ -286,11 +717,12 @@ class Element:
         if elements is None:
             elements = []
 
-        name = name.replace("-", "_")
+        if name:
+            name = normalize_name(name)[1]
 
         if not recursive:
             if name:
-                elements = [e for e in self._children if e._name == name]
+                elements = list(self.__named(name))
             else:
                 elements = list(self._children)
 
@@ -335,12 +767,42 @@ class Element:
 
         """
 
-        attr_string = ""
-        if self.attributes and self.attributes != {}:
-            for key in self.attributes.keys():
-                value = self.attributes[key]
-                attr_string += f' {key}="{value}"'
-        return attr_string
+        if not self.attributes:
+            return ""
+
+        return "".join(
+            f' {key}="{_escape_attribute(value)}"'
+            for key, value in self.attributes.items()
+        )
+
+    @property
+    def cdata(self) -> str:
+        """
+        The character data of the element, escaped as in the XML.
+
+        :return: The character data.
+        :rtype: str
+
+        """
+
+        return self._cdata
+
+    @cdata.setter
+    def cdata(self, cdata: str) -> None:
+        """
+        Set the character data of the element. The keyed indexes the element
+        may be a key leaf in are dropped, so assigning cdata directly keeps
+        find_entry correct.
+
+        :param cdata: The character data.
+        :type cdata: str
+        :return: None
+        :rtype: None
+
+        """
+
+        self._cdata = cdata
+        self.__drop_keys()
 
     def set_data(self, data: str, modified: Optional[bool] = True) -> None:
         """
@@ -353,7 +815,7 @@ class Element:
         """
 
         self.cdata = data
-        self._modified = modified
+        self.__set_modified(modified)
 
     def get_data(self, typecast: Optional[Any] = None) -> str:
         """
@@ -380,33 +842,105 @@ class Element:
 
         """
 
-        xmlstr = ""
-        attr_string = ""
+        return "".join(self.__iter_xml(modified))
 
-        for child in self.get_elements():
-            name = child.origname()
-            cdata = child.cdata
+    def dump(self, writer: object, modified: Optional[bool] = False) -> None:
+        """
 
-            attr_string = ""
-            attr_string = child.get_attributes_str()
+        Write the XML string of the element and its children to a writer,
+        any object with a write() method such as a file or io.StringIO.
 
-            if child.get_elements() != [] or child.cdata != "":
-                xmlstr += f"<{name}{attr_string}>"
-            else:
-                xmlstr += f"<{name}{attr_string}/>"
+        :param writer: Object to write the XML string to.
+        :type writer: object
+        :return: None
+        :rtype: None
+
+        """
+
+        write = writer.write
+
+        for xmlstr in self.__iter_xml(modified):
+            write(xmlstr)
+
+    def iterdump(
+        self, modified: Optional[bool] = False, chunk_size: Optional[int] = 65536
+    ) -> Generator:
+        """
 
-            if cdata != "":
-                xmlstr += cdata
+        Return a generator of UTF-8 encoded chunks of the XML string of the
+        element and its children. Chunks are roughly chunk_size bytes.
 
-            xmlstr += child.dumps()
+        :param chunk_size: Approximate size of each chunk.
+        :type chunk_size: int
+        :return: Generator of encoded chunks.
+        :rtype: Generator
+
+        """
+
+        chunk = []
+        size = 0
+
+        for xmlstr in self.__iter_xml(modified):
+            chunk.append(xmlstr)
+            size += len(xmlstr)
+
+            if size >= chunk_size:
+                yield "".join(chunk).encode()
+                chunk = []
+                size = 0
+
+        if chunk:
+            yield "".join(chunk).encode()
+
+    def __iter_xml(self, modified: Optional[bool] = False) -> Generator:
+        """
+
+        Return a generator of XML string pieces for the children of the
+        element. The tree is walked without recursion.
+
+        :return: Generator of XML string pieces.
+        :rtype: Generator
+
+        """
 
-            if child.get_elements() != [] or child.cdata != "":
-                xmlstr += f"</{name}>"
+        stack = [(iter(self._children), "")]
 
-                if child._modified and modified:
-                    xmlstr += " <!-- modified -->"
+        while stack:
+            children, end_tag = stack[-1]
 
-        return xmlstr
+            for child in children:
+                name = child._origname
+                if name == "":
+                    name = child._name
+
+                if child.attributes:
+                    tag = name + child.get_attributes_str()
+                else:
+                    tag = name
+
+                cdata = child._cdata
+
+                if not child._children and cdata == "":
+                    yield f"<{tag}/>"
+                    continue
+
+                child_end_tag = f"</{name}>"
+
+                # Only the direct children are marked as modified
+                if modified and child._modified and len(stack) == 1:
+                    child_end_tag += " <!-- modified -->"
+
+                if child._children:
+                    yield f"<{tag}>{cdata}"
+                    stack.append((iter(child._children), child_end_tag))
+                    break
+
+                yield f"<{tag}>{cdata}{child_end_tag}"
+            else:
+                stack.pop()
+
+                if end_tag:
+                    yield end_tag
 
     def dumps_pp(self, modified: Optional[bool] = False) -> str:
         """
@@ -417,63 +951,354 @@ class Element:
         :rtype: str
 
         """
-        in_str = self.dumps(modified)
 
-        pattern = (
-            r"<([a-zA-Z0-9\-\_]+)(\s[^>]*)?>.*?</\1>|<([a-zA-Z0-9\-\_]+)(\s[^>]*)?/>"
-        )
-        matches = list(re.finditer(pattern, in_str, flags=re.DOTALL))
+        writer = io.StringIO()
+        self.dump_pp(writer, modified)
+
+        # Drop the newline after the last line
+        return writer.getvalue()[:-1]
+
+    def dump_pp(
+        self,
+        writer: object,
+        modified: Optional[bool] = False,
+        indent: Optional[str] = "  ",
+    ) -> None:
+        """
+
+        Write a prettyprinted XML string of the children of the element to
+        a writer, any object with a write() method. The XML is indented in
+        one pass while it is serialized, several children are wrapped in an
+        <xml> element.
+
+        :param writer: Object to write the XML string to.
+        :type writer: object
+        :param indent: String to indent each level with.
+        :type indent: str
+        :return: None
+        :rtype: None
+
+        """
 
-        if len(matches) > 1:
-            in_str = "<xml>" + in_str + "</xml>"
+        printer = PrettyPrinter(writer, indent=indent)
+        wrap = len(self._children) > 1
 
-        dom = minidom.parseString(in_str)
-        outstr = dom.toprettyxml(indent="  ")
+        if wrap:
+            printer.feed("<xml>")
 
-        # If outstr endwith 0x00 (null char), remove it
-        if outstr.replace("\x00", ""):
-            outstr = outstr[:-1]
+        for xmlstr in self.__iter_xml(modified):
+            printer.feed(xmlstr)
 
-        return outstr
+        if wrap:
+            printer.feed("</xml>")
 
-    def dumpj(self) -> str:
+        printer.close()
+
+    def dumpj(self, namespaces: Optional[dict] = None) -> str:
         """
 
         Return the JSON string of the element and its children.
 
+        :param namespaces: Dict of namespace URIs to YANG module names, see
+                           to_data
+        :type namespaces: dict
         :return: The JSON string of the element and its children.
         :rtype: str
 
         """
 
-        json_data = []
+        return "".join(self.iterdumpj(namespaces))
 
-        for child in self.get_elements():
-            xmlstr = f"<{child.origname()}>" + child.dumps() + f"</{child.origname()}>"
+    def iterdumpj(self, namespaces: Optional[dict] = None) -> Generator:
+        """
+
+        Return a generator of pieces of the JSON string of the element and
+        its children, the same string as dumpj. The tree is walked without
+        recursion and no intermediate dicts are built, so very large trees
+        can be streamed.
+
+        :param namespaces: Dict of namespace URIs to YANG module names, see
+                           to_data
+        :type namespaces: dict
+        :return: Generator of JSON string pieces.
+        :rtype: Generator
+
+        """
+
+        stack = [self.__iter_json_top(namespaces)]
 
-            data_dict = xmltodict.parse(xmlstr)
-            json_data.append(data_dict)
+        while stack:
+            for piece in stack[-1]:
+                if isinstance(piece, str):
+                    yield piece
+                    continue
 
-        return json.dumps(json_data)
+                child, top, uri = piece
+                stack.append(child.__iter_json_value(top, namespaces, uri))
+                break
+            else:
+                stack.pop()
 
-    def dumpy(self) -> str:
+    def dumpy(self, namespaces: Optional[dict] = None) -> str:
         """
 
         Return the YAML string of the element and its children.
 
+        :param namespaces: Dict of namespace URIs to YANG module names, see
+                           to_data
+        :type namespaces: dict
         :return: The YAML string of the element and its children.
         :rtype: str
 
         """
-        yaml_data = []
 
-        for child in self.get_elements():
-            xmlstr = f"<{child.origname()}>" + child.dumps() + f"</{child.origname()}>"
+        return yaml.dump(self.to_data(namespaces))
+
+    def to_data(self, namespaces: Optional[dict] = None) -> list:
+        """
+
+        Return the children of the element as a list of dicts, the data
+        dumpj and dumpy serialize.
+
+        Each child becomes a dict with its name as the only key. Below that
+        attributes become "@name" keys, repeated elements become lists and
+        text next to attributes or elements becomes "#text", the way
+        xmltodict converts XML. The attributes and text of the children
+        themselves are not included.
+
+        If namespaces is given, element names are qualified with the module
+        name where the default namespace changes, as in RFC 7951 JSON
+        encoding of YANG data, and xmlns attributes are left out.
+
+        :param namespaces: Dict of namespace URIs to YANG module names.
+        :type namespaces: dict
+        :return: List of dicts.
+        :rtype: list
+
+        """
+
+        uri = self.attributes.get("xmlns")
+        data = []
+
+        for child in self._children:
+            name = child.__json_name(namespaces, uri)
+            data.append({name: child.__json_data(True, namespaces, uri)})
+
+        return data
+
+    def __json_name(self, namespaces: Optional[dict], parent_uri: Optional[str]) -> str:
+        """
+
+        Return the name of the element in to_data.
+
+        :param namespaces: Dict of namespace URIs to YANG module names.
+        :type namespaces: dict
+        :param parent_uri: Default namespace of the parent.
+        :type parent_uri: str
+        :return: The name.
+        :rtype: str
+
+        """
+
+        name = self.origname()
+
+        if namespaces is None:
+            return name
+
+        uri = self.attributes.get("xmlns", parent_uri)
+        name = name.split(":")[-1]
+
+        if uri != parent_uri and uri in namespaces:
+            return f"{namespaces[uri]}:{name}"
+
+        return name
+
+    def __json_shape(
+        self, top: bool, namespaces: Optional[dict], parent_uri: Optional[str]
+    ) -> tuple:
+        """
+
+        Return what to_data converts the element to: the attributes, the
+        children grouped by name in document order and the text.
+
+        :param top: The element is a child of the exported element, its
+                    attributes and text are left out.
+        :type top: bool
+        :param namespaces: Dict of namespace URIs to YANG module names.
+        :type namespaces: dict
+        :param parent_uri: Default namespace of the parent.
+        :type parent_uri: str
+        :return: Tuple of attribute items, dict of names to lists of
+                 children, text and the default namespace of the element.
+        :rtype: tuple
+
+        """
+
+        uri = self.attributes.get("xmlns", parent_uri)
+        attributes = []
+        text = None
+
+        if not top:
+            for key, value in self.attributes.items():
+                if namespaces is not None and (
+                    key == "xmlns" or key.startswith("xmlns:")
+                ):
+                    continue
+
+                attributes.append(("@" + key, str(value)))
+
+            text = _unescape(self.cdata).strip() or None
+
+        groups = {}
+
+        for child in self._children:
+            name = child.__json_name(namespaces, uri)
+
+            if name in groups:
+                groups[name].append(child)
+            else:
+                groups[name] = [child]
+
+        return attributes, groups, text, uri
+
+    def __json_data(
+        self, top: bool, namespaces: Optional[dict], parent_uri: Optional[str]
+    ) -> object:
+        """
+
+        Return the to_data value of the element, built without recursion.
+
+        :param top: The element is a child of the exported element.
+        :type top: bool
+        :param namespaces: Dict of namespace URIs to YANG module names.
+        :type namespaces: dict
+        :param parent_uri: Default namespace of the parent.
+        :type parent_uri: str
+        :return: The value.
+        :rtype: object
+
+        """
+
+        result = [None]
+        stack = [(self, top, parent_uri, result, 0)]
+
+        while stack:
+            element, top, parent_uri, container, key = stack.pop()
+            attributes, groups, text, uri = element.__json_shape(
+                top, namespaces, parent_uri
+            )
+
+            if not attributes and not groups:
+                container[key] = text
+                continue
+
+            value = dict(attributes)
+
+            # Keys are added in order, the values are filled in later
+            for name, children in groups.items():
+                if len(children) == 1:
+                    value[name] = None
+                    stack.append((children[0], False, uri, value, name))
+                    continue
+
+                items = [None] * len(children)
+                value[name] = items
+
+                for index, child in enumerate(children):
+                    stack.append((child, False, uri, items, index))
+
+            if text is not None:
+                value["#text"] = text
+
+            container[key] = value
+
+        return result[0]
+
+    def __iter_json_top(self, namespaces: Optional[dict]) -> Generator:
+        """
+
+        Return a generator of JSON string pieces for the list of children,
+        children are yielded as (child, top, uri) for the caller to expand.
+
+        :param namespaces: Dict of namespace URIs to YANG module names.
+        :type namespaces: dict
+        :return: Generator of JSON string pieces and children.
+        :rtype: Generator
+
+        """
+
+        uri = self.attributes.get("xmlns")
+        separator = ""
+
+        yield "["
+
+        for child in self._children:
+            name = child.__json_name(namespaces, uri)
+
+            yield f"{separator}{{{json.dumps(name)}: "
+            yield (child, True, uri)
+            yield "}"
+
+            separator = ", "
+
+        yield "]"
+
+    def __iter_json_value(
+        self, top: bool, namespaces: Optional[dict], parent_uri: Optional[str]
+    ) -> Generator:
+        """
+
+        Return a generator of JSON string pieces for the to_data value of
+        the element, children are yielded as (child, top, uri) for the
+        caller to expand.
+
+        :param top: The element is a child of the exported element.
+        :type top: bool
+        :param namespaces: Dict of namespace URIs to YANG module names.
+        :type namespaces: dict
+        :param parent_uri: Default namespace of the parent.
+        :type parent_uri: str
+        :return: Generator of JSON string pieces and children.
+        :rtype: Generator
+
+        """
+
+        attributes, groups, text, uri = self.__json_shape(top, namespaces, parent_uri)
+
+        if not attributes and not groups:
+            yield json.dumps(text)
+            return
+
+        separator = ""
 
-            data_dict = xmltodict.parse(xmlstr)
-            yaml_data.append(data_dict)
+        yield "{"
 
-        return yaml.dump(yaml_data)
+        for key, value in attributes:
+            yield f"{separator}{json.dumps(key)}: {json.dumps(value)}"
+            separator = ", "
+
+        for name, children in groups.items():
+            yield f"{separator}{json.dumps(name)}: "
+            separator = ", "
+
+            if len(children) == 1:
+                yield (children[0], False, uri)
+                continue
+
+            yield "["
+
+            for index, child in enumerate(children):
+                if index:
+                    yield ", "
+
+                yield (child, False, uri)
+
+            yield "]"
+
+        if text is not None:
+            yield f'{separator}"#text": {json.dumps(text)}'
+
+        yield "}"
 
     def parent(self) -> object:
         """
@@ -511,10 +1336,142 @@ class Element:
 
         """
 
-        self._modified = modified
+        self.__set_modified(modified)
 
         return self._modified
 
+    def __set_modified(self, modified: bool) -> None:
+        """
+        Set the modified flag, and mark the element and its parents as
+        having modified descendants.
+
+        :param modified: True or False.
+        :type modified: bool
+        :return: None
+        :rtype: None
+
+        """
+
+        self._modified = modified
+
+        if modified:
+            self.__mark_dirty()
+
+    def __mark_dirty(self) -> None:
+        """
+        Mark the element and its parents as having modified descendants.
+
+        :return: None
+        :rtype: None
+
+        """
+
+        element = self
+        while element is not None and not element._dirty:
+            element._dirty = True
+            element = element._parent
+
+    def get_dirty(self) -> bool:
+        """
+        Return True if the element or any of its descendants have been
+        modified, created or added.
+
+        :return: True if the element or any descendant has changed.
+        :rtype: bool
+
+        """
+
+        return self._dirty or self._modified or self._created
+
+    def delta(self, exclude: Optional[Callable] = None) -> Optional[object]:
+        """
+        Return a copy of the element holding only the changed subtrees.
+
+        Created and added elements are included with all of their children.
+        For every element on the path to a change, its leaves are included
+        as well so that list keys are kept and a merge still resolves. The
+        returned tree shares the unchanged leaves and the created subtrees
+        with the element, it is intended for serialization only.
+
+        :param exclude: Called with each unchanged leaf on the path to a
+                        change, the leaves it returns True for are left out.
+        :type exclude: Callable
+        :return: The changed subtrees, or None if nothing has changed.
+        :rtype: object
+
+        """
+
+        if self._created:
+            return self
+
+        children = []
+        changed = self._modified
+
+        for child in self._children:
+            if child._created or child._dirty or child._modified:
+                child_delta = child.delta(exclude)
+
+                if child_delta is not None:
+                    children.append(child_delta)
+                    changed = True
+            elif not child._children and (exclude is None or not exclude(child)):
+                children.append(child)
+
+        if not changed:
+            return None
+
+        node = Element(self._origname, self.attributes, cdata=self.cdata)
+        node._children = children
+
+        return node
+
+    def copy(self) -> object:
+        """
+        Return a deep copy of the element and its children. The copy has no
+        parent and keeps the modified flags of the element.
+
+        :return: The copy of the element.
+        :rtype: object
+
+        """
+
+        root = self.__copy_node(None)
+        stack = [(self, root)]
+
+        while stack:
+            source, target = stack.pop()
+
+            for child in source._children:
+                node = child.__copy_node(target)
+                target._children.append(node)
+
+                if child._children:
+                    stack.append((child, node))
+
+        return root
+
+    def __copy_node(self, parent: Optional[object]) -> object:
+        """
+        Return a copy of the element without its children.
+
+        :param parent: The parent of the copy.
+        :type parent: object
+        :return: The copy of the element.
+        :rtype: object
+
+        """
+
+        node = Element.__new__(Element)
+        node._init_node(
+            self._origname, self._name, self.attributes.copy(), self._cdata, parent
+        )
+        node._is_root = self._is_root
+        node._modified = self._modified
+        node._dirty = self._dirty
+        node._created = self._created
+
+        return node
+
     def get_modified(self) -> bool:
         """
         Return True if the element or any of its children have been modified.
@@ -568,6 +1525,112 @@ class Element:
 
         return self.get_elements(name=name, recursive=True)
 
+    def __named(self, name: str) -> list:
+        """
+        Return the children with the name, using the name index.
+
+        The index is built on first use and kept up to date when children
+        are added, it is dropped when children are deleted or renamed.
+
+        :param name: The name of the children.
+        :type name: str
+        :return: The children with the name.
+        :rtype: list
+
+        """
+
+        index = self._index
+
+        if index is None or self._index_generation != Element._generation:
+            index = {}
+            for child in self._children:
+                index.setdefault(child._name, []).append(child)
+
+            self._index = index
+            self._index_generation = Element._generation
+
+        return index.get(name, ())
+
+    def find_entry(self, name: str, key: str, value: str) -> Optional[object]:
+        """
+        Return the first list entry with the name where the key leaf has the
+        value, for example find_entry("device", "name", "r1").
+
+        Lookups use a keyed index which is built on first use and dropped
+        when the element, its entries or their key leaves are changed with
+        create, add, delete, rename, set_data or by assigning cdata. A hit is
+        checked against the current key leaf and the index is rebuilt if the
+        tree was changed behind its back. Entries without exactly one key
+        leaf are not indexed.
+
+        :param name: The name of the list entries.
+        :type name: str
+        :param key: The name of the key leaf.
+        :type key: str
+        :param value: The value of the key leaf.
+        :type value: str
+        :return: The list entry or None.
+        :rtype: object
+
+        """
+
+        name = normalize_name(name)[1]
+        key = normalize_name(key)[1]
+        value = str(value)
+
+        if self._keys is None:
+            self._keys = {}
+
+        entries = self._keys.get((name, key))
+
+        if entries is not None:
+            found = entries.get(value)
+
+            if found is None:
+                return None
+
+            entry, leaf = found
+
+            # The key leaf is looked up in the entry rather than checked by
+            # its parent, the leaves of a view entry belong to the base tree
+            if entry._parent is self and leaf._cdata.strip() == value:
+                leaves = entry.__named(key)
+
+                if len(leaves) == 1 and leaves[0] is leaf:
+                    return entry
+
+        entries = {}
+        for entry in self.__named(name):
+            leaves = entry.__named(key)
+            if len(leaves) == 1:
+                entries.setdefault(leaves[0]._cdata.strip(), (entry, leaves[0]))
+
+        self._keys[(name, key)] = entries
+        found = entries.get(value)
+
+        if found is None:
+            return None
+
+        return found[0]
+
+    def __drop_keys(self) -> None:
+        """
+        Drop the keyed indexes of the element, its parent and grandparent,
+        the elements whose index may hold this element as an entry or a key.
+
+        :return: None
+        :rtype: None
+
+        """
+
+        element = self
+        for _ in range(3):
+            if element is None:
+                return
+
+            element._keys = None
+            element = element._parent
+
     def __getitem__(self, key: str) -> Optional[dict]:
         """
         Return the attributes of the element.
@@ -592,12 +1655,16 @@ class Element:
 
         """
 
-        matching_children = [x for x in self._children if x._name == key]
+        # Unset slots and special method lookups must not search children
+        if key.startswith("__") or key in Element.__slots__:
+            raise AttributeError(f"'{type(self).__name__}' has no attribute '{key}'")
+
+        matching_children = self.__named(normalize_name(key)[1])
         if matching_children:
             if len(matching_children) == 1:
                 return matching_children[0]
             else:
-                return matching_children
+                return list(matching_children)
         else:
             raise AttributeError(f"'{self._name}' has no attribute '{key}'")
 
@@ -611,9 +1678,9 @@ class Element:
         :rtype: bool
         """
 
-        if name in self.__dict__:
+        if name in Element.__slots__:
             return True
-        return any(x._name == name for x in self._children)
+        return bool(self.__named(name))
 
     def __iter__(self) -> object:
         yield self
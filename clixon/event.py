@@ -1,9 +1,45 @@
+import re
+
 from typing import Callable as function, Optional
-from fnmatch import fnmatch
+from fnmatch import translate
 from clixon.args import get_logger
 
 logger = get_logger()
 
+# Number of characters at the start of an event searched for its element
+EVENT_SCAN_LEN = 512
+
+RE_EVENT_ELEMENT = re.compile(
+    r"<(?:[\w.-]+:)?(?P<root>[\w.-]+)\b[^>]*>\s*"
+    r"(?:<(?:[\w.-]+:)?eventTime\b[^>]*>[^<]*</(?:[\w.-]+:)?eventTime>\s*)?"
+    r"(?:<(?:[\w.-]+:)?(?P<child>[\w.-]+))?"
+)
+
+
+def event_element(event: str) -> Optional[str]:
+    """
+    Return the element name an event is routed on: the first child after
+    eventTime of a notification, otherwise the name of the root element.
+
+    :param event: The event.
+    :type event: str
+    :return: The element name, or None if there is none.
+    :rtype: Optional[str]
+    """
+
+    if not isinstance(event, str):
+        return None
+
+    match = RE_EVENT_ELEMENT.search(event, 0, EVENT_SCAN_LEN)
+
+    if not match:
+        return None
+
+    if match.group("root") == "notification" and match.group("child"):
+        return match.group("child")
+
+    return match.group("root")
+
 
 class RPCEventHandler():
     """
@@ -19,6 +55,8 @@ class RPCEventHandler():
         """
 
         self.events = {}
+        self.elements = {}
+        self.__patterns = {}
 
     def register(self, event: str) -> None:
         """
@@ -43,6 +81,7 @@ class RPCEventHandler():
             # If the event is not in the events dictionary, add it.
             if event not in self.events:
                 self.events[event] = []
+                self.__patterns[event] = re.compile(translate(event)).match
             self.events[event].append(callback)
 
             logger.debug(f"Registered {callback} to {event}")
@@ -50,6 +89,50 @@ class RPCEventHandler():
             return callback
         return decorator
 
+    def register_element(self, name: str) -> None:
+        """
+        Register a callback to events by element name, the first child of a
+        notification or the root element of other messages.
+
+        :param name: The element name to register to.
+        :type name: str
+        :return: None
+        :rtype: None
+        """
+
+        def decorator(callback: function) -> function:
+            """
+            A decorator to register a callback to an element name.
+            :param callback: The callback to register.
+
+            :return: The callback.
+            :rtype: function
+
+            """
+
+            self.elements.setdefault(name, []).append(callback)
+
+            logger.debug(f"Registered {callback} to element {name}")
+
+            return callback
+        return decorator
+
+    def unregister_element(self, name: str, callback: function) -> None:
+        """
+        Unregister a callback from an element name.
+
+        :param name: The element name to unregister from.
+        :type name: str
+        :param callback: The callback to unregister.
+        :type callback: function
+
+        """
+
+        if name in self.elements:
+            self.elements[name].remove(callback)
+
+            logger.debug(f"Unregistered {callback} from element {name}")
+
     def unregister(self, event: str, callback: function) -> None:
         """
         Unregister a callback from an event.
@@ -70,7 +153,8 @@ class RPCEventHandler():
              *args: Optional[dict],
              **kwargs: Optional[dict]) -> None:
         """
-        Emit an event.
+        Emit an event. Callbacks registered to the element name of the
+        event are run first, then the callbacks of matching patterns.
 
         :param event: The event to emit.
         :type event: str
@@ -85,11 +169,24 @@ class RPCEventHandler():
 
         """
 
+        found = False
+
+        if self.elements:
+            name = event_element(event)
+
+            for callback in self.elements.get(name, ()):
+                logger.debug(f"Emitting {name} to {callback}")
+                callback(*args, **kwargs)
+                found = True
+
         for k, v in self.events.items():
-            if fnmatch(event, k):
-                for callback in v:
-                    logger.debug(f"Emitting {event} to {callback}")
-                    callback(*args, **kwargs)
-        else:
-            if not_found_error:
-                raise Exception(f"Event {event} not found")
+            if not self.__patterns[k](event):
+                continue
+
+            for callback in v:
+                logger.debug(f"Emitting {k} to {callback}")
+                callback(*args, **kwargs)
+                found = True
+
+        if not found and not_found_error:
+            raise Exception(f"Event {event} not found")
@@ -1,12 +1,19 @@
 import re
 import signal
 
-from clixon.element import Element
+from functools import lru_cache
+
+from clixon.element import Element, normalize_name
 from clixon.exceptions import TimeoutException
 from typing import Iterable
 from typing import List
 from typing import Optional
 
+RE_PATH_QUOTES = re.compile(r'(\[.*?)"(.*?)"')
+RE_PATH_NODE = re.compile(r"([^\/\[\]]+|\[[^\]]+\])+")
+RE_PATH_ARG = re.compile(r"\[(.*?)\]")
+RE_PATH_PREDICATE = re.compile(r"(\S+)='(\S+)'")
+
 
 def timeout(seconds=10):
     def decorator(func):
@@ -48,20 +55,20 @@ def get_service_instance(root: Element, service_name: str, **kwargs: dict) -> El
         return None
 
     try:
-        services = root.services.get_elements(service_name)
-
-        for service in services:
-            if service.get_elements("service-name"):
-                if str(service.service_name) == kwargs["instance"]:
-                    return service
-            elif service.get_elements("instance"):
-                if str(service.instance) == kwargs["instance"]:
-                    return service
-            else:
-                continue
+        services = root.services
+        service = services.find_entry(service_name, "service-name", kwargs["instance"])
+
+        if service is not None:
+            return service
+
+        service = services.find_entry(service_name, "instance", kwargs["instance"])
     except AttributeError:
         return None
 
+    # The service-name key takes precedence over instance
+    if service is not None and not service.get_elements("service-name"):
+        return service
+
     return None
 
 
@@ -79,10 +86,8 @@ def get_devices_from_group(root: Element, device_group_name: str) -> List[str]:
     devices = []
 
     try:
-        device_groups = root.devices.device_group
-        for group in device_groups:
-            if group.name != device_group_name:
-                continue
+        group = root.devices.find_entry("device-group", "name", device_group_name)
+        if group is not None:
             return group.device_name
     except AttributeError:
         devices = []
@@ -116,19 +121,25 @@ def get_openconfig_interface_address(
     address = ""
 
     try:
-        for device in root.devices.device:
-            if device_name != "" and device_name != device.name:
+        if device_name != "":
+            devices = [root.devices.find_entry("device", "name", device_name)]
+        else:
+            devices = root.devices.device
+
+        for device in devices:
+            if device is None:
                 continue
-            for interface in device.config.configuration.interfaces.interface:
-                if interface.name != interface_name:
-                    continue
-                for unit in interface.unit:
-                    if str(unit.name) != str(interface_unit):
-                        continue
-                    if family == "" or family == "inet":
-                        address = unit.family.inet.address.name
-                    elif family == "inet6":
-                        address = unit.family.inet6.address.name
+            interfaces = device.config.configuration.interfaces
+            interface = interfaces.find_entry("interface", "name", interface_name)
+            if interface is None:
+                continue
+            unit = interface.find_entry("unit", "name", interface_unit)
+            if unit is None:
+                continue
+            if family == "" or family == "inet":
+                address = unit.family.inet.address.name
+            elif family == "inet6":
+                address = unit.family.inet6.address.name
     except AttributeError:
         return ""
 
@@ -163,14 +174,10 @@ def get_device(root: Element, name: str) -> Element:
     :rtype: Element
     """
     try:
-        for device in root.devices.device:
-            if name == str(device.name):
-                return device
+        return root.devices.find_entry("device", "name", name)
     except AttributeError:
         return None
 
-    return None
-
 
 def get_devices_configuration(
     root: Element, name: Optional[str] = ""
@@ -244,93 +251,117 @@ def is_juniper(device: Element) -> bool:
     return False
 
 
-def get_path(root: Element, path: str) -> Optional[Element]:
+@lru_cache(maxsize=1024)
+def compile_path(path: str) -> tuple:
     """
-    Returns the element at the path. Poor mans xpath.
+    Compile a path expression to a tuple of steps for get_path.
 
-    Examples:
-        get_path(root, "devices/device[0]")
-        get_path(root, "devices/device[name='r1']/config")
-        get_path(root, "services/bgp-peer[name='bgp-test']")
+    Each step is a tuple of (node, index, parameter, value) where node is
+    the normalized element name. A step which can not be parsed is None,
+    get_path returns None when it reaches it.
 
-    :param root: Root element
-    :type root: Element
     :param path: Path
     :type path: str
-    :return: Element
-    :rtype: Element
+    :return: Steps
+    :rtype: tuple
 
     """
+
     if path.startswith("/"):
         path = path[1:]
 
     # Replace any [key="value"] with [key='value']
-    path = re.sub(r'(\[.*?)"(.*?)"', r"\1'\2'", path)
-    node_re = r"([^\/\[\]]+|\[[^\]]+\])+"
+    path = RE_PATH_QUOTES.sub(r"\1'\2'", path)
 
-    new_root = None
-    nodes = re.finditer(node_re, path)
+    steps = []
 
-    for m in nodes:
+    for m in RE_PATH_NODE.finditer(path):
         node = m.group()
         index = None
         parameter = None
         value = None
 
-        arg = re.search(r"\[(.*?)\]", node)
+        arg = RE_PATH_ARG.search(node)
 
         if arg:
             if arg.group(1).isdigit():
                 index = int(arg.group(1))
                 node = node.replace(f"[{index}]", "")
             else:
-                match = re.match(r"(\S+)='(\S+)'", arg.group(1))
+                match = RE_PATH_PREDICATE.match(arg.group(1))
 
-                try:
-                    parameter = match.group(1)
-                    parameter = parameter.replace("-", "_")
-                    value = match.group(2)
-                    node = node.replace(f"[{match.group(1)}='{match.group(2)}']", "")
-                    node = node.replace("-", "_")
+                if not match:
+                    steps.append(None)
+                    break
 
-                except AttributeError:
-                    return None
+                parameter = match.group(1)
+                parameter = normalize_name(parameter)[1]
+                value = match.group(2)
+                node = node.replace(f"[{match.group(1)}='{match.group(2)}']", "")
 
-        node = node.replace("-", "_")
+        node = normalize_name(node)[1]
 
-        try:
-            if new_root is None:
-                new_root = getattr(root, node)
-            else:
-                new_root = getattr(new_root, node)
-        except AttributeError:
+        steps.append((node, index, parameter, value))
+
+    return tuple(steps)
+
+
+def get_path(root: Element, path: str) -> Optional[Element]:
+    """
+    Returns the element at the path. Poor mans xpath.
+
+    Examples:
+        get_path(root, "devices/device[0]")
+        get_path(root, "devices/device[name='r1']/config")
+        get_path(root, "services/bgp-peer[name='bgp-test']")
+
+    The path is compiled once by compile_path and cached. Steps with a
+    predicate are looked up with Element.find_entry only, without building
+    the list of children with the name.
+
+    :param root: Root element
+    :type root: Element
+    :param path: Path
+    :type path: str
+    :return: Element
+    :rtype: Element
+
+    """
+
+    new_root = None
+
+    for step in compile_path(path):
+        if step is None:
             return None
 
-        if not isinstance(new_root, list):
-            if parameter and value:
-                if getattr(new_root, parameter) != value:
-                    return None
-            if index is not None and index != 0:
-                try:
-                    new_root = new_root[index]
-                except IndexError:
-                    return None
+        node, index, parameter, value = step
 
-            continue
+        if new_root is None:
+            parent = root
         else:
-            if index is not None:
-                try:
-                    new_root = new_root[index]
-                except IndexError:
-                    return None
+            parent = new_root
 
         if parameter and value:
-            for item in new_root:
-                param_node = getattr(item, parameter)
-                if str(param_node) == value:
-                    new_root = item
-                    break
-            else:
+            try:
+                new_root = parent.find_entry(node, parameter, value)
+            except AttributeError:
+                return None
+
+            if new_root is None:
+                return None
+
+            continue
+
+        try:
+            new_root = getattr(parent, node)
+        except AttributeError:
+            return None
+
+        # A single element is its own entry 0
+        if index is not None and (isinstance(new_root, list) or index != 0):
+            try:
+                new_root = new_root[index]
+            except IndexError:
                 return None
 
     return new_root
@@ -503,3 +534,63 @@ def get_junos_interface_address(
         return None
 
     return found_addresses
+
+
+def strip_rpc_reply(data: str) -> str:
+    """
+    Strip the rpc-reply tags and make the output readable.
+
+    :param data: Data
+    :type data: str
+    :return: Stripped data
+    :rtype: str
+    """
+
+    # Remove the rpc-reply tag and make the output more readable
+    data = data.replace("&lt;", "<").replace("&gt;", ">")
+    data = data.replace('<diff xmlns="http://clicon.org/controller">', "")
+    data = data.replace("</diff>", "")
+    data = data.replace(
+        """<rpc-reply xmlns="urn:ietf:params:xml:ns:netconf:base:1.0">""", ""
+    )
+    data = data.replace("</rpc-reply>", "")
+
+    return data
+
+
+def get_devices_diff(data: str) -> dict:
+    """
+    Split a stripped devices diff into a dict with one diff per device.
+
+    :param data: Stripped devices diff
+    :type data: str
+    :return: Dict of device names to diffs
+    :rtype: dict
+    """
+
+    # Create a dict structure where crpd1 and crpd2 are the keys
+    # and the diff is the value
+    # crpd1:
+    #       <system xmlns="http://yang.juniper.net/junos/conf/root">
+    # -       <host-name>foobar</host-name>
+    # +       <host-name>TW6A3ZM3</host-name>
+    #       </system>
+    # crpd2:
+    #       <system xmlns="http://yang.juniper.net/junos/conf/root">
+    # -       <host-name>kalas</host-name>
+    # +       <host-name>crpd2</host-name>
+    #       </system>
+    diff = {}
+    key = None
+
+    for line in data.split("\n"):
+        if line.endswith(":") and "<" not in line and ">" not in line:
+            key = line[:-1]
+        else:
+            if not key:
+                continue
+            if key not in diff:
+                diff[key] = ""
+            diff[key] += line + "\n"
+
+    return diff
@@ -1,18 +1,129 @@
 import importlib.util
+import multiprocessing
 import os
 import sys
 import traceback
 
+from concurrent.futures import ProcessPoolExecutor
 from typing import List
 from typing import Optional
 
 from clixon.args import get_logger
 from clixon.clixon import Clixon
+from clixon.element import Element
 from clixon.exceptions import ModuleError
+from clixon.view import KEY_NAMES, ElementView
 
 
 logger = get_logger()
 
+# Modules and snapshots for the worker processes, set before they are forked
+__workers_state = {}
+
+
+# Hook function run for each commit result
+HOOKS = {
+    "pre-commit": "setup_pre_commit",
+    "SUCCESS": "setup_post_commit",
+    "FAILED": "setup_post_commit_failed",
+}
+
+
+class ModuleRegistry(list):
+    def __init__(self, modules: Optional[List] = None) -> None:
+        """
+        Create a list of loaded modules which is indexed on SERVICE, and
+        on the hooks the modules of each service have.
+
+        :param modules: Modules
+        :type modules: List
+        :return: None
+        :rtype: None
+
+        """
+
+        super().__init__()
+
+        self.__services = {}
+        self.__hooks = {}
+
+        if modules:
+            self.extend(modules)
+
+    def append(self, module: object) -> None:
+        """
+        Add a module.
+
+        :param module: Module
+        :type module: object
+        :return: None
+        :rtype: None
+
+        """
+
+        super().append(module)
+
+        service = getattr(module, "SERVICE", None)
+
+        self.__services.setdefault(service, []).append(module)
+
+        hooks = self.__hooks.setdefault(service, set())
+        for hook in HOOKS.values():
+            if hasattr(module, hook):
+                hooks.add(hook)
+
+    def extend(self, modules: List) -> None:
+        """
+        Add modules.
+
+        :param modules: Modules
+        :type modules: List
+        :return: None
+        :rtype: None
+
+        """
+
+        for module in modules:
+            self.append(module)
+
+    def get_modules(self, service_name: Optional[str] = None) -> List:
+        """
+        Return the modules of a service, or all modules if service_name is
+        not set.
+
+        :param service_name: Service name
+        :type service_name: str
+        :return: Modules
+        :rtype: List
+
+        """
+
+        if not service_name:
+            return list(self)
+
+        return self.__services.get(service_name, [])
+
+    def has_hook(self, service_name: str, hook: Optional[str] = None) -> bool:
+        """
+        Return True if a module of the service has the hook, or any hook if
+        hook is not set.
+
+        :param service_name: Service name
+        :type service_name: str
+        :param hook: Name of the hook function, e.g. setup_pre_commit
+        :type hook: str
+        :return: True if the hook is found
+        :rtype: bool
+
+        """
+
+        hooks = self.__hooks.get(service_name, ())
+
+        if hook is None:
+            return bool(hooks)
+
+        return hook in hooks
+
 
 def run_hooks(
     socket,
@@ -27,81 +138,40 @@ def run_hooks(
         logger.info("No modules found.")
         return
 
-    run_hooks = False
-
-    for module in modules:
-        if getattr(module, "SERVICE") != service_name:
-            continue
+    if not isinstance(modules, ModuleRegistry):
+        modules = ModuleRegistry(modules)
 
-        if (
-            hasattr(module, "setup_pre_commit")
-            or hasattr(module, "setup_post_commit")
-            or hasattr(module, "setup_post_commit_failed")
-        ):
-            run_hooks = True
+    hook = HOOKS.get(result)
 
-    if not run_hooks:
+    if hook is None or not modules.has_hook(service_name, hook):
         logger.info("No hooks found.")
         return
 
-    with Clixon(socket=socket, user=user, from_server=True) as cd:
-        for module in modules:
-            if service_name:
-                if module.SERVICE != service_name:
-                    logger.debug(f"Skipping module {module} for service {service_name}")
-                    continue
+    with Clixon(
+        socket=socket, user=user, from_server=True, snapshot=True, delta=True
+    ) as cd:
+        for module in modules.get_modules(service_name):
+            if not hasattr(module, hook):
+                continue
 
             try:
                 logger.info(f"Running hooks for module {module}")
 
-                root = cd.get_root()
-
-                # Get the SERVICE_PATH
-                get_root_xpath = None
-                get_root_namespaces = None
+                xpath, namespaces = __module_xpath(module)
+                root = cd.get_root(xpath=xpath, namespaces=namespaces)
 
-                if hasattr(module, "SERVICE_XPATH") and hasattr(
-                    module, "SERVICE_NAMESPACES"
-                ):
-                    get_root_xpath = module.SERVICE_XPATH
-                    get_root_namespaces = module.SERVICE_NAMESPACES
+                logger.debug(f"Running {result} hook for module {module}")
 
-                if get_root_xpath:
-                    root = cd.get_root(
-                        xpath=get_root_xpath, namespaces=get_root_namespaces
-                    )
+                if result == "pre-commit":
+                    module.setup_pre_commit(root, logger, instance=instance, diff=diff)
                 else:
-                    root = cd.get_root()
-
-                match result:
-                    case "pre-commit":
-                        logger.debug(f"Running pre-commit hook for module {module}")
-                        if hasattr(module, "setup_pre_commit"):
-                            module.setup_pre_commit(
-                                root, logger, instance=instance, diff=diff
-                            )
-                    case "SUCCESS":
-                        logger.debug(f"Running post-commit hook for module {module}")
-                        if hasattr(module, "setup_post_commit"):
-                            module.setup_post_commit(
-                                root,
-                                logger,
-                                instance=instance,
-                                result=result,
-                                diff=diff,
-                            )
-                    case "FAILED":
-                        logger.debug(
-                            f"Running post-commit-failed hook for module {module}"
-                        )
-                        if hasattr(module, "setup_post_commit_failed"):
-                            module.setup_post_commit_failed(
-                                root,
-                                logger,
-                                instance=instance,
-                                result=result,
-                                diff=diff,
-                            )
+                    getattr(module, hook)(
+                        root,
+                        logger,
+                        instance=instance,
+                        result=result,
+                        diff=diff,
+                    )
 
             except Exception as e:
                 logger.error(f"Module {module} failed with exception: {e}")
@@ -132,6 +202,9 @@ def run_modules(
     :return: None if all modules ran successfully, otherwise the exception
     :rtype: Optional[Exception]
 
+    The configuration is fetched once per SERVICE_XPATH and every module
+    gets its own view of it, the views are sent when all modules have run.
+
     """
     logger.debug(f"Modules: {modules}")
 
@@ -139,33 +212,19 @@ def run_modules(
         logger.info("No modules found.")
         return
 
-    with Clixon(socket=socket, user=user, from_server=True) as cd:
-        for module in modules:
-            if service_name:
-                if module.SERVICE != service_name:
-                    logger.debug(f"Skipping module {module} for service {service_name}")
-                    continue
+    if not isinstance(modules, ModuleRegistry):
+        modules = ModuleRegistry(modules)
 
+    with Clixon(
+        socket=socket, user=user, from_server=True, snapshot=True, delta=True
+    ) as cd:
+        for module in modules.get_modules(service_name):
             try:
                 logger.info(f"Running module {module}")
                 logger.debug(f"Module {module} is getting config")
 
-                # Get the SERVICE_PATH
-                get_root_xpath = None
-                get_root_namespaces = None
-
-                if hasattr(module, "SERVICE_XPATH") and hasattr(
-                    module, "SERVICE_NAMESPACES"
-                ):
-                    get_root_xpath = module.SERVICE_XPATH
-                    get_root_namespaces = module.SERVICE_NAMESPACES
-
-                if get_root_xpath:
-                    root = cd.get_root(
-                        xpath=get_root_xpath, namespaces=get_root_namespaces
-                    )
-                else:
-                    root = cd.get_root()
+                xpath, namespaces = __module_xpath(module)
+                root = cd.get_root(xpath=xpath, namespaces=namespaces)
 
                 module.setup(root, logger, instance=instance, diff=service_diff)
             except Exception as e:
@@ -175,6 +234,250 @@ def run_modules(
                 raise ModuleError(e)
 
 
+def run_modules_parallel(
+    socket,
+    modules: List,
+    instances: List[tuple],
+    service_diff: Optional[bool] = False,
+    user: Optional[str] = None,
+    workers: Optional[int] = 2,
+) -> None:
+    """
+    Run the modules for several service instances in worker processes.
+
+    The configuration is fetched once, the workers are forked with it and
+    run the modules of one instance each against their own view of it.
+    The changes of all instances are merged and sent in one edit-config,
+    two instances changing the same node is an error.
+
+    :param modules: List of modules to run
+    :type modules: List
+    :param instances: List of (service name, instance) tuples
+    :type instances: List[tuple]
+    :param service_diff: Run modules only if service is different
+    :type service_diff: bool
+    :param workers: Number of worker processes
+    :type workers: int
+    :return: None
+    :rtype: None
+
+    """
+
+    if not isinstance(modules, ModuleRegistry):
+        modules = ModuleRegistry(modules)
+
+    matched = []
+    for service_name, _ in instances:
+        for module in modules.get_modules(service_name):
+            if module not in matched:
+                matched.append(module)
+
+    if matched == []:
+        logger.info("No modules found.")
+        return
+
+    with Clixon(
+        socket=socket, user=user, from_server=True, snapshot=True, delta=True
+    ) as cd:
+        snapshots = {}
+
+        for module in matched:
+            xpath, namespaces = __module_xpath(module)
+            snapshots[module] = cd.get_snapshot(xpath=xpath, namespaces=namespaces)
+
+        __workers_state["modules"] = matched
+        __workers_state["snapshots"] = snapshots
+
+        logger.info(f"Running modules for {len(instances)} instances")
+
+        # A pool is forked per commit on purpose, the workers get the
+        # snapshots of this commit copy-on-write through fork. A pool kept
+        # for the life of the server would have to be sent the snapshots,
+        # pickling the whole configuration on every commit.
+        try:
+            context = multiprocessing.get_context("fork")
+
+            with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+                futures = [
+                    pool.submit(__run_instance, service_name, instance, service_diff)
+                    for service_name, instance in instances
+                ]
+                results = [future.result() for future in futures]
+        finally:
+            __workers_state.clear()
+
+        owners = {}
+        prefixes = {}
+        merged = Element("data")
+
+        for (service_name, instance), (deltas, paths) in zip(instances, results):
+            owner = f"{service_name}[{instance}]"
+
+            for path in paths:
+                __check_conflict(owners, prefixes, path, owner)
+
+            for delta in deltas:
+                __merge(merged, delta)
+
+        config = Element("data")
+        for child in merged.get_elements():
+            config.add(child)
+
+        cd.set_root(config)
+
+
+def __module_xpath(module: object) -> tuple:
+    """
+    Return the SERVICE_XPATH and SERVICE_NAMESPACES of a module.
+
+    :param module: Module
+    :type module: object
+    :return: Tuple of xpath and namespaces
+    :rtype: tuple
+
+    """
+
+    if hasattr(module, "SERVICE_XPATH") and hasattr(module, "SERVICE_NAMESPACES"):
+        if module.SERVICE_XPATH:
+            return module.SERVICE_XPATH, module.SERVICE_NAMESPACES
+
+    return "/", None
+
+
+def __run_instance(service_name: str, instance: str, service_diff: bool) -> tuple:
+    """
+    Run the modules for a service instance, called in a worker process.
+
+    :param service_name: Name of the service
+    :type service_name: str
+    :param instance: Instance of the service
+    :type instance: str
+    :param service_diff: Run modules only if service is different
+    :type service_diff: bool
+    :return: Tuple of the changes of each module and the changed paths
+    :rtype: tuple
+
+    """
+
+    deltas = []
+    paths = set()
+
+    for module in __workers_state["modules"]:
+        if module.SERVICE != service_name:
+            continue
+
+        root = ElementView(__workers_state["snapshots"][module])
+
+        try:
+            logger.info(f"Running module {module} for {instance}")
+            module.setup(root, logger, instance=instance, diff=service_diff)
+        except Exception as e:
+            logger.error(f"Module {module} failed with exception: {e}")
+            logger.error(traceback.format_exc())
+
+            raise ModuleError(f"{service_name}[{instance}]: {e}")
+
+        delta = root.delta()
+
+        if delta is not None:
+            deltas.append(delta.copy())
+
+        paths |= root.changed_paths()
+
+    return deltas, paths
+
+
+def __check_conflict(owners: dict, prefixes: dict, path: str, owner: str) -> None:
+    """
+    Raise ModuleError if another instance changed the path, an element
+    above it or an element below it.
+
+    :param owners: Changed paths and the instance which changed them
+    :type owners: dict
+    :param prefixes: Paths above the changed paths and the instance
+    :type prefixes: dict
+    :param path: Changed path
+    :type path: str
+    :param owner: Instance which changed the path
+    :type owner: str
+    :return: None
+    :rtype: None
+
+    """
+
+    above = [path[:i] for i in range(1, len(path)) if path[i] == "/"]
+
+    for other in [owners.get(path), prefixes.get(path)] + [
+        owners.get(p) for p in above
+    ]:
+        if other is not None and other != owner:
+            raise ModuleError(f"Conflict on {path} between {other} and {owner}")
+
+    owners[path] = owner
+
+    for p in above:
+        prefixes.setdefault(p, owner)
+
+
+def __merge(target: Element, source: Element) -> None:
+    """
+    Merge the children of source into target. List entries are matched on
+    a key leaf from KEY_NAMES, containers on their name. Of two leaves with
+    the same name the changed one is kept.
+
+    :param target: Element to merge into
+    :type target: Element
+    :param source: Element to merge from
+    :type source: Element
+    :return: None
+    :rtype: None
+
+    """
+
+    for child in source.get_elements():
+        same = target.get_elements(child.get_name())
+
+        if not child.get_elements():
+            leaves = [leaf for leaf in same if not leaf.get_elements()]
+
+            if any(leaf.get_data() == child.get_data() for leaf in leaves):
+                continue
+
+            stale = [leaf for leaf in leaves if not leaf.get_dirty()]
+
+            if not child.get_dirty():
+                if not leaves:
+                    target.add(child, modified=False)
+            elif stale:
+                stale[0].set_data(child.get_data())
+            else:
+                target.add(child, modified=False)
+
+            continue
+
+        found = None
+
+        for key in KEY_NAMES:
+            keys = child.get_elements(key)
+
+            if len(keys) != 1:
+                continue
+
+            for entry in same:
+                if [str(k) for k in entry.get_elements(key)] == [str(keys[0])]:
+                    found = entry
+                    break
+
+            break
+        else:
+            found = same[0] if same else None
+
+        if found is None:
+            target.add(child, modified=False)
+        else:
+            __merge(found, child)
+
+
 def find_modules(modulespath: str) -> List[str]:
     """
 
@@ -220,11 +523,11 @@ def load_modules(modulespath: str, modulefilter: str) -> List:
     :param modulefilter: Comma separated list of modules to skip
     :type modulefilter: str
     :return: List of loaded modules
-    :rtype: List
+    :rtype: ModuleRegistry
 
     """
 
-    loaded_modules = []
+    loaded_modules = ModuleRegistry()
     filtered = modulefilter.split(",")
 
     if not modulespath.endswith("/"):
@@ -1,8 +1,9 @@
 import getpass
+import re
 import sys
 
 from enum import Enum
-from typing import Optional
+from typing import Callable, Optional
 from xml.sax._exceptions import SAXParseException
 
 from clixon.args import get_logger
@@ -30,6 +31,14 @@ CONTROLLER_NS_URI = "http://clicon.org/controller"
 # Top-level elements in clixon-controller namespace
 CONTROLLER_ELEMENTS = ["services", "devices"]
 
+# Number of characters at the start and end of a reply scanned by rpc_error_get
+ERROR_SCAN_LEN = 512
+
+RE_REPLY_OK_START = re.compile(r"\s*<rpc-reply\b[^>]*>\s*<(?:[\w.-]+:)?(?:data|ok)\b")
+RE_REPLY_OK_END = re.compile(
+    r"(?:</(?:[\w.-]+:)?data>|<(?:[\w.-]+:)?(?:data|ok)\b[^>]*/>)\s*</rpc-reply>\s*$"
+)
+
 BASE_ATTRIBUTES = {
     "xmlns": "urn:ietf:params:xml:ns:netconf:base:1.0",
     "message-id": "42",
@@ -97,6 +106,8 @@ def rpc_config_set(
     device: Optional[bool] = False,
     target: Optional[str] = "actions",
     target_attributes: Optional[dict] = {},
+    delta: Optional[bool] = False,
+    exclude: Optional[Callable] = None,
 ) -> Element:
     """
     Create a RPC config set element.
@@ -111,6 +122,11 @@ def rpc_config_set(
     :type target: str
     :param target_attributes: Target attributes
     :type target_attributes: dict
+    :param delta: Only include the subtrees that have been changed
+    :type delta: bool
+    :param exclude: Unchanged leaves to leave out of the delta, see
+                    Element.delta
+    :type exclude: Callable
     :return: RPC element
     :rtype: Element
 
@@ -129,11 +145,24 @@ def rpc_config_set(
     root.rpc.edit_config.default_operation.cdata = "merge"
     root.rpc.edit_config.create("config")
 
+    if delta:
+        changes = config.delta(exclude)
+
+        if changes is None:
+            logger.debug("No modifications found in configuration.")
+            return root
+
+        for node in changes.get_elements():
+            root.rpc.edit_config.config.create(node.get_name(), element=node)
+            logger.debug(f"Added changes in {node.get_name()} to configuration.")
+
+        return root
+
     for node in config.get_elements():
         if node.get_name() == "devices":
             continue
 
-        root.rpc.edit_config.config.add(node)
+        root.rpc.edit_config.config.add(node, modified=False)
         logger.debug(f"Added node {node.get_name()} to configuration.")
 
     if config.get_elements("devices"):
@@ -146,7 +175,7 @@ def rpc_config_set(
                 logger.debug(
                     f"Modifications found on device {device.name.get_data()}, added to configuration."
                 )
-                root.rpc.edit_config.config.devices.add(device)
+                root.rpc.edit_config.config.devices.add(device, modified=False)
             else:
                 logger.debug(
                     f"No modifications found on device {device.name.get_data()}"
@@ -340,28 +369,92 @@ def rpc_subscription_create(
     return root
 
 
-def rpc_error_get(xmlstr: str, standalone: Optional[bool] = False) -> None:
+def rpc_reply_ok(xmlstr: str) -> bool:
     """
-    Parse the XML string and raise an exception if an error is found.
+    Return True if the XML string is a successful rpc-reply.
+
+    Only the start and the end of the string are scanned, a reply which
+    starts with data or ok and ends right after it can not hold an error.
 
     :param xmlstr: XML string
     :type xmlstr: str
+    :return: True if the reply is a successful rpc-reply
+    :rtype: bool
+
+    """
+
+    if not RE_REPLY_OK_START.match(xmlstr[:ERROR_SCAN_LEN]):
+        return False
+
+    tail = xmlstr[-ERROR_SCAN_LEN:].rstrip("\x00")
+
+    return RE_REPLY_OK_END.search(tail) is not None
+
+
+def rpc_reply_ok_tree(root: Element) -> bool:
+    """
+    Return True if the parsed tree is a successful rpc-reply.
+
+    :param root: Root element
+    :type root: Element
+    :return: True if the reply is a successful rpc-reply
+    :rtype: bool
+
+    """
+
+    replies = root.get_elements()
+
+    if len(replies) != 1 or replies[0].get_name() != "rpc_reply":
+        return False
+
+    children = replies[0].get_elements()
+
+    return children != [] and all(
+        child.get_name() in ("data", "ok") for child in children
+    )
+
+
+def rpc_error_get(
+    xmlstr: Optional[str],
+    standalone: Optional[bool] = False,
+    root: Optional[Element] = None,
+) -> Optional[Element]:
+    """
+    Parse the XML string and raise an exception if an error is found.
+
+    Successful replies are recognized without parsing. If the reply has
+    already been parsed the tree can be passed as root, it is then used
+    instead of parsing the string.
+
+    :param xmlstr: XML string, may be None if root is given
+    :type xmlstr: str
     :param standalone: Standalone mode
     :type standalone: bool
-    :return: None
-    :rtype: None
+    :param root: Already parsed reply
+    :type root: Element
+    :return: The parsed reply, or None if it was not parsed
+    :rtype: Optional[Element]
 
     """
 
-    try:
-        root = parse_string(xmlstr)
-    except SAXParseException:
-        if "client already registered" in xmlstr:
-            logger.error("Client already registered.")
-            sys.exit(1)
+    if root is not None:
+        if rpc_reply_ok_tree(root):
+            return root
 
-        logger.error("XML parse error, XML was: %s", xmlstr)
-        raise RPCError("XML parse error, XML was: %s", xmlstr)
+        if xmlstr is None:
+            xmlstr = root.dumps()
+    elif rpc_reply_ok(xmlstr):
+        return None
+    else:
+        try:
+            root = parse_string(xmlstr)
+        except SAXParseException:
+            if "client already registered" in xmlstr:
+                logger.error("Client already registered.")
+                sys.exit(1)
+
+            logger.error("XML parse error, XML was: %s", xmlstr)
+            raise RPCError("XML parse error, XML was: %s", xmlstr)
 
     if "notification xmlns" in xmlstr:
         try:
@@ -424,6 +517,8 @@ def rpc_error_get(xmlstr: str, standalone: Optional[bool] = False) -> None:
         except AttributeError:
             return None
 
+    return root
+
 
 def rpc_apply_template(
     devname: Optional[str],
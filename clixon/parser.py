@@ -1,12 +1,13 @@
 import re
 
 from typing import Optional
-from xml.dom import minidom
+from xml.parsers import expat
 from xml.sax import handler
 from xml.sax.expatreader import ExpatParser
 
 from clixon.element import Element
 from clixon.helpers import get_path
+from clixon.pretty import pretty_print
 
 try:
     from StringIO import StringIO
@@ -24,7 +25,6 @@ class Handler(handler.ContentHandler):
         """
 
         self.root = Element(None, None)
-        self.root.is_root = True
         self.elements = []
         self.last_cdata = ""
         self._parent = None
@@ -42,16 +42,15 @@ class Handler(handler.ContentHandler):
 
         """
 
-        attrs = {}
-        for k, v in attributes.items():
-            attrs[k] = v
+        element = Element(name)
 
-        element = Element(name, attrs)
+        if attributes:
+            element.attributes = dict(attributes)
 
         if len(self.elements) > 0:
-            self.elements[-1].add(element)
+            self.elements[-1].add(element, modified=False)
         else:
-            self.root.add(element)
+            self.root.add(element, modified=False)
 
         element._parent = self.elements[-1] if len(self.elements) > 0 else None
         self.elements.append(element)
@@ -93,10 +92,64 @@ class Handler(handler.ContentHandler):
         # Escape special characters
         cdata = cdata.replace("&", "&amp;").replace(">", "&gt;").replace("<", "&lt;")
 
-        self.elements[-1].cdata += cdata
+        self.elements[-1]._cdata += cdata
         self.last_cdata = cdata
 
 
+class StreamParser:
+    """
+    Incremental parser, XML data is fed as it arrives and the element tree
+    is built while the rest of the data is still being received.
+    """
+
+    def __init__(self) -> None:
+        """
+        Initialize the parser.
+
+        :return: None
+        :rtype: None
+
+        """
+
+        self.handler = Handler()
+        self.parser = expat.ParserCreate()
+        self.parser.StartElementHandler = self.handler.startElement
+        self.parser.EndElementHandler = self.handler.endElement
+        self.parser.CharacterDataHandler = self.handler.characters
+
+    def feed(self, data: bytes) -> None:
+        """
+        Feed a piece of XML data to the parser.
+
+        :param data: XML data.
+        :type data: bytes
+        :return: None
+        :rtype: None
+
+        """
+
+        # Clixon may terminate messages with a null char, remove it
+        if data[-1:] == b"\x00":
+            data = bytes(data).rstrip(b"\x00")
+
+        self.parser.Parse(data, False)
+
+    def close(self) -> Element:
+        """
+        Finish parsing and return the root element.
+
+        :return: Root element.
+        :rtype: Element
+
+        """
+
+        self.parser.Parse(b"", True)
+
+        self.handler.root.get_elements()[0]._modified = True
+
+        return self.handler.root
+
+
 def parse_file(filename: str) -> Element:
     """
     Parse an XML file and return the root element.
@@ -164,8 +217,9 @@ def dump_string(xmlstr: str, pp: Optional[bool] = False) -> str:
         outstr = outstr[:-1]
 
     if pp:
-        dom = minidom.parseString(outstr)
-        outstr = "\n" + dom.toprettyxml()
+        writer = StringIO()
+        pretty_print(outstr, writer)
+        outstr = "\n" + writer.getvalue()
 
     return outstr
 
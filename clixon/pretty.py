@@ -0,0 +1,245 @@
+from typing import Iterable, Optional
+from xml.parsers import expat
+
+
+def _escape(data: str) -> str:
+    """
+    Escape text and attribute values the way xml.dom.minidom writes them.
+
+    :param data: Text
+    :type data: str
+    :return: Escaped text
+    :rtype: str
+
+    """
+
+    if "&" in data:
+        data = data.replace("&", "&amp;")
+    if "<" in data:
+        data = data.replace("<", "&lt;")
+    if '"' in data:
+        data = data.replace('"', "&quot;")
+    if ">" in data:
+        data = data.replace(">", "&gt;")
+
+    return data
+
+
+class PrettyPrinter:
+    """
+    Indent XML in one pass with expat while it is fed, writing the result
+    to a writer as it goes.
+
+    The output is the same as xml.dom.minidom's toprettyxml() but no DOM
+    is built: elements without children are written as <name/>, elements
+    with only text are kept on one line and everything else gets a line
+    of its own.
+    """
+
+    def __init__(
+        self,
+        writer: object,
+        indent: Optional[str] = "\t",
+        newl: Optional[str] = "\n",
+    ) -> None:
+        """
+        Create a pretty printer.
+
+        :param writer: Object with a write() method, e.g. a file or
+                       io.StringIO
+        :type writer: object
+        :param indent: String to indent each level with
+        :type indent: str
+        :param newl: String to end each line with
+        :type newl: str
+        :return: None
+        :rtype: None
+
+        """
+
+        self.__write = writer.write
+        self.__indent = indent
+        self.__newl = newl
+
+        # One [name, opened, text] entry per open element, opened is True
+        # once the start tag has been closed with ">" and a newline
+        self.__stack = []
+
+        self.__parser = expat.ParserCreate()
+        self.__parser.ordered_attributes = True
+        self.__parser.buffer_text = True
+        self.__parser.StartElementHandler = self.__start
+        self.__parser.EndElementHandler = self.__end
+        self.__parser.CharacterDataHandler = self.__characters
+        self.__parser.CommentHandler = self.__comment
+
+        self.__write('<?xml version="1.0" ?>' + newl)
+
+    def feed(self, data: str | bytes) -> None:
+        """
+        Feed a piece of the XML document.
+
+        :param data: XML
+        :type data: str | bytes
+        :return: None
+        :rtype: None
+
+        """
+
+        self.__parser.Parse(data, False)
+
+    def close(self) -> None:
+        """
+        End the document, raises ExpatError if it is not complete.
+
+        :return: None
+        :rtype: None
+
+        """
+
+        self.__parser.Parse(b"", True)
+
+    def __open_parent(self) -> None:
+        """
+        Give the current element a line of its own before a child node is
+        written, writing any text it has so far on a line of its own.
+
+        :return: None
+        :rtype: None
+
+        """
+
+        if not self.__stack:
+            return
+
+        parent = self.__stack[-1]
+
+        if not parent[1]:
+            self.__write(">" + self.__newl)
+            parent[1] = True
+
+        if parent[2] is not None:
+            prefix = self.__indent * len(self.__stack)
+            self.__write(prefix + _escape(parent[2]) + self.__newl)
+            parent[2] = None
+
+    def __start(self, name: str, attributes: list) -> None:
+        """
+        Handle a start tag.
+
+        :param name: Tag name
+        :type name: str
+        :param attributes: Attribute names and values
+        :type attributes: list
+        :return: None
+        :rtype: None
+
+        """
+
+        self.__open_parent()
+
+        tag = [self.__indent * len(self.__stack), "<", name]
+
+        for index in range(0, len(attributes), 2):
+            tag.append(f' {attributes[index]}="{_escape(attributes[index + 1])}"')
+
+        self.__write("".join(tag))
+        self.__stack.append([name, False, None])
+
+    def __end(self, name: str) -> None:
+        """
+        Handle an end tag.
+
+        :param name: Tag name
+        :type name: str
+        :return: None
+        :rtype: None
+
+        """
+
+        _, opened, text = self.__stack.pop()
+
+        if not opened:
+            if text is None:
+                self.__write("/>" + self.__newl)
+            else:
+                self.__write(f">{_escape(text)}</{name}>{self.__newl}")
+
+            return
+
+        prefix = self.__indent * len(self.__stack)
+
+        if text is not None:
+            self.__write(prefix + self.__indent + _escape(text) + self.__newl)
+
+        self.__write(f"{prefix}</{name}>{self.__newl}")
+
+    def __characters(self, data: str) -> None:
+        """
+        Handle text, it is kept until the next node shows where it goes.
+
+        :param data: Text
+        :type data: str
+        :return: None
+        :rtype: None
+
+        """
+
+        if not self.__stack:
+            return
+
+        current = self.__stack[-1]
+
+        if current[2] is None:
+            current[2] = data
+        else:
+            current[2] += data
+
+    def __comment(self, data: str) -> None:
+        """
+        Handle a comment.
+
+        :param data: Comment
+        :type data: str
+        :return: None
+        :rtype: None
+
+        """
+
+        self.__open_parent()
+
+        prefix = self.__indent * len(self.__stack)
+        self.__write(f"{prefix}<!--{data}-->{self.__newl}")
+
+
+def pretty_print(
+    data: str | bytes | Iterable,
+    writer: object,
+    indent: Optional[str] = "\t",
+    newl: Optional[str] = "\n",
+) -> None:
+    """
+    Write an indented copy of an XML document to a writer.
+
+    :param data: XML document, or an iterable of pieces of it
+    :type data: str | bytes | Iterable
+    :param writer: Object with a write() method, e.g. a file or io.StringIO
+    :type writer: object
+    :param indent: String to indent each level with
+    :type indent: str
+    :param newl: String to end each line with
+    :type newl: str
+    :return: None
+    :rtype: None
+
+    """
+
+    printer = PrettyPrinter(writer, indent=indent, newl=newl)
+
+    if isinstance(data, (str, bytes)):
+        data = (data,)
+
+    for piece in data:
+        printer.feed(piece)
+
+    printer.close()
@@ -0,0 +1,474 @@
+import itertools
+import re
+import socket
+import time
+import weakref
+
+from collections import deque
+from typing import Callable, Iterable, Optional
+
+from clixon.args import get_logger
+from clixon.element import Element
+from clixon.parser import parse_string
+from clixon.sock import get_framer, log_read, parse_pieces, read, send
+
+logger = get_logger()
+
+# Number of characters at the start of a message searched for its root element
+MESSAGE_SCAN_LEN = 512
+
+# Maximum number of messages kept which are neither replies nor notifications
+MAX_UNSOLICITED = 100
+
+RE_MESSAGE_ROOT = re.compile(r"<(?:[\w.-]+:)?([\w.-]+)\b([^>]*)>")
+RE_MESSAGE_ID = re.compile(r"\bmessage-id=[\"']([^\"']*)[\"']")
+RE_TID = re.compile(r"<tid\b[^>]*>\s*(\d+)\s*</tid>")
+
+
+def message_info(data: str) -> tuple:
+    """
+    Return the root element name and message-id of a message.
+
+    :param data: Message
+    :type data: str
+    :return: Tuple of root element name and message-id, both may be None
+    :rtype: tuple
+
+    """
+
+    match = RE_MESSAGE_ROOT.search(data, 0, MESSAGE_SCAN_LEN)
+
+    if not match:
+        return None, None
+
+    message_id = RE_MESSAGE_ID.search(match.group(2))
+
+    if message_id:
+        return match.group(1), message_id.group(1)
+
+    return match.group(1), None
+
+
+def transaction_id(data: str) -> Optional[str]:
+    """
+    Return the transaction ID of a reply or a transaction notification.
+
+    :param data: Message
+    :type data: str
+    :return: Transaction ID
+    :rtype: Optional[str]
+
+    """
+
+    match = RE_TID.search(data)
+
+    if not match:
+        return None
+
+    return match.group(1)
+
+
+class Session:
+    def __init__(self, sock: socket.socket, pp: Optional[bool] = False) -> None:
+        """
+        Create a NETCONF session on a socket.
+
+        Every RPC sent gets a unique message-id and replies are matched to
+        it, so several RPCs can be in flight at once. Notifications are kept
+        in a queue of their own. Replies without a known message-id are
+        matched to the oldest RPC still waiting for a reply.
+
+        :param sock: Socket
+        :type sock: socket.socket
+        :param pp: Pretty print
+        :type pp: bool
+        :return: None
+        :rtype: None
+
+        """
+
+        self.__sock = sock
+        self.__pp = pp
+        self.__ids = itertools.count(1)
+        self.__waiting = deque()
+        self.__discarded = {}
+        self.__abandoned = set()
+        self.__replies = {}
+        self.__unsolicited = deque(maxlen=MAX_UNSOLICITED)
+        self.__notifications = deque()
+
+    def send(self, rpc: Element | str) -> Optional[str]:
+        """
+        Send an RPC and return its message-id. Messages other than RPCs,
+        e.g. hello, are sent as they are and get no message-id.
+
+        :param rpc: RPC
+        :type rpc: Element | str
+        :return: Message-id
+        :rtype: Optional[str]
+
+        """
+
+        message_id = None
+
+        if isinstance(rpc, Element) and rpc.get_elements("rpc"):
+            message_id = str(next(self.__ids))
+            rpc.rpc.update_attributes({"message-id": message_id}, modified=False)
+            self.__waiting.append(message_id)
+
+        send(self.__sock, rpc, self.__pp)
+
+        return message_id
+
+    def receive(
+        self, message_id: Optional[str] = None, timeout: Optional[float] = None
+    ) -> str:
+        """
+        Return the reply to an RPC, reading from the socket until it
+        arrives. Without a message-id the next message which is not a reply
+        to an RPC or a notification is returned.
+
+        :param message_id: Message-id returned by send
+        :type message_id: str
+        :param timeout: Seconds to wait, raise TimeoutException after that
+        :type timeout: float
+        :return: Reply
+        :rtype: str
+
+        """
+
+        deadline = self.__deadline(timeout)
+
+        while True:
+            if message_id is None:
+                if self.__unsolicited:
+                    return self.__unsolicited.popleft()
+            elif message_id in self.__replies:
+                return self.__replies.pop(message_id)
+
+            self.__read(deadline)
+
+    def receive_element(self, message_id: str) -> Element:
+        """
+        Return the reply to an RPC parsed. When the reply is the next
+        message on the socket it is parsed while it is received, so large
+        replies are never held as a string. Other messages read on the way
+        are queued as usual.
+
+        :param message_id: Message-id returned by send
+        :type message_id: str
+        :return: Root element of the reply
+        :rtype: Element
+
+        """
+
+        while True:
+            if message_id in self.__replies:
+                return parse_string(self.__replies.pop(message_id))
+
+            pieces = get_framer(self.__sock).read_pieces()
+            head = bytearray()
+            name = reply_id = None
+
+            # Read until the root element, and its message-id, is known
+            for piece in pieces:
+                head += piece
+                name, reply_id = message_info(
+                    head[:MESSAGE_SCAN_LEN].decode(errors="replace")
+                )
+
+                if name is not None or len(head) >= MESSAGE_SCAN_LEN:
+                    break
+
+            if self.__reply_to(name, reply_id) != message_id:
+                # The pieces are views of the framer's receive buffer,
+                # copy each one before the next is read
+                for piece in pieces:
+                    head += piece
+
+                self.__route(bytes(head).decode())
+                continue
+
+            self.__waiting.remove(message_id)
+
+            return parse_pieces(itertools.chain((head,), pieces), self.__pp)
+
+    def call(self, rpc: Element | str, timeout: Optional[float] = None) -> str:
+        """
+        Send an RPC and return its reply.
+
+        :param rpc: RPC
+        :type rpc: Element | str
+        :param timeout: Seconds to wait for the reply
+        :type timeout: float
+        :return: Reply
+        :rtype: str
+
+        """
+
+        return self.receive(self.send(rpc), timeout=timeout)
+
+    def pipeline(self, rpcs: Iterable) -> list:
+        """
+        Send several RPCs without waiting in between and return their
+        replies in the same order.
+
+        :param rpcs: RPCs
+        :type rpcs: Iterable
+        :return: Replies
+        :rtype: list
+
+        """
+
+        message_ids = [self.send(rpc) for rpc in rpcs]
+
+        return [self.receive(message_id) for message_id in message_ids]
+
+    def poll(self, message_id: str) -> Optional[str]:
+        """
+        Return the reply to an RPC if it has arrived, without reading from
+        the socket.
+
+        :param message_id: Message-id returned by send
+        :type message_id: str
+        :return: Reply, or None if it has not arrived
+        :rtype: Optional[str]
+
+        """
+
+        return self.__replies.pop(message_id, None)
+
+    def take_notification(self, match: Callable) -> Optional[str]:
+        """
+        Return the first queued notification match returns True for,
+        without reading from the socket. Other notifications stay queued.
+
+        :param match: Function called with each notification
+        :type match: Callable
+        :return: Notification, or None if no queued notification matched
+        :rtype: Optional[str]
+
+        """
+
+        for data in self.__notifications:
+            if match(data):
+                self.__notifications.remove(data)
+                return data
+
+        return None
+
+    def wait(self, deadline: Optional[float] = None) -> None:
+        """
+        Read one message from the socket and queue it, use poll and
+        take_notification to fetch it.
+
+        :param deadline: time.monotonic() value after which TimeoutException
+                         is raised
+        :type deadline: float
+        :return: None
+        :rtype: None
+
+        """
+
+        self.__read(deadline)
+
+    def discard(
+        self, message_id: Optional[str], abandon: Optional[bool] = False
+    ) -> None:
+        """
+        Drop the reply to an RPC, now or when it arrives.
+
+        :param message_id: Message-id returned by send
+        :type message_id: str
+        :param abandon: Also abandon the transaction the reply starts
+        :type abandon: bool
+        :return: None
+        :rtype: None
+
+        """
+
+        if message_id is None:
+            return
+
+        data = self.__replies.pop(message_id, None)
+
+        if data is not None:
+            if abandon:
+                self.abandon(transaction_id(data))
+        elif message_id in self.__waiting:
+            self.__discarded[message_id] = abandon
+
+    def abandon(self, tid: Optional[str]) -> None:
+        """
+        Drop the notification of a transaction nobody waits for anymore,
+        now or when it arrives.
+
+        :param tid: Transaction ID
+        :type tid: str
+        :return: None
+        :rtype: None
+
+        """
+
+        if tid is None:
+            return
+
+        for data in self.__notifications:
+            if transaction_id(data) == tid:
+                self.__notifications.remove(data)
+                return
+
+        self.__abandoned.add(tid)
+
+    def get_notification(self, timeout: Optional[float] = None) -> str:
+        """
+        Return the next notification, reading from the socket until one
+        arrives.
+
+        :param timeout: Seconds to wait, raise TimeoutException after that
+        :type timeout: float
+        :return: Notification
+        :rtype: str
+
+        """
+
+        deadline = self.__deadline(timeout)
+
+        while not self.__notifications:
+            self.__read(deadline)
+
+        return self.__notifications.popleft()
+
+    def __deadline(self, timeout: Optional[float]) -> Optional[float]:
+        """
+        Return the time.monotonic() value a timeout expires at.
+
+        :param timeout: Seconds, None to wait forever
+        :type timeout: float
+        :return: Deadline
+        :rtype: Optional[float]
+
+        """
+
+        if timeout is None:
+            return None
+
+        return time.monotonic() + timeout
+
+    def __read(self, deadline: Optional[float] = None) -> None:
+        """
+        Read one message from the socket and queue it.
+
+        :param deadline: time.monotonic() value to wait until
+        :type deadline: float
+        :return: None
+        :rtype: None
+
+        """
+
+        self.__route(read(self.__sock, self.__pp, deadline=deadline), log=False)
+
+    def __reply_to(
+        self, name: Optional[str], message_id: Optional[str]
+    ) -> Optional[str]:
+        """
+        Return the message-id of the RPC a message is the reply to, replies
+        without a known message-id belong to the oldest waiting RPC.
+
+        :param name: Root element name of the message
+        :type name: str
+        :param message_id: Message-id of the message
+        :type message_id: str
+        :return: Message-id of the RPC, or None if it is not a reply
+        :rtype: Optional[str]
+
+        """
+
+        if name == "notification":
+            return None
+
+        if message_id in self.__waiting:
+            return message_id
+
+        if name != "rpc-reply" or not self.__waiting:
+            return None
+
+        logger.debug(f"Reply without known message-id {message_id}")
+
+        return self.__waiting[0]
+
+    def __route(self, data: str, log: Optional[bool] = True) -> None:
+        """
+        Queue a message read from the socket.
+
+        :param data: Message
+        :type data: str
+        :param log: Log the message, read() has already logged it
+        :type log: bool
+        :return: None
+        :rtype: None
+
+        """
+
+        if log:
+            log_read(data, self.__pp)
+
+        name, message_id = message_info(data)
+
+        if name == "notification":
+            tid = transaction_id(data)
+
+            if tid in self.__abandoned:
+                self.__abandoned.remove(tid)
+                return
+
+            self.__notifications.append(data)
+            return
+
+        reply_to = self.__reply_to(name, message_id)
+
+        # Replies nobody waits for are never asked for, e.g. a late reply
+        if reply_to is None and name == "rpc-reply":
+            logger.debug(f"Dropping reply to unknown message {message_id}")
+            return
+
+        if reply_to is None:
+            self.__unsolicited.append(data)
+            return
+
+        message_id = reply_to
+        self.__waiting.remove(message_id)
+
+        if message_id in self.__discarded:
+            if self.__discarded.pop(message_id):
+                self.abandon(transaction_id(data))
+
+            return
+
+        self.__replies[message_id] = data
+
+
+_sessions = weakref.WeakKeyDictionary()
+
+
+def get_session(sock: socket.socket, pp: Optional[bool] = False) -> Session:
+    """
+    Return the session for a socket, create it if needed. All reads from a
+    socket must go through its session.
+
+    :param sock: Socket
+    :type sock: socket.socket
+    :param pp: Pretty print
+    :type pp: bool
+    :return: Session
+    :rtype: Session
+
+    """
+
+    session = _sessions.get(sock)
+
+    if session is None:
+        session = Session(sock, pp)
+        _sessions[sock] = session
+
+    return session
@@ -0,0 +1,189 @@
+import re
+
+from typing import Callable, Optional
+
+from clixon.args import get_logger
+from clixon.element import Element
+from clixon.view import ElementView
+
+logger = get_logger()
+
+RE_XPATH_STEP = re.compile(r"^(?:([\w.-]+):)?([\w.-]+)$")
+
+
+def select(root: Element, xpath: str, namespaces: Optional[dict] = None):
+    """
+    Select the nodes of an xpath from a snapshot of the whole configuration,
+    the way get-config would return them: the matching nodes with their
+    ancestors.
+
+    Only absolute paths of plain node names, optionally with a prefix from
+    namespaces, are supported, e.g. /services/l2c:l2c. Every step but the
+    last must match exactly one node.
+
+    :param root: Data element of a snapshot of the whole configuration
+    :type root: Element
+    :param xpath: XPath expression
+    :type xpath: str
+    :param namespaces: Dict of namespace prefixes to URIs
+    :type namespaces: dict
+    :return: New data element, or None if the xpath is not supported
+    :rtype: Optional[Element]
+
+    """
+
+    if not xpath.startswith("/") or xpath == "/":
+        return None
+
+    steps = []
+
+    for step in xpath[1:].split("/"):
+        match = RE_XPATH_STEP.match(step)
+
+        if not match:
+            return None
+
+        prefix, name = match.groups()
+
+        if prefix:
+            if not namespaces or prefix not in namespaces:
+                return None
+
+            steps.append((name, namespaces[prefix]))
+        else:
+            steps.append((name, None))
+
+    parents = [(root, root.get_attributes("xmlns"), ())]
+
+    for depth, (name, uri) in enumerate(steps):
+        matches = []
+
+        for parent, parent_uri, chain in parents:
+            for child in parent.get_elements():
+                if child.origname().split(":")[-1] != name:
+                    continue
+
+                child_uri = child.get_attributes("xmlns") or parent_uri
+
+                if uri is not None and child_uri != uri:
+                    continue
+
+                matches.append((child, child_uri, chain + (child,)))
+
+        if depth < len(steps) - 1 and len(matches) > 1:
+            return None
+
+        parents = matches
+
+    data = Element(root.origname(), root.attributes, cdata=root.cdata)
+
+    if not parents:
+        return data
+
+    # Every step but the last has a single match, the ancestors are shared
+    node = data
+    for ancestor in parents[0][2][:-1]:
+        node = node.create(
+            ancestor.origname(),
+            attributes=ancestor.attributes,
+            cdata=ancestor.cdata,
+            modified=False,
+        )
+
+    for child, _, _ in parents:
+        node.add(child.copy(), modified=False)
+
+    return data
+
+
+class Snapshot:
+    def __init__(self, fetch: Callable) -> None:
+        """
+        Create a snapshot cache for one transaction.
+
+        The configuration is fetched once per distinct xpath and namespaces,
+        narrower paths are selected locally from a snapshot of the whole
+        configuration when there is one. Every call to get_root returns an
+        isolated copy-on-write view of the snapshot.
+
+        :param fetch: Function fetching the data element for an xpath,
+                      called as fetch(xpath, namespaces)
+        :type fetch: Callable
+        :return: None
+        :rtype: None
+
+        """
+
+        self.__fetch = fetch
+        self.__snapshots = {}
+        self.__roots = []
+
+    def get_root(
+        self, xpath: Optional[str] = "/", namespaces: Optional[dict] = None
+    ) -> Element:
+        """
+        Return a view of the snapshot for the xpath.
+
+        :param xpath: XPath expression
+        :type xpath: str
+        :param namespaces: Dict of namespace prefixes to URIs
+        :type namespaces: dict
+        :return: Data element
+        :rtype: Element
+
+        """
+
+        root = ElementView(self.get_snapshot(xpath, namespaces))
+        self.__roots.append(root)
+
+        return root
+
+    def get_snapshot(
+        self, xpath: Optional[str] = "/", namespaces: Optional[dict] = None
+    ) -> Element:
+        """
+        Return the snapshot for the xpath, it is shared and must not be
+        changed.
+
+        :param xpath: XPath expression
+        :type xpath: str
+        :param namespaces: Dict of namespace prefixes to URIs
+        :type namespaces: dict
+        :return: Data element
+        :rtype: Element
+
+        """
+
+        if namespaces:
+            key = (xpath, tuple(sorted(namespaces.items())))
+        else:
+            key = (xpath, None)
+
+        snapshot = self.__snapshots.get(key)
+
+        if snapshot is None:
+            full = self.__snapshots.get(("/", None))
+
+            if full is not None:
+                snapshot = select(full, xpath, namespaces)
+
+            if snapshot is None:
+                logger.debug(f"Fetching snapshot for {xpath}")
+                snapshot = self.__fetch(xpath, namespaces)
+            else:
+                logger.debug(f"Selected {xpath} from snapshot")
+
+            self.__snapshots[key] = snapshot
+
+        return snapshot
+
+    def get_roots(self) -> list:
+        """
+        Return the views handed out by get_root, in order.
+
+        :return: List of data elements
+        :rtype: list
+
+        """
+
+        return self.__roots
@@ -1,15 +1,146 @@
-import re
+import logging
+import os
 import select
 import socket
+import time
+import weakref
 
 from clixon.args import get_logger
 from clixon.element import Element
-from clixon.parser import dump_string
-from typing import Optional
+from clixon.exceptions import TimeoutException
+from clixon.parser import StreamParser, dump_string
+from typing import Generator, Iterable, Optional
 
 
 logger = get_logger()
 
+# Marker yielded by FrameDecoder.feed() when a complete message has been read
+END_OF_MESSAGE = object()
+
+# Size of the receive buffer used by Framer
+RECV_BUFSIZE = 65536
+
+# Longest header we accept, "\n#" + 10 digits + "\n" plus some slack
+MAX_HEADER_LEN = 64
+
+
+class PayloadTrace:
+    """
+    Sampled and size capped logging of payloads when debug is not enabled.
+
+    Every sample:th message is logged at INFO level with at most max_bytes
+    of its payload. No pretty printing is done so tracing never parses the
+    payload a second time. Defaults are read from PYAPI_TRACE_BYTES and
+    PYAPI_TRACE_SAMPLE, a max_bytes of 0 disables tracing.
+    """
+
+    def __init__(self, max_bytes: Optional[int] = 0, sample: Optional[int] = 1):
+        """
+        Initialize the payload trace.
+
+        :param max_bytes: Maximum number of payload bytes to log
+        :type max_bytes: int
+        :param sample: Log every sample:th message
+        :type sample: int
+        :return: None
+        :rtype: None
+
+        """
+
+        self.max_bytes = max_bytes
+        self.sample = max(sample, 1)
+        self.count = 0
+
+    def sampled(self) -> bool:
+        """
+        Return True if the current message should be traced.
+
+        :return: True if the message should be traced
+        :rtype: bool
+
+        """
+
+        if self.max_bytes <= 0:
+            return False
+
+        self.count += 1
+
+        return self.count % self.sample == 0
+
+    def log(self, direction: str, datalen: int, data: bytes | str) -> None:
+        """
+        Log a message payload, truncated to max_bytes.
+
+        :param direction: Read or Send
+        :type direction: str
+        :param datalen: Length of the complete payload
+        :type datalen: int
+        :param data: Payload, or the beginning of it
+        :type data: bytes | str
+        :return: None
+        :rtype: None
+
+        """
+
+        if isinstance(data, (bytes, bytearray, memoryview)):
+            data = bytes(data[: self.max_bytes]).decode(errors="replace")
+        else:
+            data = data[: self.max_bytes]
+
+        if datalen > self.max_bytes:
+            data += f"... ({datalen - self.max_bytes} more bytes)"
+
+        logger.info(f"{direction}: len={datalen} data={data}")
+
+
+def _env_int(name: str, default: int) -> int:
+    """
+    Return an integer from the environment, or the default if it is not set
+    or not an integer.
+
+    :param name: Name of the environment variable
+    :type name: str
+    :param default: Default value
+    :type default: int
+    :return: Value
+    :rtype: int
+    """
+
+    value = os.environ.get(name)
+
+    if value is None:
+        return default
+
+    try:
+        return int(value)
+    except ValueError:
+        logger.warning(f"Invalid {name}={value!r}, using {default}")
+        return default
+
+
+payload_trace = PayloadTrace(
+    _env_int("PYAPI_TRACE_BYTES", 0),
+    _env_int("PYAPI_TRACE_SAMPLE", 1),
+)
+
+
+def set_payload_trace(max_bytes: int, sample: Optional[int] = 1) -> None:
+    """
+    Configure sampled payload tracing.
+
+    :param max_bytes: Maximum number of payload bytes to log, 0 disables
+    :type max_bytes: int
+    :param sample: Log every sample:th message
+    :type sample: int
+    :return: None
+    :rtype: None
+
+    """
+
+    payload_trace.max_bytes = max_bytes
+    payload_trace.sample = max(sample, 1)
+    payload_trace.count = 0
+
 
 class SocketClosedError(Exception):
     """
@@ -19,6 +150,337 @@ class SocketClosedError(Exception):
     pass
 
 
+class FramingError(Exception):
+    """
+    Raised when the peer sends data that is not valid chunked framing.
+    """
+
+    pass
+
+
+class FrameDecoder:
+    """
+    Incremental decoder for RFC 6242 chunked framing.
+
+    The decoder does not do any I/O, received bytes are fed to it and it
+    yields the payload of each chunk as it arrives.
+    """
+
+    def __init__(self) -> None:
+        """
+        Initialize the decoder.
+
+        :return: None
+        :rtype: None
+
+        """
+
+        self._header = bytearray()
+        self._remaining = 0
+
+    def feed(self, data: bytes) -> Generator:
+        """
+        Feed received bytes to the decoder.
+
+        Yields payload pieces as memoryview slices of data, and
+        END_OF_MESSAGE when the end-of-chunks marker is seen. The slices
+        are only valid until data is modified by the caller.
+
+        :param data: Received bytes
+        :type data: bytes
+        :return: Generator of payload pieces and END_OF_MESSAGE
+        :rtype: Generator
+
+        """
+
+        view = memoryview(data)
+        datalen = len(view)
+        pos = 0
+
+        while pos < datalen:
+            if self._remaining:
+                end = min(pos + self._remaining, datalen)
+                self._remaining -= end - pos
+
+                yield view[pos:end]
+
+                pos = end
+                continue
+
+            # Headers are only a few bytes, read them one byte at a time
+            byte = view[pos]
+            pos += 1
+
+            self._header.append(byte)
+
+            if len(self._header) > MAX_HEADER_LEN:
+                raise FramingError(f"Invalid chunk header: {bytes(self._header)}")
+
+            if byte != 0x0A:
+                continue
+
+            start = self._header.find(b"\n#")
+
+            if start == -1 or start + 2 >= len(self._header):
+                continue
+
+            token = bytes(self._header[start + 2 : -1])
+            self._header.clear()
+
+            if token == b"#":
+                yield END_OF_MESSAGE
+            elif token.isdigit() and int(token) > 0:
+                self._remaining = int(token)
+            else:
+                raise FramingError(f"Invalid chunk size: {token}")
+
+
+class Framer:
+    """
+    Read and write chunk framed messages on a socket.
+
+    One Framer is kept per socket since bytes belonging to the next
+    message may already have been received when a message is complete.
+    """
+
+    def __init__(self, sock: socket.socket, bufsize: Optional[int] = RECV_BUFSIZE):
+        """
+        Initialize the framer.
+
+        :param sock: Socket to read from and write to
+        :type sock: socket.socket
+        :param bufsize: Size of the receive buffer
+        :type bufsize: int
+        :return: None
+        :rtype: None
+
+        """
+
+        self.sock = sock
+        self._decoder = FrameDecoder()
+        self._buffer = bytearray(bufsize)
+        self._view = memoryview(self._buffer)
+        self._events = None
+        self._deadline = None
+        self._partial = bytearray()
+        self._skip = False
+
+    def __recv(self) -> memoryview:
+        """
+        Wait for the socket to become readable and receive data into the
+        receive buffer.
+
+        :return: Received data
+        :rtype: memoryview
+
+        """
+
+        while True:
+            if self._deadline is None:
+                readable, _, _ = select.select([self.sock], [], [])
+            else:
+                remaining = self._deadline - time.monotonic()
+
+                if remaining <= 0:
+                    raise TimeoutException("Timed out waiting for data")
+
+                readable, _, _ = select.select([self.sock], [], [], remaining)
+
+            if not readable:
+                continue
+
+            try:
+                nbytes = self.sock.recv_into(self._view)
+            except (BlockingIOError, InterruptedError):
+                continue
+
+            if not nbytes:
+                raise SocketClosedError("Socket closed")
+
+            return self._view[:nbytes]
+
+    def __stream(self) -> Generator:
+        """
+        Generator of decoder events for everything read from the socket.
+
+        :return: Generator of payload pieces and END_OF_MESSAGE
+        :rtype: Generator
+
+        """
+
+        while True:
+            yield from self._decoder.feed(self.__recv())
+
+    def read_pieces(self, deadline: Optional[float] = None) -> Generator:
+        """
+        Read one message and yield its payload as it arrives.
+
+        The pieces are only valid until the next piece is requested. A
+        message cut by a timeout in read_message is continued, the part
+        read before is yielded first. If the generator is closed before the
+        end of the message, the rest of the message is skipped by the next
+        read.
+
+        :param deadline: time.monotonic() value after which TimeoutException
+                         is raised, wait forever if None
+        :type deadline: float
+        :return: Generator of payload pieces
+        :rtype: Generator
+
+        """
+
+        self._deadline = deadline
+
+        if self._events is None:
+            self._events = self.__stream()
+
+        complete = False
+
+        if self._partial:
+            partial = bytes(self._partial)
+            self._partial = bytearray()
+
+            yield partial
+
+        try:
+            for event in self._events:
+                if event is END_OF_MESSAGE:
+                    if self._skip:
+                        self._skip = False
+                        continue
+
+                    complete = True
+                    return
+
+                if not self._skip:
+                    yield event
+        except Exception:
+            self._events = None
+            raise
+        finally:
+            if not complete and self._events is not None:
+                self._skip = True
+
+    def read_message(self, deadline: Optional[float] = None) -> bytes:
+        """
+        Read one complete message.
+
+        If the deadline passes in the middle of a message, the part read so
+        far is kept and the next call continues with it.
+
+        :param deadline: time.monotonic() value after which TimeoutException
+                         is raised, wait forever if None
+        :type deadline: float
+        :return: Message payload
+        :rtype: bytes
+
+        """
+
+        message = bytearray()
+
+        try:
+            for piece in self.read_pieces(deadline):
+                message += piece
+        except TimeoutException:
+            self._partial = message
+            raise
+
+        return bytes(message)
+
+    def write_message(self, data: bytes) -> int:
+        """
+        Frame a message as a single chunk and send it.
+
+        :param data: Message payload
+        :type data: bytes
+        :return: Number of bytes sent
+        :rtype: int
+
+        """
+
+        sent = self.write(b"\n#%d\n" % len(data))
+        sent += self.write(data)
+        sent += self.write(b"\n##\n")
+
+        return sent
+
+    def write_chunks(self, pieces: Iterable) -> int:
+        """
+        Send a message as one chunk per piece, without joining the pieces.
+
+        :param pieces: Iterable of message payload pieces
+        :type pieces: Iterable
+        :return: Number of bytes sent
+        :rtype: int
+
+        """
+
+        sent = 0
+
+        for piece in pieces:
+            if not piece:
+                continue
+
+            sent += self.write(b"\n#%d\n" % len(piece))
+            sent += self.write(piece)
+
+        sent += self.write(b"\n##\n")
+
+        return sent
+
+    def write(self, data: bytes) -> int:
+        """
+        Send all of data to the socket.
+
+        :param data: Data to send
+        :type data: bytes
+        :return: Number of bytes sent
+        :rtype: int
+
+        """
+
+        view = memoryview(data)
+        datalen = len(view)
+        sent_total = 0
+
+        while sent_total < datalen:
+            _, writable, _ = select.select([], [self.sock], [])
+
+            if not writable:
+                logger.debug("No data available")
+                continue
+
+            try:
+                sent_total += int(self.sock.send(view[sent_total:]))
+            except (BlockingIOError, InterruptedError):
+                continue
+
+        return sent_total
+
+
+_framers = weakref.WeakKeyDictionary()
+
+
+def get_framer(sock: socket.socket) -> Framer:
+    """
+    Return the framer for a socket, create it if needed.
+
+    :param sock: Socket
+    :type sock: socket.socket
+    :return: Framer
+    :rtype: Framer
+
+    """
+
+    framer = _framers.get(sock)
+
+    if framer is None:
+        framer = Framer(sock)
+        _framers[sock] = framer
+
+    return framer
+
+
 def create_socket(sockpath: str) -> socket.socket:
     """
     Create a socket and connect to the socket path.
@@ -40,73 +502,133 @@ def create_socket(sockpath: str) -> socket.socket:
 
 
 def read(
-    sock: socket.socket, pp: Optional[bool] = False, standalone: Optional[bool] = False
+    sock: socket.socket,
+    pp: Optional[bool] = False,
+    standalone: Optional[bool] = False,
+    timeout: Optional[float] = None,
+    deadline: Optional[float] = None,
 ) -> str:
     """
     Read from the socket and return the data.
 
+    The timeout only applies to this socket and thread, no signals are
+    used, so every session can have a timeout of its own.
+
     :param sock: Socket to read from
     :type sock: socket.socket
     :param pp: Pretty print the data
     :type pp: bool
     :param standalone: If True, raise an exception if the data is an error
     :type standalone: bool
+    :param timeout: Seconds to wait for the message, wait forever if None
+    :type timeout: float
+    :param deadline: time.monotonic() value to wait until, instead of timeout
+    :type deadline: float
     :return: Data read from the socket
     :rtype: str
     """
 
-    data = b""
-    chunk_len = 0
+    if deadline is None and timeout is not None:
+        deadline = time.monotonic() + timeout
 
-    re_chunk_size = r"\n#(\d+)\n"
+    data = get_framer(sock).read_message(deadline).decode()
 
-    while True:
-        readable, _, _ = select.select([sock], [], [])
+    log_read(data, pp)
 
-        if not readable:
-            continue
+    return data
 
-        if not chunk_len:
-            chunk_len = re.search(re_chunk_size, data.decode())
 
-            if chunk_len:
-                chunk_len = int(chunk_len.group(1))
-                logger.debug(f"Found chunk length: {chunk_len}")
-                data = b""
-            else:
-                tmpdata = sock.recv(1)
+def log_read(data: str, pp: Optional[bool] = False) -> None:
+    """
+    Log a message read from a socket, when debug or tracing is enabled.
 
-                if not tmpdata:
-                    raise SocketClosedError("Socket closed")
+    :param data: Message
+    :type data: str
+    :param pp: Pretty print the data
+    :type pp: bool
+    :return: None
+    :rtype: None
+    """
 
-                data += tmpdata
-        else:
-            if len(data) < int(chunk_len):
-                data += sock.recv(chunk_len - len(data) + 3)
-            else:
-                break
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Read:")
+        logger.debug(f"  len={len(data)}")
+        logger.debug("  data=" + dump_string(data, pp=pp))
+    elif payload_trace.sampled():
+        payload_trace.log("Read", len(data), data)
 
-    if data[-3:] == b"\n##":
-        data = data[:-3]
 
-    if isinstance(data, bytes):
-        data = data.decode()
+def read_element(sock: socket.socket, pp: Optional[bool] = False) -> Element:
+    """
+    Read from the socket and parse the data while it is received.
 
-    logger.debug("Read:")
-    logger.debug(f"  len={chunk_len}")
-    logger.debug("  data=" + dump_string(data, pp=pp))
+    :param sock: Socket to read from
+    :type sock: socket.socket
+    :param pp: Pretty print the data
+    :type pp: bool
+    :return: Root element of the data read from the socket
+    :rtype: Element
+    """
 
-    return data
+    return parse_pieces(get_framer(sock).read_pieces(), pp)
+
+
+def parse_pieces(pieces: Iterable, pp: Optional[bool] = False) -> Element:
+    """
+    Parse the pieces of a message while they are received.
+
+    :param pieces: Pieces of the message, e.g. from Framer.read_pieces
+    :type pieces: Iterable
+    :param pp: Pretty print the data
+    :type pp: bool
+    :return: Root element of the message
+    :rtype: Element
+    """
+
+    debug = logger.isEnabledFor(logging.DEBUG)
+    trace = None
+
+    if not debug and payload_trace.sampled():
+        trace = bytearray()
 
+    parser = StreamParser()
+    datalen = 0
 
-def send(sock: socket.socket, data: str, pp: Optional[bool] = False) -> None:
+    for piece in pieces:
+        if trace is not None and len(trace) < payload_trace.max_bytes:
+            trace += piece[: payload_trace.max_bytes - len(trace)]
+
+        datalen += len(piece)
+        parser.feed(piece)
+
+    root = parser.close()
+
+    if debug:
+        logger.debug("Read:")
+        logger.debug(f"  len={datalen}")
+        logger.debug("  data=" + dump_string(root.dumps(), pp=pp))
+    elif trace is not None:
+        payload_trace.log("Read", datalen, trace)
+
+    return root
+
+
+def send(
+    sock: socket.socket,
+    data: str | bytes | Element | Iterable,
+    pp: Optional[bool] = False,
+) -> None:
     """
     Send data to the socket.
 
+    Elements are serialized and sent a chunk at a time, so the complete
+    document is never held in memory. Any other iterable of bytes is sent
+    the same way, one chunk per item.
+
     :param sock: Socket to send data to
     :type sock: socket.socket
     :param data: Data to send
-    :type data: str
+    :type data: str | bytes | Element | Iterable
     :param pp: Pretty print the data
     :type pp: bool
     :return: None
@@ -114,41 +636,45 @@ def send(sock: socket.socket, data: str, pp: Optional[bool] = False) -> None:
 
     """
 
-    if type(data) is Element:
-        data = data.dumps()
+    debug = logger.isEnabledFor(logging.DEBUG)
 
-    if type(data) is not bytes:
-        data = str.encode(data)
+    if isinstance(data, Element):
+        data = data.dumps() if debug else data.iterdump()
+    elif debug and not isinstance(data, (str, bytes, bytearray)):
+        data = b"".join(data)
 
-    datalen = len(data)
-
-    frame_start = b"\n#"
-    frame_end = b"\n##\n"
+    if isinstance(data, str):
+        data = str.encode(data)
 
-    frame_header = frame_start + str(datalen).encode() + b"\n"
-    framelen = len(frame_header) + datalen + len(frame_end)
+    if isinstance(data, (bytes, bytearray)):
+        logger.debug(f"Sending {len(data)} bytes of data")
 
-    frame = frame_header + data + frame_end
+        sent_total = get_framer(sock).write_message(data)
+        datalen = len(data)
+        trace = data
+    else:
+        trace = bytearray()
+        datalen = 0
 
-    sent = 0
-    sent_total = 0
+        def pieces(data: Iterable) -> Generator:
+            nonlocal datalen, trace
 
-    logger.debug(f"Sending {framelen} bytes of data")
+            for piece in data:
+                if len(trace) < payload_trace.max_bytes:
+                    trace += piece[: payload_trace.max_bytes - len(trace)]
 
-    # Send all the data in data
-    while sent_total < framelen:
-        _, writable, _ = select.select([], [sock], [])
+                datalen += len(piece)
 
-        if not writable:
-            logger.debug("No data available")
-            continue
+                yield piece
 
-        sent = int(sock.send(frame[sent_total:]))
-        sent_total += sent
+        sent_total = get_framer(sock).write_chunks(pieces(data))
 
-    logger.debug("Send:")
-    logger.debug(f"  len={framelen}")
-    logger.debug("  data=" + dump_string(data, pp=pp))
-    logger.debug(f"  sent={sent_total}")
+    if debug:
+        logger.debug("Send:")
+        logger.debug(f"  len={sent_total}")
+        logger.debug("  data=" + dump_string(data, pp=pp))
+        logger.debug(f"  sent={sent_total}")
+    elif payload_trace.sampled():
+        payload_trace.log("Send", datalen, trace)
 
     return sent_total
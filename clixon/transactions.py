@@ -0,0 +1,220 @@
+import sys
+import time
+
+from collections import OrderedDict
+from typing import Callable, Optional
+
+from clixon.args import get_logger
+
+logger = get_logger()
+
+# Default number of transactions kept and seconds an unused one is kept
+MAX_TRANSACTIONS = 1024
+TRANSACTION_TTL = 3600
+
+
+def _sizeof(value: object) -> int:
+    """
+    Return the approximate memory held by a stored value.
+
+    :param value: Value, a list of tuples of strings
+    :type value: object
+    :return: Size in bytes
+    :rtype: int
+
+    """
+
+    size = sys.getsizeof(value)
+
+    for item in value:
+        size += sys.getsizeof(item)
+
+        if isinstance(item, tuple):
+            size += sum(sys.getsizeof(part) for part in item)
+
+    return size
+
+
+class TransactionStore:
+    def __init__(
+        self,
+        max_entries: Optional[int] = MAX_TRANSACTIONS,
+        ttl: Optional[float] = TRANSACTION_TTL,
+        clock: Optional[Callable] = time.monotonic,
+    ) -> None:
+        """
+        Create a bounded store of per-transaction state.
+
+        Entries are kept in least recently used order. When the store is
+        full the least recently used entry is evicted, and entries unused
+        for longer than ttl seconds are dropped.
+
+        :param max_entries: Maximum number of transactions kept
+        :type max_entries: int
+        :param ttl: Seconds an unused entry is kept, None to keep forever
+        :type ttl: float
+        :param clock: Function returning the current time in seconds
+        :type clock: Callable
+        :return: None
+        :rtype: None
+
+        """
+
+        if max_entries < 1:
+            raise ValueError("max_entries must be at least 1")
+
+        self.__max_entries = max_entries
+        self.__ttl = ttl
+        self.__clock = clock
+        self.__entries = OrderedDict()
+        self.__bytes = 0
+        self.__evictions = 0
+        self.__expirations = 0
+
+    def __len__(self) -> int:
+        """
+        Return the number of transactions kept.
+
+        :return: Number of transactions
+        :rtype: int
+
+        """
+
+        self.__expire()
+
+        return len(self.__entries)
+
+    def __contains__(self, tid: str) -> bool:
+        """
+        Return True if state is kept for the transaction.
+
+        :param tid: Transaction ID
+        :type tid: str
+        :return: True if the transaction is kept
+        :rtype: bool
+
+        """
+
+        self.__expire()
+
+        return tid in self.__entries
+
+    def put(self, tid: str, value: list) -> None:
+        """
+        Keep state for a transaction, evicting the least recently used
+        transaction if the store is full.
+
+        :param tid: Transaction ID
+        :type tid: str
+        :param value: State, e.g. a list of (service, instance) tuples
+        :type value: list
+        :return: None
+        :rtype: None
+
+        """
+
+        self.__expire()
+        self.pop(tid)
+
+        while len(self.__entries) >= self.__max_entries:
+            evicted, (_, size, _) = self.__entries.popitem(last=False)
+            self.__bytes -= size
+            self.__evictions += 1
+
+            logger.debug(f"Evicted state of transaction {evicted}, store is full")
+
+        size = _sizeof(value)
+        self.__entries[tid] = (value, size, self.__clock())
+        self.__bytes += size
+
+    def get(self, tid: str) -> Optional[list]:
+        """
+        Return the state of a transaction and mark it as recently used.
+
+        :param tid: Transaction ID
+        :type tid: str
+        :return: State, or None if not kept
+        :rtype: Optional[list]
+
+        """
+
+        self.__expire()
+
+        entry = self.__entries.get(tid)
+
+        if entry is None:
+            return None
+
+        value, size, _ = entry
+        self.__entries[tid] = (value, size, self.__clock())
+        self.__entries.move_to_end(tid)
+
+        return value
+
+    def pop(self, tid: str) -> Optional[list]:
+        """
+        Remove the state of a transaction, e.g. when its final result has
+        been handled, and return it.
+
+        :param tid: Transaction ID
+        :type tid: str
+        :return: State, or None if not kept
+        :rtype: Optional[list]
+
+        """
+
+        entry = self.__entries.pop(tid, None)
+
+        if entry is None:
+            return None
+
+        value, size, _ = entry
+        self.__bytes -= size
+
+        return value
+
+    def stats(self) -> dict:
+        """
+        Return counters for the store.
+
+        :return: Dict with entries, evictions, expirations and bytes, the
+                 approximate memory held by the stored state
+        :rtype: dict
+
+        """
+
+        self.__expire()
+
+        return {
+            "entries": len(self.__entries),
+            "evictions": self.__evictions,
+            "expirations": self.__expirations,
+            "bytes": self.__bytes,
+        }
+
+    def __expire(self) -> None:
+        """
+        Drop entries unused for longer than the TTL. Entries are in least
+        recently used order, so only the oldest ones have to be checked.
+
+        :return: None
+        :rtype: None
+
+        """
+
+        if self.__ttl is None:
+            return
+
+        oldest = self.__clock() - self.__ttl
+
+        while self.__entries:
+            tid, (_, size, used) = next(iter(self.__entries.items()))
+
+            if used > oldest:
+                break
+
+            del self.__entries[tid]
+            self.__bytes -= size
+            self.__expirations += 1
+
+            logger.debug(f"Expired state of transaction {tid}")
@@ -0,0 +1,506 @@
+from typing import Iterable, Optional
+
+from clixon.element import Element
+
+# Leaves used as list keys in the paths returned by ElementView.changed_paths
+KEY_NAMES = ("name", "service-name", "instance")
+
+
+def element_path(element: Element, top: Optional[Element] = None) -> str:
+    """
+    Return the path of an element in get_path syntax, list entries with a
+    key leaf from KEY_NAMES get a predicate, e.g.
+    /devices/device[name='r1']/config.
+
+    :param element: Element
+    :type element: Element
+    :param top: Element the path is relative to, the root by default
+    :type top: Element
+    :return: Path
+    :rtype: str
+
+    """
+
+    steps = []
+    node = element
+
+    while node is not None and node is not top:
+        step = node.origname()
+
+        for key in KEY_NAMES:
+            leaves = node.get_elements(key)
+
+            if len(leaves) == 1 and not leaves[0].get_elements():
+                step += f"[{key}='{str(leaves[0])}']"
+                break
+
+        steps.append(step)
+        node = node.parent()
+
+    return "/" + "/".join(reversed(steps))
+
+
+class ElementView(Element):
+    __slots__ = ("_base", "_changed", "_deleted", "_views")
+
+    def __init__(
+        self,
+        base: Element,
+        parent: Optional[Element] = None,
+        changed: Optional[list] = None,
+        deleted: Optional[set] = None,
+    ) -> None:
+        """
+        Create a copy-on-write view of an element.
+
+        The view shares the list of children of the base element until it
+        or one of its descendants is changed. Until then children are only
+        wrapped in views when they are returned, and unchanged subtrees are
+        serialized straight from the base element. The base element is
+        never changed through the view, so many views can share one parsed
+        tree.
+
+        :param base: The element to view
+        :type base: Element
+        :param parent: The parent view
+        :type parent: Element
+        :param changed: Elements changed in the tree of views, shared by all
+                        views
+        :type changed: list
+        :param deleted: Paths deleted in the tree of views, shared by all views
+        :type deleted: set
+        :return: None
+        :rtype: None
+
+        """
+
+        self._init_node(
+            base._origname, base._name, base.attributes.copy(), base._cdata, parent
+        )
+        self._is_root = base._is_root
+        self._base = base
+
+        # Shared list of children and the views of them handed out so far,
+        # _views is None once the view has a list of children of its own
+        self._children = base._children
+        self._views = {}
+
+        if changed is None:
+            changed = []
+
+        if deleted is None:
+            deleted = set()
+
+        self._changed = changed
+        self._deleted = deleted
+
+    def __getattr__(self, key: str) -> Optional[dict]:
+        """
+        Return the children with the name as views, see Element.__getattr__.
+
+        :param key: The key of the attribute to return.
+        :type key: str
+        :return: The attributes of the element.
+        :rtype: dict
+
+        """
+
+        if key in ElementView.__slots__:
+            raise AttributeError(f"'{type(self).__name__}' has no attribute '{key}'")
+
+        if self._views is None or key.startswith("__") or key in Element.__slots__:
+            return super().__getattr__(key)
+
+        matching_children = self._base.get_elements(key)
+
+        if not matching_children:
+            raise AttributeError(f"'{self._name}' has no attribute '{key}'")
+
+        if len(matching_children) == 1:
+            return self.__view(matching_children[0])
+
+        return [self.__view(child) for child in matching_children]
+
+    def get_elements(
+        self,
+        name: Optional[str] = "",
+        data: Optional[str] = "",
+        elements: Optional[list] = None,
+        recursive: Optional[bool] = False,
+        get_modified_elements: Optional[bool] = False,
+    ) -> list:
+        """
+        Return the children of the element as views, see
+        Element.get_elements.
+
+        :param name: The name of the children.
+        :type name: str
+        :param data: The data of the children.
+        :type data: str
+        :return: The children.
+        :rtype: list
+
+        """
+
+        if self._views is None or recursive:
+            return super().get_elements(
+                name=name,
+                data=data,
+                elements=elements,
+                recursive=recursive,
+                get_modified_elements=get_modified_elements,
+            )
+
+        children = self._base.get_elements(
+            name=name, data=data, get_modified_elements=get_modified_elements
+        )
+
+        return [self.__view(child) for child in children]
+
+    def find_entry(self, name: str, key: str, value: str) -> Optional[object]:
+        """
+        Return the list entry as a view, see Element.find_entry. Until the
+        view is changed the keyed index of the base element is used.
+
+        :param name: The name of the list entries.
+        :type name: str
+        :param key: The name of the key leaf.
+        :type key: str
+        :param value: The value of the key leaf.
+        :type value: str
+        :return: The list entry or None.
+        :rtype: object
+
+        """
+
+        if self._views is None:
+            return super().find_entry(name, key, value)
+
+        entry = self._base.find_entry(name, key, value)
+
+        if entry is None:
+            return None
+
+        return self.__view(entry)
+
+    @property
+    def cdata(self) -> str:
+        """
+        The character data of the element, see Element.cdata.
+
+        :return: The character data.
+        :rtype: str
+
+        """
+
+        return self._cdata
+
+    @cdata.setter
+    def cdata(self, cdata: str) -> None:
+        """
+        Set the character data of the element, see Element.cdata. Unlike
+        on an Element the assignment marks the view as modified, so it is
+        sent in delta mode.
+
+        :param cdata: The character data.
+        :type cdata: str
+        :return: None
+        :rtype: None
+
+        """
+
+        self.__touch()
+        Element.cdata.fset(self, cdata)
+        Element.set_modified(self, True)
+        self._changed.append(self)
+
+    def create(self, name: str, *args, **kwargs) -> Element:
+        """
+        Create a new element, see Element.create.
+
+        :param name: The name of the element.
+        :type name: str
+        :return: The new element.
+        :rtype: Element
+
+        """
+
+        self.__touch()
+        element = super().create(name, *args, **kwargs)
+        self._changed.append(element)
+
+        return element
+
+    def add(self, element: object, modified: Optional[bool] = True) -> None:
+        """
+        Add an element to the children of the element, see Element.add.
+
+        :param element: The element to add.
+        :type element: object
+        :param modified: Mark the added element as new.
+        :type modified: bool
+        :return: None
+        :rtype: None
+
+        """
+
+        self.__touch()
+        super().add(element, modified=modified)
+        self._changed.append(element)
+
+    def create_many(self, name: str, rows: Iterable, *args, **kwargs) -> list:
+        """
+        Create one element per row, see Element.create_many.
+
+        :param name: The name of the elements.
+        :type name: str
+        :param rows: Dicts or values, one per element.
+        :type rows: Iterable
+        :return: The new elements.
+        :rtype: list
+
+        """
+
+        self.__touch()
+        elements = super().create_many(name, rows, *args, **kwargs)
+        self._changed.extend(elements)
+
+        return elements
+
+    def extend(self, elements: Iterable, modified: Optional[bool] = True) -> None:
+        """
+        Add elements to the children of the element, see Element.extend.
+
+        :param elements: The elements to add.
+        :type elements: Iterable
+        :param modified: Mark the added elements as new.
+        :type modified: bool
+        :return: None
+        :rtype: None
+
+        """
+
+        elements = list(elements)
+
+        self.__touch()
+        super().extend(elements, modified=modified)
+        self._changed.extend(elements)
+
+    def rename(self, name: str, origname: str, modified: Optional[bool] = True) -> None:
+        """
+        Rename the element, see Element.rename.
+
+        :param name: The new name of the element.
+        :type name: str
+        :param origname: The original name of the element.
+        :type origname: str
+        :return: None
+        :rtype: None
+
+        """
+
+        self.__touch()
+        self._deleted.add(element_path(self, self.__top()))
+        super().rename(name, origname, modified=modified)
+        self._changed.append(self)
+
+    def set_attributes(self, attributes: dict, modified: Optional[bool] = True) -> None:
+        """
+        Set the attributes of the element, see Element.set_attributes.
+
+        :param attributes: The attributes of the element.
+        :type attributes: dict
+        :return: None
+        :rtype: None
+
+        """
+
+        self.__touch()
+        super().set_attributes(attributes, modified=modified)
+        self._changed.append(self)
+
+    def set_data(self, data: str, modified: Optional[bool] = True) -> None:
+        """
+        Set the data of the element, see Element.set_data.
+
+        :param data: The data of the element.
+        :type data: str
+        :return: None
+
+        """
+
+        self.__touch()
+        super().set_data(data, modified=modified)
+        self._changed.append(self)
+
+    def set_modified(self, modified: Optional[bool] = True) -> bool:
+        """
+        Set the modified flag, see Element.set_modified.
+
+        :param modified: True or False.
+        :type modified: bool
+        :return: The modified flag.
+        :rtype: bool
+
+        """
+
+        self.__touch()
+
+        return super().set_modified(modified)
+
+    def delete_many(self, match: object, modified: Optional[bool] = True) -> int:
+        """
+        Delete the children matching match, see Element.delete_many. Every
+        delete goes through here.
+
+        :param match: Predicate, name, names or elements to delete.
+        :type match: object
+        :return: The number of deleted children.
+        :rtype: int
+
+        """
+
+        self.__touch()
+
+        children = self._children
+        deleted = super().delete_many(match, modified=modified)
+
+        if not deleted:
+            return 0
+
+        top = self.__top()
+        kept = {id(child) for child in self._children}
+
+        for child in children:
+            # Elements created through the views were never in the base
+            if id(child) not in kept and not child._created:
+                self._deleted.add(element_path(child, top))
+
+        return deleted
+
+    def changed_paths(self) -> set:
+        """
+        Return the paths of the elements created, changed or deleted through
+        the views, relative to the topmost view.
+
+        :return: Set of paths
+        :rtype: set
+
+        """
+
+        top = self.__top()
+        paths = set(self._deleted)
+
+        for element in self._changed:
+            if self.__attached(element, top):
+                paths.add(element_path(element, top))
+
+        return paths
+
+    def __attached(self, element: Element, top: Element) -> bool:
+        """
+        Return True if the element is still in the tree below top, it is not
+        if it or one of its parents has been deleted.
+
+        :param element: Element
+        :type element: Element
+        :param top: The topmost view
+        :type top: Element
+        :return: True if the element is in the tree
+        :rtype: bool
+
+        """
+
+        node = element
+        while node is not top:
+            parent = node._parent
+
+            if parent is None:
+                return False
+
+            if not any(child is node for child in parent.get_elements(node._name)):
+                return False
+
+            node = parent
+
+        return True
+
+    def __view(self, child: Element) -> Element:
+        """
+        Return the view of a child of the base element, the same view every
+        time it is asked for.
+
+        :param child: Child of the base element
+        :type child: Element
+        :return: The view of the child
+        :rtype: Element
+
+        """
+
+        view = self._views.get(id(child))
+
+        if view is None:
+            view = ElementView(child, self, self._changed, self._deleted)
+            self._views[id(child)] = view
+
+        return view
+
+    def __own(self) -> None:
+        """
+        Replace the shared list of children with views of the children of
+        the base element, keeping the views already handed out.
+
+        :return: None
+        :rtype: None
+
+        """
+
+        views = self._views
+
+        if views is None:
+            return
+
+        children = []
+
+        for child in self._base._children:
+            view = views.get(id(child))
+
+            if view is None:
+                view = ElementView(child, self, self._changed, self._deleted)
+
+            children.append(view)
+
+        self._children = children
+        self._views = None
+        self._index = None
+        self._keys = None
+
+    def __touch(self) -> None:
+        """
+        Give the view and its parents lists of children of their own before
+        the view is changed, so the change is reached from the topmost view.
+
+        :return: None
+        :rtype: None
+
+        """
+
+        node = self
+        while isinstance(node, ElementView):
+            node.__own()
+            node = node._parent
+
+    def __top(self) -> Element:
+        """
+        Return the topmost view.
+
+        :return: The topmost view.
+        :rtype: Element
+
+        """
+
+        node = self
+        while isinstance(node._parent, ElementView):
+            node = node._parent
+
+        return node
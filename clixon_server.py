@@ -10,7 +10,7 @@ import sys
 
 from clixon.args import get_logger, parse_args
 from clixon.client import readloop
-from clixon.modules import load_modules
+from clixon.modules import ModuleRegistry, load_modules
 
 (sockpath, mpath, mfilter, pidfile, pp, _, _) = parse_args(sys.argv[1:])
 
@@ -57,7 +57,7 @@ def main() -> None:
     Main function for clixon_server.
     """
 
-    modules = []
+    modules = ModuleRegistry()
 
     for path in mpath:
         sys.path.append(path)
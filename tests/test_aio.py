@@ -0,0 +1,198 @@
+import asyncio
+import socket
+
+import pytest
+
+from clixon.aio import AsyncClixon, transaction_id
+from clixon.exceptions import TimeoutException, TransactionError
+from clixon.session import message_info
+from clixon.sock import END_OF_MESSAGE, FrameDecoder
+
+NS = 'xmlns="urn:ietf:params:xml:ns:netconf:base:1.0"'
+
+
+def frame(data):
+    """
+    Frame a message as a single chunk.
+    """
+
+    data = data.encode()
+
+    return b"\n#%d\n" % len(data) + data + b"\n##\n"
+
+
+def notification(tid, result="SUCCESS"):
+    """
+    Return a controller-transaction notification.
+    """
+
+    return f'<notification xmlns="urn:ietf:params:xml:ns:netconf:notification:1.0"><eventTime>2024-01-01T00:00:00Z</eventTime><controller-transaction xmlns="http://clicon.org/controller"><tid>{tid}</tid><result>{result}</result></controller-transaction></notification>'
+
+
+async def serve(sock, handler):
+    """
+    Fake server, every message received is passed to the handler which
+    returns the messages to send back.
+    """
+
+    reader, writer = await asyncio.open_unix_connection(sock=sock)
+    decoder = FrameDecoder()
+    message = bytearray()
+
+    while True:
+        data = await reader.read(65536)
+
+        if not data:
+            break
+
+        for piece in decoder.feed(data):
+            if piece is not END_OF_MESSAGE:
+                message += piece
+                continue
+
+            for reply in handler(message.decode()):
+                writer.write(frame(reply))
+
+            message.clear()
+
+        await writer.drain()
+
+    writer.close()
+
+
+def run(handler, test, timeout=5):
+    """
+    Run a test coroutine against a fake server.
+    """
+
+    async def main():
+        sock, peer = socket.socketpair()
+        server = asyncio.create_task(serve(peer, handler))
+
+        async with AsyncClixon(socket=sock, user="test", read_only=True, timeout=timeout) as cd:
+            result = await test(cd)
+
+        await server
+
+        return result
+
+    return asyncio.run(main())
+
+
+def test_transaction_id():
+    """
+    Test that the transaction ID is found in replies and notifications.
+    """
+
+    assert transaction_id(f'<rpc-reply {NS}><tid xmlns="http://clicon.org/controller">12</tid></rpc-reply>') == "12"
+    assert transaction_id(notification(7)) == "7"
+    assert transaction_id(f"<rpc-reply {NS}><ok/></rpc-reply>") is None
+
+
+def test_aio_get_root():
+    """
+    Test that get_root returns the data of the reply.
+    """
+
+    def handler(data):
+        name, message_id = message_info(data)
+
+        if "get-config" in data:
+            return [f'<rpc-reply {NS} message-id="{message_id}"><data><devices><device><name>r1</name></device></devices></data></rpc-reply>']
+
+        return [f'<rpc-reply {NS} message-id="{message_id}"><ok/></rpc-reply>']
+
+    async def test(cd):
+        root = await cd.get_root()
+        device = await cd.get_root(path="/devices/device[name='r1']")
+
+        return str(root.devices.device.name), str(device.name)
+
+    assert run(handler, test) == ("r1", "r1")
+
+
+def test_aio_concurrent_pulls():
+    """
+    Test that concurrent pulls each wait for the notification of their own
+    transaction, even when replies and notifications arrive out of order.
+    """
+
+    pulls = []
+
+    def handler(data):
+        name, message_id = message_info(data)
+
+        if "<config-pull" not in data:
+            return [f'<rpc-reply {NS} message-id="{message_id}"><ok/></rpc-reply>']
+
+        pulls.append(message_id)
+
+        if len(pulls) < 2:
+            return []
+
+        first, second = pulls
+
+        # The second transaction finishes first, its notification is sent
+        # before the reply to the first pull
+        return [
+            f'<rpc-reply {NS} message-id="{second}"><tid xmlns="http://clicon.org/controller">2</tid></rpc-reply>',
+            notification(2),
+            notification(1, "FAILED"),
+            f'<rpc-reply {NS} message-id="{first}"><tid xmlns="http://clicon.org/controller">1</tid></rpc-reply>',
+        ]
+
+    async def test(cd):
+        return await asyncio.gather(
+            cd.pull(device="r1"), cd.pull(device="r2"), return_exceptions=True
+        )
+
+    first, second = run(handler, test)
+
+    assert isinstance(first, TransactionError)
+    assert second is None
+
+
+def test_aio_timeout():
+    """
+    Test that a reply which never arrives times out.
+    """
+
+    def handler(data):
+        name, message_id = message_info(data)
+
+        if "close-session" in data:
+            return [f'<rpc-reply {NS} message-id="{message_id}"><ok/></rpc-reply>']
+
+        return []
+
+    async def test(cd):
+        with pytest.raises(TimeoutException, match="after 0.5 seconds"):
+            await cd.get_root()
+
+    run(handler, test, timeout=0.5)
+
+
+def test_aio_unclaimed_notifications():
+    """
+    Test that notifications of transactions this client did not start are
+    dropped and that a transaction reply without a tid raises.
+    """
+
+    def handler(data):
+        name, message_id = message_info(data)
+
+        if "get-config" in data:
+            return [notification(99), f'<rpc-reply {NS} message-id="{message_id}"><data/></rpc-reply>']
+
+        return [f'<rpc-reply {NS} message-id="{message_id}"><ok/></rpc-reply>']
+
+    async def test(cd):
+        await cd.get_root()
+
+        with pytest.raises(TransactionError):
+            await cd.pull()
+
+        with pytest.raises(TimeoutException):
+            await cd.wait_for_transaction("99")
+
+    run(handler, test, timeout=1)
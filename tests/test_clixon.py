@@ -0,0 +1,134 @@
+import re
+import socket
+import threading
+
+from clixon.clixon import Clixon
+from clixon.exceptions import TimeoutException, TransactionError
+from clixon.session import message_info
+from clixon.sock import SocketClosedError, read, send
+
+NS = 'xmlns="urn:ietf:params:xml:ns:netconf:base:1.0"'
+CONTROLLER_NS = 'xmlns="http://clicon.org/controller"'
+
+
+def notification(tid, result):
+    """
+    Return a controller-transaction notification.
+    """
+
+    return f'<notification xmlns="urn:ietf:params:xml:ns:netconf:notification:1.0"><eventTime>2024-01-01T00:00:00Z</eventTime><controller-transaction {CONTROLLER_NS}><tid>{tid}</tid><result>{result}</result></controller-transaction></notification>'
+
+
+def serve(sock, applied):
+    """
+    Fake controller. r1 finishes after r4 has been started, r2 fails at
+    once and r3 never finishes.
+    """
+
+    tids = {}
+
+    while True:
+        try:
+            data = read(sock)
+        except (SocketClosedError, OSError):
+            return
+
+        _, message_id = message_info(data)
+
+        if "device-template-apply" in data:
+            device = re.search(r"<device>(.*?)</device>", data).group(1)
+            tid = str(len(tids) + 1)
+            tids[tid] = device
+            applied.append(device)
+
+            send(sock, f'<rpc-reply {NS} message-id="{message_id}"><tid {CONTROLLER_NS}>{tid}</tid></rpc-reply>')
+
+            if device == "r2":
+                send(sock, notification(tid, "FAILED"))
+            elif device == "r4":
+                send(sock, notification(tid, "SUCCESS"))
+                send(sock, notification("1", "SUCCESS"))
+        elif "device-rpc-result" in data:
+            tid = re.search(r"<tid>(.*?)</tid>", data).group(1)
+
+            send(sock, f'<rpc-reply {NS} message-id="{message_id}"><devices {CONTROLLER_NS}><device><name>{tids[tid]}</name></device></devices></rpc-reply>')
+        else:
+            send(sock, f'<rpc-reply {NS} message-id="{message_id}"><ok/></rpc-reply>')
+
+
+def test_device_rpc_many():
+    """
+    Test that device_rpc_many keeps concurrency transactions in flight and
+    yields every device as it finishes, failed and timed out ones included.
+    """
+
+    sock, peer = socket.socketpair()
+    applied = []
+    server = threading.Thread(target=serve, args=(peer, applied))
+    server.start()
+
+    cd = Clixon(socket=sock, user="test")
+    results = list(cd.device_rpc_many(["r1", "r2", "r3", ("r4", "other", {})], "show-version", concurrency=3, timeout=0.5))
+
+    sock.close()
+    server.join()
+    peer.close()
+
+    assert applied == ["r1", "r2", "r3", "r4"]
+    assert [devname for devname, _ in results] == ["r2", "r4", "r1", "r3"]
+    assert isinstance(results[0][1], TransactionError)
+    assert str(results[1][1].device.name) == "r4"
+    assert str(results[2][1].device.name) == "r1"
+    assert isinstance(results[3][1], TimeoutException)
+
+
+def serve_config(sock, edits):
+    """
+    Fake controller returning one configuration, the edit-configs received
+    are appended to edits.
+    """
+
+    while True:
+        try:
+            data = read(sock)
+        except (SocketClosedError, OSError):
+            return
+
+        _, message_id = message_info(data)
+
+        if "<get-config" in data:
+            send(sock, f'<rpc-reply {NS} message-id="{message_id}"><data><x><val>1</val><other>1</other></x></data></rpc-reply>')
+            continue
+
+        if "<edit-config" in data:
+            edits.append(re.search(r"<config>(.*)</config>", data).group(1))
+
+        send(sock, f'<rpc-reply {NS} message-id="{message_id}"><ok/></rpc-reply>')
+
+
+def test_snapshot_sends_changes():
+    """
+    Test that in snapshot mode only the changes of each view are sent, so
+    an unchanged view does not overwrite the changes of another.
+    """
+
+    sock, peer = socket.socketpair()
+    edits = []
+    server = threading.Thread(target=serve_config, args=(peer, edits))
+    server.start()
+
+    with Clixon(socket=sock, user="test", commit=False, from_server=True, snapshot=True) as cd:
+        first = cd.get_root()
+        second = cd.get_root()
+        unchanged = cd.get_root()
+
+        first.x.val.set_data("2")
+        second.x.other.set_data("3")
+
+        assert str(unchanged.x.val) == "1"
+
+    sock.close()
+    server.join()
+    peer.close()
+
+    assert edits == ["<x><val>2</val></x>", "<x><other>3</other></x>"]
@@ -1,3 +1,10 @@
+import io
+import json
+
+import xmltodict
+import yaml
+
+from clixon.element import Element, normalize_name
 from clixon.parser import parse_string
 
 xml = """
@@ -369,3 +376,356 @@ def test_element_replace():
     assert "This one should be replaced!" not in root.xml.dumps()
     assert "This one should still be there." in root.xml.dumps()
     assert "I am the new one!" in root.xml.dumps()
+
+
+def test_element_replace_unmodified():
+    """
+    Test that an element replaced with modified=False is not in the delta.
+    """
+
+    root = parse_string("<data><x><a><name>x</name><b>1</b></a></x></data>")
+    new = parse_string("<new><a><name>x</name><b>5</b></a></new>")
+
+    root.data.x.replace("a", new.new.a, modified=False)
+
+    assert root.data.x.dumps() == "<a><name>x</name><b>5</b></a>"
+    assert root.data.x.delta() is None
+
+
+def test_element_name_index():
+    """
+    Test that attribute navigation follows create, delete and rename.
+    """
+
+    root = parse_string(xml)
+
+    count = len(root.xml.interface)
+
+    root.xml.create("interface").create("name", data="et-0/0/2")
+
+    assert len(root.xml.interface) == count + 1
+    assert root.xml.interface[-1].name.get_data() == "et-0/0/2"
+
+    root.xml.delete(element=root.xml.interface[-1])
+
+    assert len(root.xml.interface) == count
+
+    root.xml.apply_groups.rename("interface", "interface")
+
+    assert len(root.xml.interface) == count + 1
+    assert root.xml.get_elements("apply-groups") == []
+    assert not hasattr(root.xml, "apply_groups")
+
+
+def test_element_dump():
+    """
+    Test that dump, iterdump and dumps produce the same XML and that
+    attribute values are escaped.
+    """
+
+    root = parse_string(xml)
+    root.xml.create("note", attributes={"text": 'a "b" & <c>'})
+
+    writer = io.StringIO()
+    root.dump(writer)
+
+    assert writer.getvalue() == root.dumps()
+    assert b"".join(root.iterdump(chunk_size=64)).decode() == root.dumps()
+    assert '<note text="a &quot;b&quot; &amp; &lt;c>"/>' in root.dumps()
+
+
+def test_element_delta():
+    """
+    Test that delta() only holds created and modified subtrees.
+    """
+
+    root = parse_string(
+        """<xml><data><a><name>a</name><b><c>1</c></b><d><e>2</e></d></a></data></xml>"""
+    )
+
+    assert root.xml.data.delta() is None
+
+    root.xml.data.a.create("f").create("g", data="3")
+
+    assert root.xml.data.a.get_dirty()
+    assert not root.xml.data.a.d.get_dirty()
+    assert root.xml.data.delta().dumps() == "<a><name>a</name><f><g>3</g></f></a>"
+
+    root.xml.data.a.b.c.set_data("4")
+
+    assert (
+        root.xml.data.delta().dumps()
+        == "<a><name>a</name><b><c>4</c></b><f><g>3</g></f></a>"
+    )
+
+
+def test_element_find_entry():
+    """
+    Test keyed list lookups and that the index follows changes.
+    """
+
+    root = parse_string(xml)
+
+    interface = root.xml.find_entry("interface", "name", "et-0/0/2")
+
+    assert interface.encapsulation.get_data() == "flexible-ethernet-services"
+    assert interface.find_entry("unit", "name", "101").encapsulation == "vlan-ccc"
+    assert root.xml.find_entry("interface", "name", "et-9/9/9") is None
+
+    interface.name.set_data("et-9/9/9")
+
+    assert root.xml.find_entry("interface", "name", "et-0/0/2") is None
+    assert root.xml.find_entry("interface", "name", "et-9/9/9") is interface
+
+    new = root.xml.create("interface")
+
+    assert root.xml.find_entry("interface", "name", "et-1/1/1") is None
+
+    new.create("name", data="et-1/1/1")
+
+    assert root.xml.find_entry("interface", "name", "et-1/1/1") is new
+
+    root.xml.delete(element=new)
+
+    assert root.xml.find_entry("interface", "name", "et-1/1/1") is None
+
+
+def test_element_find_entry_cdata():
+    """
+    Test that the keyed index follows key leaves whose cdata is assigned
+    directly.
+    """
+
+    root = parse_string(xml)
+    interface = root.xml.find_entry("interface", "name", "et-0/0/2")
+
+    interface.name.cdata = "et-8/8/8"
+
+    assert root.xml.find_entry("interface", "name", "et-0/0/2") is None
+    assert root.xml.find_entry("interface", "name", "et-8/8/8") is interface
+
+
+def test_element_copy():
+    """
+    Test that a copy is independent of the element.
+    """
+
+    root = parse_string(xml)
+    copy = root.copy()
+
+    assert copy.dumps() == root.dumps()
+
+    copy.xml.interface[0].name.set_data("et-9/9/9")
+    copy.xml.create("foo")
+
+    assert root.xml.interface[0].name.get_data() == "et-0/0/0"
+    assert root.xml.get_elements("foo") == []
+    assert copy.xml.interface[0].parent() is copy.xml
+
+
+def xmltodict_data(element):
+    """
+    Return what dumpj used to serialize, each child converted by xmltodict.
+    """
+
+    data = []
+
+    for child in element.get_elements():
+        xmlstr = f"<{child.origname()}>" + child.dumps() + f"</{child.origname()}>"
+        data.append(xmltodict.parse(xmlstr))
+
+    return data
+
+
+def test_element_dumpj():
+    """
+    Test that dumpj, iterdumpj, dumpy and to_data give the same result as
+    converting the XML with xmltodict.
+    """
+
+    root = parse_string(xml)
+    extra = parse_string('<extra a="1">x &amp; y<b c="2">t</b><b/><d/>tail</extra>')
+    root.xml.add(extra.extra)
+
+    for element in (root, root.xml, root.xml.interface[0], root.xml.extra):
+        expected = xmltodict_data(element)
+
+        assert element.to_data() == expected
+        assert element.dumpj() == json.dumps(expected)
+        assert "".join(element.iterdumpj()) == json.dumps(expected)
+        assert element.dumpy() == yaml.dump(expected)
+
+
+def test_element_dumpj_namespaces():
+    """
+    Test that names are qualified with the module name where the namespace
+    changes and xmlns attributes are left out.
+    """
+
+    root = parse_string(
+        '<data><devices xmlns="http://clicon.org/controller"><device><name>r1</name>'
+        '<config><interfaces xmlns="urn:ietf:params:xml:ns:yang:ietf-interfaces">'
+        '<interface><name>e0</name></interface></interfaces></config></device></devices></data>'
+    )
+    namespaces = {
+        "http://clicon.org/controller": "clixon-controller",
+        "urn:ietf:params:xml:ns:yang:ietf-interfaces": "ietf-interfaces",
+    }
+
+    assert root.data.to_data(namespaces) == [
+        {
+            "clixon-controller:devices": {
+                "device": {
+                    "name": "r1",
+                    "config": {"ietf-interfaces:interfaces": {"interface": {"name": "e0"}}},
+                }
+            }
+        }
+    ]
+    assert json.loads(root.data.dumpj(namespaces)) == root.data.to_data(namespaces)
+
+
+def test_element_dump_pp():
+    """
+    Test that dump_pp streams the same string as dumps_pp and that several
+    children are wrapped in <xml>.
+    """
+
+    root = parse_string(xml)
+    writer = io.StringIO()
+    root.dump_pp(writer)
+
+    assert writer.getvalue()[:-1] == root.dumps_pp()
+    assert root.dumps_pp().startswith('<?xml version="1.0" ?>\n<xml>\n  <apply-groups>ETH</apply-groups>')
+    assert root.xml.interface[0].dumps_pp().startswith('<?xml version="1.0" ?>\n<xml>\n  <name>et-0/0/0</name>')
+
+
+def test_element_delete_many():
+    """
+    Test that delete_many removes children by predicate, names and
+    elements, and that the name index and modified flag follow.
+    """
+
+    root = parse_string("<a><b>1</b><b>2</b><b>3</b><c>4</c><d>5</d><b>6</b></a>")
+    a = root.a
+
+    assert len(a.b) == 4
+    assert a.delete_many(lambda child: child.cdata in ("2", "3")) == 2
+    assert [str(b) for b in a.b] == ["1", "6"]
+    assert a.get_modified()
+
+    assert a.delete_many(["c", "d"]) == 2
+    assert a.get_elements("c") == []
+    assert a.delete_many([a.b[1]]) == 1
+    assert str(a.b) == "1"
+    assert a.delete_many("missing") == 0
+
+
+def test_element_delete_adjacent():
+    """
+    Test that delete by name removes adjacent children with the name.
+    """
+
+    root = parse_string("<a><b>1</b><b>2</b><b>3</b><c>4</c></a>")
+    root.a.delete("b")
+
+    assert root.a.dumps() == "<c>4</c>"
+
+    root.a.delete(element=root.a.c)
+
+    assert root.a.get_elements() == []
+
+
+def test_element_from_dict():
+    """
+    Test that from_dict builds a tree which dumps and round-trips through
+    to_data.
+    """
+
+    data = {
+        "devices": {
+            "@xmlns": "http://clicon.org/controller",
+            "device": [
+                {"name": "r1", "enabled": True, "mtu": 1500},
+                {"name": "r&2", "description": None},
+            ],
+        }
+    }
+
+    root = Element.from_dict(data)
+
+    assert root.dumps() == (
+        '<devices xmlns="http://clicon.org/controller">'
+        "<device><name>r1</name><enabled>true</enabled><mtu>1500</mtu></device>"
+        "<device><name>r&amp;2</name><description/></device></devices>"
+    )
+    assert root.devices.device[1].name.get_data() == "r&amp;2"
+    assert root.to_data()[0]["devices"]["device"][1]["name"] == "r&2"
+    assert root.get_dirty()
+
+
+def test_element_create_many():
+    """
+    Test that create_many adds list entries with the key leaf first and
+    marks the parent once.
+    """
+
+    root = parse_string(
+        "<interfaces><interface><name>eth0</name></interface></interfaces>"
+    )
+    interfaces = root.interfaces
+
+    entries = interfaces.create_many(
+        "interface",
+        [
+            {"mtu": 9000, "name": "eth1"},
+            {"name": "eth2", "ipv4": {"address": ["10.0.0.1", "10.0.0.2"]}},
+        ],
+        key="name",
+    )
+
+    assert [str(entry.name) for entry in entries] == ["eth1", "eth2"]
+    assert [str(entry.name) for entry in interfaces.interface] == [
+        "eth0",
+        "eth1",
+        "eth2",
+    ]
+    assert entries[0].dumps() == "<name>eth1</name><mtu>9000</mtu>"
+    assert [str(address) for address in entries[1].ipv4.address] == [
+        "10.0.0.1",
+        "10.0.0.2",
+    ]
+    assert interfaces.get_modified()
+
+
+def test_element_extend():
+    """
+    Test that extend adds many elements and keeps the name index.
+    """
+
+    root = parse_string("<a><b>1</b></a>")
+    a = root.a
+    a.get_elements("b")
+    a.extend(Element.from_dict({"b": ["2", "3"], "c": "4"}).get_elements())
+
+    assert [str(b) for b in a.b] == ["1", "2", "3"]
+    assert a.b[1].parent() is a
+    assert a.dumps() == "<b>1</b><b>2</b><b>3</b><c>4</c>"
+    assert a.get_dirty()
+
+
+def test_element_normalize_name():
+    """
+    Test that names are normalized once and shared by all elements and
+    lookups.
+    """
+
+    assert normalize_name("ietf-interfaces:if.mtu") == ("ietf-interfaces:if.mtu", "ietf_interfaces_if_mtu")
+
+    root = parse_string("<a><bgp-peer>1</bgp-peer><bgp-peer>2</bgp-peer></a>")
+    first, second = root.a.get_elements("bgp-peer")
+
+    assert first._name is second._name is normalize_name("bgp-peer")[1]
+    assert first._origname is second._origname
+    assert str(root.a.bgp_peer[1]) == "2"
+    assert root.a.find_entry("bgp-peer", "bgp-peer", "1") is None
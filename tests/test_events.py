@@ -1,4 +1,6 @@
-from clixon.event import RPCEventHandler
+import pytest
+
+from clixon.event import RPCEventHandler, event_element
 
 e = RPCEventHandler()
 
@@ -80,3 +82,48 @@ def test_unregister2():
     e.emit("test", ret=ret)
 
     assert ret == [-1]
+
+
+def test_event_element():
+    """
+    Test that events are routed on the first child of a notification.
+    """
+
+    notification = """<notification xmlns="urn:ietf:params:xml:ns:netconf:notification:1.0"><eventTime>2024-01-01T00:00:00.000000Z</eventTime><services-commit xmlns="http://clicon.org/controller"><tid>42</tid></services-commit></notification>"""
+
+    assert event_element(notification) == "services-commit"
+    assert event_element("<rpc-reply><ok/></rpc-reply>") == "rpc-reply"
+    assert event_element("foobar") is None
+
+
+def test_register_element():
+    """
+    Test that callbacks registered by element name are called.
+    """
+
+    handler = RPCEventHandler()
+    ret = [-1]
+
+    @handler.register_element("services-commit")
+    def callback3(ret):
+        ret[0] = 3
+
+    handler.emit(
+        "<notification><eventTime>0</eventTime><services-commit/></notification>",
+        ret=ret,
+    )
+
+    assert ret == [3]
+
+    ret = [-1]
+    handler.emit("<notification><controller-transaction/></notification>", ret=ret)
+
+    assert ret == [-1]
+
+    with pytest.raises(Exception):
+        handler.emit("<rpc-reply/>", not_found_error=True, ret=ret)
+
+    handler.unregister_element("services-commit", callback3)
+    handler.emit("<notification><services-commit/></notification>", ret=ret)
+
+    assert ret == [-1]
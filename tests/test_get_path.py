@@ -1,5 +1,5 @@
 from clixon.element import Element
-from clixon.helpers import get_path
+from clixon.helpers import compile_path, get_path
 from clixon.parser import parse_string
 
 xmlstr = """
@@ -264,3 +264,52 @@ def test_15():
     )
 
     assert str(e) == "My second interface"
+
+
+def test_compile_path():
+    """
+    Test that paths are compiled once and reused by get_path.
+    """
+
+    compile_path.cache_clear()
+
+    steps = compile_path("/devices/device[name='juniper1']/conn-type")
+
+    assert steps == (
+        ("devices", None, None, None),
+        ("device", None, "name", "juniper1"),
+        ("conn_type", None, None, None),
+    )
+    assert compile_path('devices/device[name="juniper1"]/conn-type') == steps
+    assert compile_path("/devices/device[1]") == (
+        ("devices", None, None, None),
+        ("device", 1, None, None),
+    )
+    assert compile_path("/devices/device[name]") == (
+        ("devices", None, None, None),
+        None,
+    )
+
+    root = parse_string(xmlstr)
+
+    for _ in range(3):
+        e = get_path(root, "/devices/device[name='juniper2']/addr")
+        assert str(e) == "172.40.0.5"
+
+    assert compile_path.cache_info().hits >= 2
+    assert get_path(root, "/devices/device[name]/addr") is None
+
+
+def test_get_path_key_changed():
+    """
+    Test that predicates follow key leaves changed after the first lookup.
+    """
+
+    root = parse_string(xmlstr)
+
+    assert str(get_path(root, "/devices/device[name='juniper1']/addr")) == "172.40.0.3"
+
+    get_path(root, "/devices/device[name='juniper1']/name").cdata = "juniper9"
+
+    assert get_path(root, "/devices/device[name='juniper1']/addr") is None
+    assert str(get_path(root, "/devices/device[name='juniper9']/addr")) == "172.40.0.3"
@@ -143,6 +143,17 @@ def test_get_service_instance():
     assert instance.filter_name == "as-test3"
 
 
+def test_get_service_instance_services_list():
+    """
+    Test that get_service_instance returns None when there is more than
+    one services element.
+    """
+
+    root = parse_string("<data><services/><services/></data>")
+
+    assert get_service_instance(root.data, "bgp", instance="a") is None
+
+
 def test_get_service_instances():
     """
     Test that get_service_instances works as expected.
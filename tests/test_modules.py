@@ -0,0 +1,129 @@
+import types
+
+import pytest
+
+from unittest.mock import patch
+
+from clixon.exceptions import ModuleError
+from clixon.modules import ModuleRegistry, run_hooks, run_modules_parallel
+from clixon.parser import parse_string
+
+xmlstr = """<data><services xmlns="http://clicon.org/controller"><test><name>a</name></test><test><name>b</name></test></services><devices xmlns="http://clicon.org/controller"><device><name>r1</name><config><mtu>1500</mtu><hostname>r1</hostname></config></device><device><name>r2</name><config><mtu>1500</mtu><hostname>r2</hostname></config></device></devices></data>"""
+
+
+class FakeClixon:
+    """
+    Clixon stand-in that keeps the configuration sent with set_root.
+    """
+
+    pushed = []
+
+    def __init__(self, *args, **kwargs):
+        self.snapshot = parse_string(xmlstr).data
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def get_snapshot(self, xpath="/", namespaces=None):
+        return self.snapshot
+
+    def set_root(self, root):
+        FakeClixon.pushed.append(root.delta().dumps())
+
+
+def setup_device(root, logger, instance=None, diff=False):
+    """
+    Test module changing one leaf of the device named after the instance.
+    """
+
+    device = root.devices.find_entry("device", "name", instance)
+    device.config.mtu.set_data("9000")
+
+
+def setup_hostname(root, logger, instance=None, diff=False):
+    """
+    Test module changing the same leaf for every instance.
+    """
+
+    root.devices.find_entry("device", "name", "r1").config.hostname.set_data(instance)
+
+
+def make_module(setup):
+    """
+    Create a service module for the test service.
+    """
+
+    module = types.ModuleType(setup.__name__)
+    module.SERVICE = "test"
+    module.setup = setup
+
+    return module
+
+
+@patch("clixon.modules.Clixon", FakeClixon)
+def test_run_modules_parallel():
+    """
+    Test that the changes of all instances are merged and sent once.
+    """
+
+    FakeClixon.pushed = []
+
+    run_modules_parallel(
+        None, [make_module(setup_device)], [("test", "r1"), ("test", "r2")]
+    )
+
+    assert FakeClixon.pushed == [
+        '<devices xmlns="http://clicon.org/controller"><device><name>r1</name><config><mtu>9000</mtu><hostname>r1</hostname></config></device><device><name>r2</name><config><mtu>9000</mtu><hostname>r2</hostname></config></device></devices>'
+    ]
+
+
+@patch("clixon.modules.Clixon", FakeClixon)
+def test_run_modules_parallel_conflict():
+    """
+    Test that two instances changing the same node is an error.
+    """
+
+    with pytest.raises(ModuleError):
+        run_modules_parallel(
+            None, [make_module(setup_hostname)], [("test", "a"), ("test", "b")]
+        )
+
+
+def test_module_registry():
+    """
+    Test that modules are found by service and hook.
+    """
+
+    module_a = make_module(setup_device)
+    module_b = make_module(setup_hostname)
+    module_b.SERVICE = "other"
+    module_b.setup_post_commit = setup_hostname
+
+    registry = ModuleRegistry([module_a])
+    registry.extend([module_b])
+
+    assert list(registry) == [module_a, module_b]
+    assert registry.get_modules("test") == [module_a]
+    assert registry.get_modules("other") == [module_b]
+    assert registry.get_modules("missing") == []
+    assert registry.get_modules() == [module_a, module_b]
+    assert not registry.has_hook("test")
+    assert registry.has_hook("other", "setup_post_commit")
+    assert not registry.has_hook("other", "setup_pre_commit")
+
+
+@patch("clixon.modules.Clixon")
+def test_run_hooks_without_hooks(clixon):
+    """
+    Test that no session is opened for a service without the hook.
+    """
+
+    module = make_module(setup_device)
+    module.setup_post_commit = setup_device
+
+    run_hooks(None, ModuleRegistry([module]), "test", "r1", False, "pre-commit")
+
+    clixon.assert_not_called()
@@ -4,6 +4,7 @@ import pytest
 
 from clixon import netconf
 from clixon.element import Element
+from clixon.parser import parse_string
 
 user = getpass.getuser()
 
@@ -256,6 +257,32 @@ def test_rpc_error_get():
         netconf.rpc_error_get(xmlstr2)
 
 
+def test_rpc_error_get_fast_path():
+    """
+    Test that successful replies are not parsed and that errors are found
+    both in strings and in already parsed replies.
+    """
+
+    ok = """<rpc-reply xmlns="urn:ietf:params:xml:ns:netconf:base:1.0"><data><error-message>not an error</error-message></data></rpc-reply>\x00"""
+    error = """<rpc-reply xmlns="urn:ietf:params:xml:ns:netconf:base:1.0"><rpc-error><error-type>application</error-type><error-tag>invalid-value</error-tag><error-message>bad value</error-message></rpc-error></rpc-reply>"""
+    trailing = """<rpc-reply xmlns="urn:ietf:params:xml:ns:netconf:base:1.0"><data/><rpc-error><error-message>bad value</error-message></rpc-error></rpc-reply>"""
+
+    assert netconf.rpc_reply_ok(ok)
+    assert not netconf.rpc_reply_ok(error)
+    assert not netconf.rpc_reply_ok(trailing)
+    assert netconf.rpc_error_get(ok) is None
+
+    with pytest.raises(netconf.RPCError, match="bad value"):
+        netconf.rpc_error_get(trailing)
+
+    root = parse_string(ok)
+
+    assert netconf.rpc_error_get(None, root=root) is root
+
+    with pytest.raises(netconf.RPCError, match="bad value"):
+        netconf.rpc_error_get(None, root=parse_string(error))
+
+
 def test_rpc_apply_template():
     """
     Test the rpc_apply_template function.
@@ -542,3 +569,25 @@ def test_rpc_config_set_with_services_and_devices():
     root = netconf.rpc_config_set(config)
 
     assert root.dumps() == xmlstr
+
+
+def test_rpc_config_set_delta():
+    """
+    Test the rpc_config_set function in delta mode, only changed subtrees
+    and the leaves needed to identify them are included.
+    """
+
+    xmlstr = f"""<rpc xmlns="urn:ietf:params:xml:ns:netconf:base:1.0" username="{user}" xmlns:nc="urn:ietf:params:xml:ns:netconf:base:1.0" message-id="42" xmlns:cl="http://clicon.org/lib"><edit-config><target><actions xmlns="http://clicon.org/controller"/></target><default-operation>merge</default-operation><config><devices xmlns="http://clicon.org/controller"><device><name>r2</name><config><system><host-name>new</host-name></system></config></device></devices></config></edit-config></rpc>"""
+
+    config = parse_string(
+        """<data><services><test><name>a</name><value>1</value></test></services><devices xmlns="http://clicon.org/controller"><device><name>r1</name><config><system><host-name>r1</host-name></system></config></device><device><name>r2</name><config><system><host-name>r2</host-name></system><interfaces><interface><name>eth0</name></interface></interfaces></config></device></devices></data>"""
+    ).data
+
+    root = netconf.rpc_config_set(config, delta=True)
+
+    assert root.rpc.edit_config.config.get_elements() == []
+
+    config.devices.device[1].config.system.host_name.set_data("new")
+    root = netconf.rpc_config_set(config, delta=True)
+
+    assert root.dumps() == xmlstr
@@ -1,5 +1,9 @@
+from io import StringIO
+from xml.dom import minidom
+
 from clixon.element import Element
-from clixon.parser import parse_string, dump_string
+from clixon.parser import StreamParser, parse_string, dump_string
+from clixon.pretty import pretty_print
 
 xmlstr_1 = """<rpc-reply xmlns="urn:ietf:params:xml:ns:netconf:base:1.0"><data><table xmlns="urn:example:clixon"><parameter><name>name1</name><value>value1</value></parameter><parameter><name>name2</name><value>value2</value></parameter><parameter><name>name3</name><value>value3</value></parameter></table></data></rpc-reply>"""
 
@@ -222,3 +226,46 @@ def test_delete_create():
     root.foo.bar.delete()
 
     assert root.dumps() == """<foo/>"""
+
+
+def test_stream_parser():
+    """
+    Test that StreamParser builds the same tree as parse_string when the data
+    is fed in small pieces.
+    """
+
+    data = xmlstr_1.encode() + b"\x00"
+    parser = StreamParser()
+
+    for i in range(0, len(data), 7):
+        parser.feed(data[i:i + 7])
+
+    root = parser.close()
+
+    assert root.dumps() == parse_string(xmlstr_1).dumps()
+    assert root.rpc_reply.data.table.parameter[2].name.cdata == "name3"
+
+
+def test_prettyprint_like_minidom():
+    """
+    Test that pretty printing gives the same result as minidom for
+    attributes, empty elements, mixed content and comments.
+    """
+
+    xmlstr = """<a x="1 &amp; &quot;2&quot;"><b/><c>t &lt; "u"</c>text<d><e>1</e><!-- note --></d>more</a>"""
+
+    assert dump_string(xmlstr, pp=True) == "\n" + minidom.parseString(xmlstr).toprettyxml()
+
+
+def test_prettyprint_stream():
+    """
+    Test that pretty printing can be fed in pieces and written to a file
+    object.
+    """
+
+    xmlstr = """<a><b>1</b><c><d/></c></a>"""
+    writer = StringIO()
+
+    pretty_print((xmlstr[i:i + 3] for i in range(0, len(xmlstr), 3)), writer, indent="  ")
+
+    assert writer.getvalue() == minidom.parseString(xmlstr).toprettyxml(indent="  ")
@@ -0,0 +1,279 @@
+import socket
+import threading
+
+from clixon.exceptions import TimeoutException
+from clixon.netconf import rpc_config_get, rpc_hello
+from clixon.session import MAX_UNSOLICITED, Session, get_session, message_info
+from clixon.sock import RECV_BUFSIZE, read, send
+
+
+NS = 'xmlns="urn:ietf:params:xml:ns:netconf:base:1.0"'
+
+
+def reply(message_id, body="<ok/>"):
+    """
+    Return an rpc-reply with a message-id.
+    """
+
+    return f'<rpc-reply xmlns="urn:ietf:params:xml:ns:netconf:base:1.0" message-id="{message_id}">{body}</rpc-reply>'
+
+
+NOTIFICATION = '<notification xmlns="urn:ietf:params:xml:ns:netconf:notification:1.0"><eventTime>2024-01-01T00:00:00Z</eventTime><controller-transaction xmlns="http://clicon.org/controller"><result>SUCCESS</result></controller-transaction></notification>'
+
+
+def notification(tid):
+    """
+    Return a controller-transaction notification with a transaction ID.
+    """
+
+    return NOTIFICATION.replace("<result>", f"<tid>{tid}</tid><result>")
+
+
+def message_ids(peer, count):
+    """
+    Read count RPCs from the peer and return their message-ids.
+    """
+
+    return [message_info(read(peer))[1] for _ in range(count)]
+
+
+def test_message_info():
+    """
+    Test that the root element and message-id of a message are found.
+    """
+
+    assert message_info(reply("7")) == ("rpc-reply", "7")
+    assert message_info("<nc:rpc-reply message-id='8'/>") == ("rpc-reply", "8")
+    assert message_info(NOTIFICATION) == ("notification", None)
+    assert message_info("garbage") == (None, None)
+
+
+def test_session_message_id():
+    """
+    Test that replies are matched to their RPC by message-id, whatever
+    order they arrive in, and notifications are queued on their own.
+    """
+
+    sock, peer = socket.socketpair()
+    session = Session(sock)
+
+    first = session.send(rpc_config_get(user="test"))
+    second = session.send(rpc_config_get(user="test"))
+
+    assert first != second
+    assert message_ids(peer, 2) == [first, second]
+
+    send(peer, NOTIFICATION)
+    send(peer, reply(second, "<data>2</data>"))
+    send(peer, reply(first, "<data>1</data>"))
+
+    assert "<data>1</data>" in session.receive(first)
+    assert "<data>2</data>" in session.receive(second)
+    assert session.get_notification() == NOTIFICATION
+
+    sock.close()
+    peer.close()
+
+
+def test_session_pipeline():
+    """
+    Test that pipelined RPCs get their replies in order and that replies
+    without a message-id are matched to the oldest waiting RPC.
+    """
+
+    sock, peer = socket.socketpair()
+    session = Session(sock)
+
+    rpcs = [rpc_config_get(user="test") for _ in range(3)]
+    ids = [session.send(rpc) for rpc in rpcs]
+
+    assert message_ids(peer, 3) == ids
+
+    send(peer, reply(ids[2], "<data>3</data>"))
+    send(peer, '<rpc-reply xmlns="urn:ietf:params:xml:ns:netconf:base:1.0"><data>1</data></rpc-reply>')
+    send(peer, reply(ids[1], "<data>2</data>"))
+
+    replies = [session.receive(message_id) for message_id in ids]
+
+    assert "<data>1</data>" in replies[0]
+    assert "<data>2</data>" in replies[1]
+    assert "<data>3</data>" in replies[2]
+
+    sock.close()
+    peer.close()
+
+
+def test_session_receive_element():
+    """
+    Test that a reply which is the next message is parsed while it is
+    received and that other messages on the way are queued.
+    """
+
+    sock, peer = socket.socketpair()
+    session = Session(sock)
+
+    first = session.send(rpc_config_get(user="test"))
+    second = session.send(rpc_config_get(user="test"))
+    message_ids(peer, 2)
+
+    send(peer, NOTIFICATION)
+    send(peer, reply(second, "<data>2</data>"))
+    # The reply to the first RPC is sent in three chunks
+    data = reply(first, "<data><a>1</a></data>").encode()
+    for chunk in (data[:30], data[30:60], data[60:]):
+        peer.sendall(b"\n#%d\n" % len(chunk) + chunk)
+    peer.sendall(b"\n##\n")
+
+    root = session.receive_element(first)
+
+    assert root.rpc_reply.data.a.get_data() == "1"
+    assert session.receive_element(second).rpc_reply.data.get_data() == "2"
+    assert session.get_notification() == NOTIFICATION
+
+    sock.close()
+    peer.close()
+
+
+def test_session_receive_element_large_message():
+    """
+    Test that a message larger than the receive buffer, read on the way to
+    the reply, is queued intact.
+    """
+
+    sock, peer = socket.socketpair()
+    session = Session(sock)
+
+    message_id = session.send(rpc_config_get(user="test"))
+    message_ids(peer, 1)
+
+    large = NOTIFICATION.replace("<result>", "<data>%s</data><result>" % ("x" * 3 * RECV_BUFSIZE))
+    sender = threading.Thread(target=lambda: (send(peer, large), send(peer, reply(message_id, "<data>1</data>"))))
+    sender.start()
+
+    assert session.receive_element(message_id).rpc_reply.data.get_data() == "1"
+    assert session.get_notification() == large
+
+    sender.join()
+    sock.close()
+    peer.close()
+
+
+def test_session_discard():
+    """
+    Test that discarded replies are dropped and messages which are not
+    replies, e.g. hello, are returned by receive without a message-id.
+    """
+
+    sock, peer = socket.socketpair()
+    session = get_session(sock)
+
+    assert get_session(sock) is session
+    assert session.send(rpc_hello(user="test")) is None
+
+    discarded = session.send(rpc_config_get(user="test"))
+    session.discard(discarded)
+    message_id = session.send(rpc_config_get(user="test"))
+
+    send(peer, '<hello xmlns="urn:ietf:params:xml:ns:netconf:base:1.0"><session-id>1</session-id></hello>')
+    send(peer, reply(discarded, "<data>dropped</data>"))
+    send(peer, reply(message_id, "<data>kept</data>"))
+
+    assert "<data>kept</data>" in session.receive(message_id)
+    assert "<session-id>1</session-id>" in session.receive()
+
+    sock.close()
+    peer.close()
+
+
+def test_session_abandon():
+    """
+    Test that the notifications of abandoned transactions are dropped,
+    whether they are queued already or arrive later, and that discard only
+    remembers replies which are still awaited.
+    """
+
+    sock, peer = socket.socketpair()
+    session = Session(sock)
+
+    received = session.send(rpc_config_get(user="test"))
+    timed_out = session.send(rpc_config_get(user="test"))
+
+    send(peer, notification("1"))
+    send(peer, reply(received))
+    session.receive(received)
+    session.discard(received)
+    session.discard(timed_out, abandon=True)
+    session.abandon("1")
+    session.abandon("2")
+
+    send(peer, notification("2"))
+    send(peer, reply(timed_out, "<tid>3</tid>"))
+    send(peer, notification("3"))
+    send(peer, notification("4"))
+
+    assert session.get_notification() == notification("4")
+    assert session._Session__discarded == {}
+    assert session._Session__abandoned == set()
+
+    sock.close()
+    peer.close()
+
+
+def test_session_unsolicited():
+    """
+    Test that replies nobody waits for are dropped and that other
+    unsolicited messages are kept up to MAX_UNSOLICITED.
+    """
+
+    sock, peer = socket.socketpair()
+    session = Session(sock)
+
+    def serve():
+        send(peer, reply("42"))
+
+        for index in range(MAX_UNSOLICITED + 1):
+            send(peer, f"<hello {NS}><session-id>{index}</session-id></hello>")
+
+        send(peer, NOTIFICATION)
+
+    sender = threading.Thread(target=serve)
+    sender.start()
+    session.get_notification()
+    sender.join()
+
+    assert "<session-id>1</session-id>" in session.receive()
+    assert len(session._Session__unsolicited) == MAX_UNSOLICITED - 1
+
+    sock.close()
+    peer.close()
+
+
+def test_session_timeout_in_threads():
+    """
+    Test that sessions in worker threads time out independently.
+    """
+
+    pairs = [socket.socketpair() for _ in range(2)]
+    results = {}
+
+    def wait(index, sock):
+        try:
+            results[index] = Session(sock).get_notification(timeout=0.05 * (index + 1))
+        except TimeoutException:
+            results[index] = "timeout"
+
+    send(pairs[1][1], NOTIFICATION)
+
+    threads = [threading.Thread(target=wait, args=(index, pair[0])) for index, pair in enumerate(pairs)]
+
+    for thread in threads:
+        thread.start()
+
+    for thread in threads:
+        thread.join()
+
+    assert results == {0: "timeout", 1: NOTIFICATION}
+
+    for sock, peer in pairs:
+        sock.close()
+        peer.close()
@@ -0,0 +1,57 @@
+from clixon.parser import parse_string
+from clixon.snapshot import Snapshot, select
+
+xmlstr = """<rpc-reply xmlns="urn:ietf:params:xml:ns:netconf:base:1.0"><data><services xmlns="http://clicon.org/controller"><l2c xmlns="http://example.com/l2c"><name>a</name></l2c><l2c xmlns="http://example.com/l2c"><name>b</name></l2c><bgp xmlns="http://example.com/bgp"><name>c</name></bgp></services><devices xmlns="http://clicon.org/controller"><device><name>r1</name></device></devices></data></rpc-reply>"""
+
+
+def test_select():
+    """
+    Test that simple paths are selected from a snapshot of the whole
+    configuration with their ancestors.
+    """
+
+    data = parse_string(xmlstr).rpc_reply.data
+
+    selected = select(data, "/services/l2c:l2c", {"l2c": "http://example.com/l2c"})
+
+    assert (
+        selected.dumps()
+        == """<services xmlns="http://clicon.org/controller"><l2c xmlns="http://example.com/l2c"><name>a</name></l2c><l2c xmlns="http://example.com/l2c"><name>b</name></l2c></services>"""
+    )
+
+    assert (
+        select(data, "/devices").dumps()
+        == """<devices xmlns="http://clicon.org/controller"><device><name>r1</name></device></devices>"""
+    )
+    assert select(data, "/services/l2c:l2c", {"l2c": "urn:other"}).dumps() == ""
+    assert select(data, "/services/x:l2c") is None
+    assert select(data, "/devices/device[name='r1']") is None
+
+
+def test_snapshot():
+    """
+    Test that the configuration is fetched once and every root is a copy.
+    """
+
+    fetched = []
+
+    def fetch(xpath, namespaces):
+        fetched.append(xpath)
+        return parse_string(xmlstr).rpc_reply.data
+
+    snapshot = Snapshot(fetch)
+
+    root1 = snapshot.get_root()
+    root1.services.create("new")
+
+    root2 = snapshot.get_root()
+    services = snapshot.get_root(xpath="/services")
+
+    assert fetched == ["/"]
+    assert root2.services.get_elements("new") == []
+    assert len(services.services.l2c) == 2
+    assert [id(root) for root in snapshot.get_roots()] == [
+        id(root1),
+        id(root2),
+        id(services),
+    ]
@@ -1,5 +1,10 @@
 from unittest.mock import patch, MagicMock
-from clixon.sock import create_socket, read, send
+from clixon.element import Element
+from clixon.sock import create_socket, get_framer, read, send
+from clixon.sock import END_OF_MESSAGE, FrameDecoder, FramingError, PayloadTrace, _env_int
+from clixon.exceptions import TimeoutException
+import logging
+import pytest
 import socket
 
 
@@ -20,6 +25,21 @@ def test_create_socket(mock_socket):
     mock_socket_instance.connect.assert_called_with(sockpath)
 
 
+def recv_into(*frames):
+    """
+    Return a recv_into side effect which delivers frames one by one.
+    """
+
+    frames = list(frames)
+
+    def side_effect(buffer, nbytes=0):
+        data = frames.pop(0)
+        buffer[:len(data)] = data
+        return len(data)
+
+    return side_effect
+
+
 @patch('select.select')
 @patch('socket.socket')
 def test_read(mock_socket, mock_select):
@@ -29,12 +49,14 @@ def test_read(mock_socket, mock_select):
 
     mock_socket_instance = MagicMock()
     mock_socket.return_value = mock_socket_instance
-    mock_socket_instance.recv.return_value = b'\n#20\n<test><data/></test>\n##\n'
+    mock_socket_instance.recv_into.side_effect = recv_into(
+        b"\n#20\n<test><data/></test>\n##\n"
+    )
     mock_select.return_value = ([mock_socket_instance], [], [])
     sock = mock_socket()
     data = read(sock)
 
-    assert data == "\n#20\n<test><data/></test>\n##\n"
+    assert data == "<test><data/></test>"
     mock_select.assert_called()
 
 
@@ -52,3 +74,157 @@ def test_send(mock_socket, mock_select):
     send(sock, "\n#20\n<test><data/></test>\n##\n")
     mock_socket_instance.send.assert_called()
     mock_select.assert_called()
+
+
+@patch('select.select')
+@patch('socket.socket')
+def test_read_split(mock_socket, mock_select):
+    """
+    Test that read handles messages split over several receives and keeps
+    bytes belonging to the next message.
+    """
+
+    mock_socket_instance = MagicMock()
+    mock_socket.return_value = mock_socket_instance
+    mock_socket_instance.recv_into.side_effect = recv_into(
+        b"\n#4\n<a",
+        b"/>\n#3\n<b>\n##\n\n#4\n<c/>",
+        b"\n##\n",
+    )
+    mock_select.return_value = ([mock_socket_instance], [], [])
+    sock = mock_socket()
+
+    assert read(sock) == "<a/><b>"
+    assert read(sock) == "<c/>"
+
+
+def test_frame_decoder():
+    """
+    Test that FrameDecoder handles multi-chunk messages.
+    """
+
+    decoder = FrameDecoder()
+    events = []
+
+    for data in [b"\n#4\nabcd\n#", b"2\nef\n##", b"\n"]:
+        for event in decoder.feed(data):
+            if event is END_OF_MESSAGE:
+                events.append(event)
+            else:
+                events.append(bytes(event))
+
+    assert events == [b"abcd", b"ef", END_OF_MESSAGE]
+
+
+def test_frame_decoder_invalid():
+    """
+    Test that FrameDecoder raises FramingError on an invalid header.
+    """
+
+    decoder = FrameDecoder()
+
+    try:
+        list(decoder.feed(b"\n#abc\n"))
+    except FramingError:
+        pass
+    else:
+        assert False, "FramingError not raised"
+
+
+def test_payload_trace(caplog):
+    """
+    Test that PayloadTrace samples messages and truncates the payload.
+    """
+
+    trace = PayloadTrace(max_bytes=4, sample=2)
+
+    assert [trace.sampled() for _ in range(4)] == [False, True, False, True]
+
+    with caplog.at_level(logging.INFO, logger="pyserver"):
+        trace.log("Read", 9, b"<a>bcdef</a>")
+
+    assert "Read: len=9 data=<a>b... (5 more bytes)" in caplog.text
+    assert not PayloadTrace().sampled()
+
+
+def test_env_int(monkeypatch):
+    """
+    Test that a malformed trace setting falls back to the default.
+    """
+
+    monkeypatch.setenv("PYAPI_TRACE_BYTES", "64k")
+    monkeypatch.setenv("PYAPI_TRACE_SAMPLE", "10")
+    monkeypatch.delenv("PYAPI_TRACE_MISSING", raising=False)
+
+    assert _env_int("PYAPI_TRACE_BYTES", 0) == 0
+    assert _env_int("PYAPI_TRACE_SAMPLE", 1) == 10
+    assert _env_int("PYAPI_TRACE_MISSING", 3) == 3
+
+
+@patch('select.select')
+@patch('socket.socket')
+def test_send_element(mock_socket, mock_select):
+    """
+    Test that send streams an Element as chunks.
+    """
+
+    mock_socket_instance = MagicMock()
+    mock_socket.return_value = mock_socket_instance
+    mock_socket_instance.send.side_effect = lambda data: len(data)
+    mock_select.return_value = ([], [mock_socket_instance], [])
+    sock = mock_socket()
+
+    root = Element("root")
+    root.create("test").create("data", data="1")
+
+    send(sock, root)
+
+    sent = b"".join(
+        bytes(call.args[0]) for call in mock_socket_instance.send.call_args_list
+    )
+
+    assert sent == b"\n#27\n<test><data>1</data></test>\n##\n"
+
+
+def test_read_timeout():
+    """
+    Test that read raises TimeoutException when the deadline passes and
+    that a message cut by the deadline is completed by the next read.
+    """
+
+    sock, peer = socket.socketpair()
+
+    with pytest.raises(TimeoutException):
+        read(sock, timeout=0.05)
+
+    peer.sendall(b"\n#13\n<test>")
+
+    with pytest.raises(TimeoutException):
+        read(sock, timeout=0.05)
+
+    peer.sendall(b"data</>\n##\n")
+
+    assert read(sock, timeout=1) == "<test>data</>"
+
+    sock.close()
+    peer.close()
+
+
+def test_read_abandoned():
+    """
+    Test that the rest of a message is skipped when its reader stops in
+    the middle of it, e.g. after a parse error.
+    """
+
+    sock, peer = socket.socketpair()
+
+    peer.sendall(b"\n#6\n<test>\n#7\n</test>\n##\n\n#7\n<next/>\n##\n")
+
+    pieces = get_framer(sock).read_pieces()
+    assert bytes(next(pieces)) == b"<test>"
+    pieces.close()
+
+    assert read(sock, timeout=1) == "<next/>"
+
+    sock.close()
+    peer.close()
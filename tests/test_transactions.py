@@ -0,0 +1,77 @@
+from clixon.transactions import TransactionStore
+
+
+class Clock:
+    """
+    Clock which only moves when told to.
+    """
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_transaction_store():
+    """
+    Test that entries can be put, read and popped and that the memory
+    counter follows them.
+    """
+
+    store = TransactionStore()
+    store.put("1", [("l2c", "a"), ("l2c", "b")])
+
+    assert "1" in store
+    assert store.get("1") == [("l2c", "a"), ("l2c", "b")]
+    assert store.stats()["entries"] == 1
+    assert store.stats()["bytes"] > 0
+
+    assert store.pop("1") == [("l2c", "a"), ("l2c", "b")]
+    assert store.pop("1") is None
+    assert "1" not in store
+    assert store.stats() == {"entries": 0, "evictions": 0, "expirations": 0, "bytes": 0}
+
+
+def test_transaction_store_lru():
+    """
+    Test that the least recently used entry is evicted when the store is
+    full.
+    """
+
+    store = TransactionStore(max_entries=2)
+    store.put("1", [("a", "1")])
+    store.put("2", [("a", "2")])
+    store.get("1")
+    store.put("3", [("a", "3")])
+
+    assert "1" in store
+    assert "2" not in store
+    assert "3" in store
+    assert store.stats()["evictions"] == 1
+    assert len(store) == 2
+
+
+def test_transaction_store_ttl():
+    """
+    Test that entries unused for longer than the TTL are dropped.
+    """
+
+    clock = Clock()
+    store = TransactionStore(ttl=10, clock=clock)
+    store.put("1", [("a", "1")])
+    clock.now = 5
+    store.put("2", [("a", "2")])
+    clock.now = 12
+
+    assert store.get("1") is None
+    assert store.get("2") == [("a", "2")]
+
+    clock.now = 21
+
+    assert "2" in store
+
+    clock.now = 22.5
+
+    assert len(store) == 0
+    assert store.stats() == {"entries": 0, "evictions": 0, "expirations": 2, "bytes": 0}
@@ -0,0 +1,154 @@
+from clixon.parser import parse_string
+from clixon.view import ElementView
+
+xmlstr = """<data><services><l2c><name>a</name><port>1</port></l2c><l2c><name>b</name><port>2</port></l2c></services><devices><device><name>r1</name><config><mtu>1500</mtu></config></device><device><name>r2</name><config><mtu>1500</mtu></config></device></devices></data>"""
+
+
+def test_view():
+    """
+    Test that changes to a view do not change the base element.
+    """
+
+    base = parse_string(xmlstr).data
+    view = ElementView(base)
+
+    assert view.dumps() == base.dumps()
+
+    view.devices.device[0].config.mtu.set_data("9000")
+    view.services.create("bgp").create("name", data="c")
+    view.services.delete(element=view.services.l2c[1])
+
+    assert base.dumps() == parse_string(xmlstr).data.dumps()
+    assert "<mtu>9000</mtu>" in view.dumps()
+    assert "<bgp><name>c</name></bgp>" in view.dumps()
+    assert "<name>b</name>" not in view.dumps()
+
+    other = ElementView(base)
+
+    assert other.dumps() == base.dumps()
+
+
+def test_view_shares_children():
+    """
+    Test that a view shares the children of the base element until a path
+    is changed, and that reads and dumps do not copy the tree.
+    """
+
+    base = parse_string(xmlstr).data
+    view = ElementView(base)
+
+    assert view.dumps() == base.dumps()
+    assert view._children is base._children
+
+    device = view.devices.find_entry("device", "name", "r2")
+
+    assert device is view.devices.device[1]
+    assert view.services._children is base.services._children
+
+    device.config.mtu.set_data("9000")
+
+    assert view._children is not base._children
+    assert view.services._children is base.services._children
+    assert view.devices.device[0].config._children is base.devices.device[0].config._children
+    assert "<name>r2</name><config><mtu>9000</mtu></config>" in view.dumps()
+    assert "<mtu>9000</mtu>" not in base.dumps()
+
+    view.services.l2c[0].port.cdata = "7"
+
+    assert "<name>a</name><port>7</port>" in view.dumps()
+    assert "<port>7</port>" not in base.dumps()
+
+
+def test_view_cdata_delta():
+    """
+    Test that assigning cdata through a view is sent in delta mode.
+    """
+
+    view = ElementView(parse_string(xmlstr).data)
+    view.devices.device[0].config.mtu.cdata = "9000"
+
+    assert view.changed_paths() == {"/devices/device[name='r1']/config/mtu"}
+    assert view.delta().dumps() == "<devices><device><name>r1</name><config><mtu>9000</mtu></config></device></devices>"
+
+
+def test_view_find_entry_index():
+    """
+    Test that the keyed index of a changed view is reused, its entries are
+    views sharing the key leaves of the base tree.
+    """
+
+    view = ElementView(parse_string(xmlstr).data)
+    view.devices.device[0].config.mtu.set_data("9000")
+
+    device = view.devices.find_entry("device", "name", "r2")
+    index = view.devices._keys[("device", "name")]
+
+    assert view.devices._views is None
+    assert view.devices.find_entry("device", "name", "r2") is device
+    assert view.devices._keys[("device", "name")] is index
+
+    device.name.set_data("r3")
+
+    assert view.devices.find_entry("device", "name", "r2") is None
+    assert view.devices.find_entry("device", "name", "r3") is device
+
+
+def test_view_changed_paths():
+    """
+    Test that created, changed and deleted paths are returned.
+    """
+
+    view = ElementView(parse_string(xmlstr).data)
+
+    assert view.changed_paths() == set()
+
+    view.devices.device[1].config.mtu.set_data("9000")
+    view.services.create("bgp")
+    view.services.l2c[0].delete()
+    view.services.l2c.create("vlan").set_data("10")
+    view.services.l2c.delete("vlan")
+
+    assert view.changed_paths() == {
+        "/devices/device[name='r2']/config/mtu",
+        "/services/bgp",
+        "/services/l2c[name='a']",
+    }
+
+    delta = view.delta()
+
+    assert (
+        delta.dumps()
+        == "<services><l2c><name>b</name><port>2</port></l2c><bgp/></services><devices><device><name>r2</name><config><mtu>9000</mtu></config></device></devices>"
+    )
+
+
+def test_view_delete_many():
+    """
+    Test that children deleted with delete_many are returned as deleted
+    paths and the base element is not changed.
+    """
+
+    base = parse_string(xmlstr).data
+    view = ElementView(base)
+
+    assert view.devices.delete_many(lambda device: str(device.name) != "r2") == 1
+    assert view.changed_paths() == {"/devices/device[name='r1']"}
+    assert len(base.devices.device) == 2
+
+
+def test_view_create_many():
+    """
+    Test that entries created with create_many are changed paths and the
+    base element is not changed.
+    """
+
+    base = parse_string(xmlstr).data
+    view = ElementView(base)
+
+    view.devices.create_many("device", [{"name": "r3"}, {"name": "r4"}], key="name")
+
+    assert view.changed_paths() == {
+        "/devices/device[name='r3']",
+        "/devices/device[name='r4']",
+    }
+    assert len(base.devices.device) == 2